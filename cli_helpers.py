@@ -0,0 +1,33 @@
+"""
+Shared client setup for the top-level scripts.
+
+Puts python-client/src on the import path (relative to this file, so the
+scripts work from any directory) and builds clients for the deployed worker.
+"""
+
+import os
+import sys
+from typing import Type
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'python-client', 'src'))
+
+from whatsapp_client import WhatsAppClient  # noqa: E402
+
+DEFAULT_SERVER_URL = 'https://whatsapp-clone-worker.hi-suneesh.workers.dev'
+
+
+def make_client(
+    server_url: str = DEFAULT_SERVER_URL,
+    client_class: Type[WhatsAppClient] = WhatsAppClient,
+) -> WhatsAppClient:
+    """
+    Create a client for the given server.
+
+    Args:
+        server_url: Server base URL (defaults to the deployed worker)
+        client_class: WhatsAppClient or a subclass such as AsyncClient
+
+    Returns:
+        A new, not yet authenticated client
+    """
+    return client_class(server_url=server_url)
@@ -4,6 +4,7 @@ import asyncio
 import logging
 from typing import Optional, Callable, Any, List, Dict
 from .client import WhatsAppClient
+from .storage import Argon2Params
 from .async_utils import TaskManager, ExceptionHandler
 
 logger = logging.getLogger(__name__)
@@ -40,6 +41,7 @@ class AsyncClient(WhatsAppClient):
         storage_path: str = "~/.whatsapp_client",
         auto_connect: bool = True,
         log_level: str = "INFO",
+        kdf_params: Optional[Argon2Params] = None,
     ) -> None:
         """
         Initialize AsyncClient.
@@ -49,12 +51,14 @@ class AsyncClient(WhatsAppClient):
             storage_path: Path for local storage
             auto_connect: Auto-connect WebSocket on login
             log_level: Logging level
+            kdf_params: Argon2id costs for the encrypted key file
         """
         super().__init__(
             server_url=server_url,
             storage_path=storage_path,
             auto_connect=auto_connect,
             log_level=log_level,
+            kdf_params=kdf_params,
         )
         
         # Async-specific management
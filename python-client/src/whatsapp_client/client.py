@@ -1,19 +1,32 @@
 """Main WhatsApp Client class."""
 
+import binascii
+import hmac
 import logging
-from typing import Optional, Callable, List, Dict, Any
-import uuid
+import string
+from typing import Optional, Callable, List, Dict, Any, Tuple
 import time
 
 from .auth import AuthManager
 from .transport import RestClient, WebSocketClient, ConnectionState
 from .crypto import KeyManager, SessionManager
-from .storage import MessageStorage
+from .storage import Argon2Params, MessageStorage
 from .models import User, PrekeyBundle, Session, Message
 from .exceptions import WhatsAppClientError
+from .clock import now_ms
+from .ids import new_message_id
 
 logger = logging.getLogger(__name__)
 
+# Fingerprint normalization: uppercase and drop whitespace in one C-level pass
+_FINGERPRINT_UPPER = bytes.maketrans(
+    string.ascii_lowercase.encode(), string.ascii_uppercase.encode()
+)
+_FINGERPRINT_STRIP = b" \n"
+
+# Repeats of the same typing state to a peer within this window are not re-sent
+TYPING_RESEND_INTERVAL = 3.0
+
 
 class WhatsAppClient:
     """
@@ -35,6 +48,7 @@ class WhatsAppClient:
         storage_path: str = "~/.whatsapp_client",
         auto_connect: bool = True,
         log_level: str = "INFO",
+        kdf_params: Optional[Argon2Params] = None,
     ) -> None:
         """
         Initialize WhatsApp Client.
@@ -44,10 +58,12 @@ class WhatsAppClient:
             storage_path: Path for local data storage (default: ~/.whatsapp_client)
             auto_connect: Auto-connect WebSocket on login (default: True)
             log_level: Logging level (default: INFO)
+            kdf_params: Argon2id costs for the encrypted key file (default: Argon2Params())
         """
         self.server_url = server_url
         self.storage_path = storage_path
         self.auto_connect = auto_connect
+        self.kdf_params = kdf_params
 
         # Configure logging
         logging.basicConfig(
@@ -74,6 +90,7 @@ class WhatsAppClient:
         self._presence_handlers: List[Callable] = []
         self._group_message_handlers: List[Callable] = []
         self._online_users: Dict[str, bool] = {}  # Track online presence
+        self._typing_sent: Dict[str, Tuple[bool, float]] = {}  # peer -> (state, monotonic)
 
     @property
     def user(self) -> Optional[User]:
@@ -321,14 +338,15 @@ class WhatsAppClient:
         Example:
             >>> match = client.compare_fingerprints(my_fp, peer_fp)
         """
+        # Reject None/empty before any normalization work
         if not fingerprint1 or not fingerprint2:
             return False
         
-        # Normalize to uppercase and remove whitespace
-        fp1 = fingerprint1.upper().replace(" ", "").replace("\n", "")
-        fp2 = fingerprint2.upper().replace(" ", "").replace("\n", "")
+        fp1 = fingerprint1.encode().translate(_FINGERPRINT_UPPER, _FINGERPRINT_STRIP)
+        fp2 = fingerprint2.encode().translate(_FINGERPRINT_UPPER, _FINGERPRINT_STRIP)
         
-        return fp1 == fp2
+        # Constant-time compare so the match position is not leaked
+        return hmac.compare_digest(fp1, fp2)
 
     async def get_prekey_status(self) -> dict:
         """
@@ -378,13 +396,15 @@ class WhatsAppClient:
 
         # Initialize cryptographic keys
         logger.info("Initializing cryptographic keys...")
-        self._key_manager = KeyManager(self.user_id, self.storage_path)
+        self._key_manager = KeyManager(self.user_id, self.storage_path, self.kdf_params)
         await self._key_manager.initialize(password=password)
 
         # Initialize session manager
         self._session_manager = SessionManager(self.user_id, self.storage_path)
         
-        # Initialize message storage
+        # Initialize message storage, closing the one from a previous login
+        if self._message_storage:
+            self._message_storage.close()
         self._message_storage = MessageStorage(self.storage_path, self.user_id)
         
         # Initialize fingerprint storage
@@ -430,13 +450,15 @@ class WhatsAppClient:
 
         # Initialize cryptographic keys
         logger.info("Initializing cryptographic keys...")
-        self._key_manager = KeyManager(self.user_id, self.storage_path)
+        self._key_manager = KeyManager(self.user_id, self.storage_path, self.kdf_params)
         await self._key_manager.initialize(password=password)
 
         # Initialize session manager
         self._session_manager = SessionManager(self.user_id, self.storage_path)
         
-        # Initialize message storage
+        # Initialize message storage, closing the one from a previous login
+        if self._message_storage:
+            self._message_storage.close()
         self._message_storage = MessageStorage(self.storage_path, self.user_id)
         
         # Initialize fingerprint storage
@@ -698,11 +720,11 @@ class WhatsAppClient:
             
             # Create Message object for return (we don't get confirmation immediately)
             message = Message(
-                id=str(uuid.uuid4()),
+                id=new_message_id(),
                 from_user=self.user_id,
                 to=to,
                 content=content,  # Return decrypted content
-                timestamp=int(time.time() * 1000),
+                timestamp=now_ms(),
                 status="sent",
                 type=message_type,
             )
@@ -755,6 +777,7 @@ class WhatsAppClient:
         self._ws.on_typing(self._handle_typing)
         self._ws.on_status(self._handle_status)
         self._ws.on_presence(self._handle_presence)
+        self._ws.on_connection(self._handle_connection)
         
         await self._ws.connect()
     
@@ -777,12 +800,12 @@ class WhatsAppClient:
 
             # Create Message object
             message = Message(
-                id=payload.get("id", str(uuid.uuid4())),
+                id=payload.get("id") or new_message_id(),
                 from_user=from_user,
                 to=self.user_id,
                 content=content,
                 type=payload.get("type", "text"),
-                timestamp=payload.get("timestamp", int(time.time() * 1000)),
+                timestamp=payload["timestamp"] if "timestamp" in payload else now_ms(),
                 status="delivered",
             )
             
@@ -918,6 +941,12 @@ class WhatsAppClient:
             except Exception as e:
                 logger.error(f"Status handler error: {e}")
     
+    async def _handle_connection(self, connected: bool) -> None:
+        """Handle WebSocket connection state change."""
+        if not connected:
+            # Typing state sent on the old connection is not resent after reconnecting
+            self._typing_sent.clear()
+    
     async def _handle_presence(self, data: Dict[str, Any]) -> None:
         """Handle presence update."""
         # Update presence tracking
@@ -972,12 +1001,12 @@ class WhatsAppClient:
         
         # Create message object
         message = Message(
-            id=str(uuid.uuid4()),
+            id=new_message_id(),
             from_user=self.user_id,
             to=to,
             content=content,
             type=type,
-            timestamp=int(time.time() * 1000),
+            timestamp=now_ms(),
             status="sent",
         )
         
@@ -1099,12 +1128,10 @@ class WhatsAppClient:
         
         # Load image data from file if path provided
         if image_path:
-            path = Path(image_path)
-            if not path.exists():
+            try:
+                image_data = Path(image_path).read_bytes()
+            except FileNotFoundError:
                 raise WhatsAppClientError(f"Image file not found: {image_path}")
-            
-            with open(path, "rb") as f:
-                image_data = f.read()
         
         # Check size limit
         if len(image_data) > max_size:
@@ -1129,12 +1156,12 @@ class WhatsAppClient:
         
         # Create message
         message = Message(
-            id=str(uuid.uuid4()),
+            id=new_message_id(),
             from_user=self.user_id,
             to=to,
             content=caption or "",
             type="image",
-            timestamp=int(time.time() * 1000),
+            timestamp=now_ms(),
             status="sent",
             image_data=content_to_send,
         )
@@ -1181,7 +1208,6 @@ class WhatsAppClient:
             ...             path=f"downloads/{msg.id}.jpg"
             ...         )
         """
-        import base64
         from pathlib import Path
         
         if message.type != "image":
@@ -1204,7 +1230,7 @@ class WhatsAppClient:
         
         # Decode base64
         try:
-            image_bytes = base64.b64decode(image_data_b64)
+            image_bytes = binascii.a2b_base64(image_data_b64)
         except Exception as e:
             raise WhatsAppClientError(f"Failed to decode image data: {e}")
         
@@ -1245,8 +1271,6 @@ class WhatsAppClient:
             ...             from_user=msg.from_user
             ...         )
         """
-        import base64
-        
         # Decrypt if needed
         data_b64 = image_data
         if decrypt:
@@ -1262,7 +1286,7 @@ class WhatsAppClient:
         
         # Decode base64
         try:
-            return base64.b64decode(data_b64)
+            return binascii.a2b_base64(data_b64)
         except Exception as e:
             raise WhatsAppClientError(f"Failed to decode image data: {e}")
     
@@ -1303,12 +1327,24 @@ class WhatsAppClient:
         """
         Send typing indicator.
         
+        Safe to call on every keystroke: a state change is sent at once, while
+        repeats of the last state sent to the same peer are dropped until
+        TYPING_RESEND_INTERVAL has passed.
+        
         Args:
             to: User to send typing indicator to
             typing: True if typing, False if stopped
         """
-        if self._ws:
-            await self._ws.send_typing(to, typing)
+        if not self._ws:
+            return
+        
+        now = time.monotonic()
+        last = self._typing_sent.get(to)
+        if last is not None and last[0] == typing and now - last[1] < TYPING_RESEND_INTERVAL:
+            return
+        
+        await self._ws.send_typing(to, typing)
+        self._typing_sent[to] = (typing, now)
     
     async def mark_as_read(
         self, 
@@ -1675,8 +1711,11 @@ class WhatsAppClient:
         self._rest.set_token(None)
         self._key_manager = None
         self._session_manager = None
+        if self._message_storage:
+            self._message_storage.close()
         self._message_storage = None
         self._online_users.clear()  # Clear presence tracking
+        self._typing_sent.clear()
         logger.info("Logged out successfully")
 
     async def close(self) -> None:
@@ -0,0 +1,16 @@
+"""Wall-clock helpers shared by message creation code."""
+
+import time
+
+
+def now_ms() -> int:
+    """
+    Get the current Unix time in milliseconds.
+    
+    Uses integer nanoseconds, so there is no float rounding, and gives tests a
+    single function to patch for fixed timestamps.
+    
+    Returns:
+        Milliseconds since the epoch
+    """
+    return time.time_ns() // 1_000_000
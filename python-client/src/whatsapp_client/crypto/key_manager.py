@@ -10,7 +10,7 @@ import nacl.utils
 
 from .utils import format_fingerprint, encode_base64, decode_base64
 from ..exceptions import ValidationError
-from ..storage import KeyStorage
+from ..storage import Argon2Params, KeyStorage
 
 logger = logging.getLogger(__name__)
 
@@ -77,19 +77,25 @@ class KeyManager:
     - Prekeys (signed + one-time)
     """
     
-    def __init__(self, user_id: str, storage_path: str = "~/.whatsapp_client"):
+    def __init__(
+        self,
+        user_id: str,
+        storage_path: str = "~/.whatsapp_client",
+        kdf_params: Optional[Argon2Params] = None,
+    ):
         """
         Initialize KeyManager.
 
         Args:
             user_id: User ID for key storage
             storage_path: Base path for key storage
+            kdf_params: Argon2id costs for the key file (defaults to Argon2Params())
         """
         self.user_id = user_id
         self.storage_path = os.path.expanduser(storage_path)
 
         # Initialize key storage with encryption
-        self.key_storage = KeyStorage(self.storage_path, user_id)
+        self.key_storage = KeyStorage(self.storage_path, user_id, kdf_params=kdf_params)
 
         # Keys (loaded on demand)
         self._identity_keypair: Optional[KeyPair] = None
@@ -14,7 +14,7 @@ from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from ..exceptions import WhatsAppClientError
 
 
-@dataclass
+@dataclass(frozen=True)
 class RatchetHeader:
     """Header attached to encrypted messages."""
     
@@ -0,0 +1,24 @@
+"""Identifier generation for locally created records."""
+
+import os
+
+from .clock import now_ms
+
+# Crockford base32: no I, L, O or U, so IDs survive being read aloud or retyped
+_CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+def new_message_id() -> str:
+    """
+    Generate a ULID for a new message.
+    
+    A ULID is a 48-bit millisecond timestamp followed by 80 random bits,
+    written as 26 Crockford base32 characters. IDs sort by creation time, so
+    inserts land at the end of the message table's primary-key index instead
+    of at random pages.
+    
+    Returns:
+        26-character ULID string
+    """
+    value = now_ms() << 80 | int.from_bytes(os.urandom(10), "big")
+    return "".join(_CROCKFORD[(value >> shift) & 31] for shift in range(125, -1, -5))
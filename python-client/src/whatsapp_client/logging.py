@@ -1,10 +1,19 @@
 """Comprehensive error handling and logging utilities."""
 
+import json
 import logging
+import logging.handlers
+import queue
 import sys
+import threading
+import time
 import traceback
+from contextlib import contextmanager
+from collections import Counter, defaultdict, deque
+from collections.abc import Mapping
+from itertools import islice
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Deque, Iterator
 from datetime import datetime
 from enum import Enum
 
@@ -28,17 +37,115 @@ class LogLevel(str, Enum):
     CRITICAL = "CRITICAL"
 
 
+# Enum .value is a descriptor lookup; plain dicts are cheaper on hot paths
+_LEVEL_VALUES: Dict[LogLevel, str] = {level: level.value for level in LogLevel}
+_LOGGING_LEVELS: Dict[LogLevel, int] = {level: getattr(logging, level.value) for level in LogLevel}
+
+# Shared by every file handler; Formatter.format keeps no per-handler state
+_FILE_FORMATTER = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+
+class ErrorRecord(Mapping):
+    """Read-only error history entry; timestamp and traceback are formatted on access."""
+
+    __slots__ = ("timestamp_ns", "type", "message", "context", "severity", "_tb_exc", "_tb_text")
+
+    _KEYS = ("timestamp", "type", "message", "context", "severity", "traceback")
+
+    def __init__(self, exception: BaseException, context: Optional[str], severity: str):
+        """
+        Initialize error record.
+
+        Args:
+            exception: Exception being recorded
+            context: Context information
+            severity: Severity level name
+        """
+        self.timestamp_ns = time.time_ns()
+        self.type = type(exception).__name__
+        self.message = str(exception)
+        self.context = context
+        self.severity = severity
+        # Frame summaries only: no locals or source lines are captured here
+        self._tb_exc = traceback.TracebackException.from_exception(exception, lookup_lines=False)
+        self._tb_text: Optional[str] = None
+
+    @property
+    def timestamp(self) -> str:
+        """ISO-8601 local time the error was recorded."""
+        seconds, nanos = divmod(self.timestamp_ns, 1_000_000_000)
+        return datetime.fromtimestamp(seconds).replace(microsecond=nanos // 1000).isoformat()
+
+    @property
+    def traceback_text(self) -> str:
+        """Formatted traceback, rendered on first access."""
+        if self._tb_text is None:
+            # _tb_exc is kept so concurrent first reads can each render safely
+            self._tb_text = "".join(self._tb_exc.format())
+        return self._tb_text
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "traceback":
+            return self.traceback_text
+        if key not in self._KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._KEYS)
+
+    def __len__(self) -> int:
+        return len(self._KEYS)
+
+    def __repr__(self) -> str:
+        return f"ErrorRecord({dict(self)!r})"
+
+
+class BackgroundFileHandler(logging.handlers.QueueHandler):
+    """Queue handler whose records are written to a file by a listener thread."""
+
+    def __init__(self, file_handler: logging.FileHandler):
+        """
+        Initialize background file handler and start its listener.
+
+        Args:
+            file_handler: Handler that performs the actual file writes
+        """
+        super().__init__(queue.SimpleQueue())
+        self.file_handler = file_handler
+        self._listener: Optional[logging.handlers.QueueListener] = (
+            logging.handlers.QueueListener(self.queue, file_handler, respect_handler_level=True)
+        )
+        self._listener.start()
+
+    def close(self) -> None:
+        """Drain queued records to the file, then close it."""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+            self.file_handler.close()
+        super().close()
+
+
 class ErrorHandler:
     """Centralized error handling and logging."""
 
     # Singleton instance
     _instance: Optional["ErrorHandler"] = None
+    _lock = threading.Lock()
 
     def __new__(cls) -> "ErrorHandler":
         """Implement singleton pattern."""
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._initialized = False
+        # Lock-free once created; the lock only guards first construction
+        instance = cls._instance
+        if instance is not None:
+            return instance
+
+        with cls._lock:
+            if cls._instance is None:
+                instance = super().__new__(cls)
+                instance._initialized = False
+                cls._instance = instance
         return cls._instance
 
     def __init__(self):
@@ -46,18 +153,47 @@ class ErrorHandler:
         if self._initialized:
             return
 
-        self._initialized = True
+        with self._lock:
+            if self._initialized:
+                return
+            self._init_state()
+            self._initialized = True
+
+    def _init_state(self) -> None:
+        """Set up logger and error history for the singleton."""
         self.logger = logging.getLogger("whatsapp_client")
-        self.error_history: list[Dict[str, Any]] = []
-        self.max_history = 1000
+        self.error_history: Deque[ErrorRecord] = deque(maxlen=1000)
+        self._type_counts: Counter[str] = Counter()
+        # Same records as error_history, split by severity and kept in order
+        self._by_severity: Dict[str, Deque[ErrorRecord]] = defaultdict(deque)
+        # Keeps history and counters consistent across threads
+        self._history_lock = threading.Lock()
         self.log_level = LogLevel.INFO
         self._setup_logging()
 
+    @property
+    def max_history(self) -> int:
+        """Maximum number of errors kept in history."""
+        return self.error_history.maxlen
+
+    @max_history.setter
+    def max_history(self, value: int) -> None:
+        if value < 1:
+            # A zero-length deque drops every record but the counters would still count it
+            raise ValueError(f"max_history must be at least 1, got {value}")
+        with self._history_lock:
+            # Rebuilding the deque keeps the newest entries
+            self.error_history = deque(self.error_history, maxlen=value)
+            self._type_counts = Counter(e.type for e in self.error_history)
+            self._by_severity = defaultdict(deque)
+            for error in self.error_history:
+                self._by_severity[error.severity].append(error)
+
     def _setup_logging(self) -> None:
         """Set up logging configuration."""
         # Console handler
         console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setLevel(getattr(logging, self.log_level.value))
+        console_handler.setLevel(_LOGGING_LEVELS[self.log_level])
 
         # Formatter
         formatter = logging.Formatter(
@@ -80,15 +216,19 @@ class ErrorHandler:
         """
         self.log_level = level
         for handler in self.logger.handlers:
-            handler.setLevel(getattr(logging, level.value))
+            handler.setLevel(_LOGGING_LEVELS[level])
         self.logger.setLevel(logging.DEBUG)
 
-    def add_file_handler(self, log_file: str) -> None:
+    def add_file_handler(self, log_file: str, background: bool = False) -> logging.Handler:
         """
         Add file logging handler.
 
         Args:
             log_file: Path to log file
+            background: Write from a listener thread so logging calls never block on disk
+
+        Returns:
+            The handler attached to the logger
         """
         log_path = Path(log_file).expanduser()
         log_path.parent.mkdir(parents=True, exist_ok=True)
@@ -96,12 +236,21 @@ class ErrorHandler:
         file_handler = logging.FileHandler(log_path)
         file_handler.setLevel(logging.DEBUG)
 
-        formatter = logging.Formatter(
-            "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-        )
-        file_handler.setFormatter(formatter)
+        file_handler.setFormatter(_FILE_FORMATTER)
 
-        self.logger.addHandler(file_handler)
+        handler: logging.Handler = file_handler
+        if background:
+            handler = BackgroundFileHandler(file_handler)
+
+        self.logger.addHandler(handler)
+        return handler
+
+    def remove_file_handlers(self) -> None:
+        """Detach and close every handler added by add_file_handler."""
+        for handler in list(self.logger.handlers):
+            if isinstance(handler, (logging.FileHandler, BackgroundFileHandler)):
+                self.logger.removeHandler(handler)
+                handler.close()
 
     def handle_exception(
         self,
@@ -117,56 +266,54 @@ class ErrorHandler:
             context: Context information (function name, operation, etc.)
             severity: Log severity level
         """
-        error_info = {
-            "timestamp": datetime.now().isoformat(),
-            "type": type(exception).__name__,
-            "message": str(exception),
-            "context": context,
-            "severity": severity.value,
-            "traceback": traceback.format_exc(),
-        }
-
-        self.error_history.append(error_info)
-        if len(self.error_history) > self.max_history:
-            self.error_history.pop(0)
+        # Contexts come from a small set; share one string object per value
+        if context is not None:
+            context = sys.intern(context)
+
+        error_info = ErrorRecord(exception, context, _LEVEL_VALUES[severity])
+
+        with self._history_lock:
+            history = self.error_history
+            if history and len(history) == history.maxlen:
+                # The oldest entry is about to be evicted
+                evicted = history[0]
+                self._type_counts[evicted.type] -= 1
+                # The evicted record is also the oldest of its severity
+                self._by_severity[evicted.severity].popleft()
+            history.append(error_info)
+            self._type_counts[error_info.type] += 1
+            self._by_severity[error_info.severity].append(error_info)
 
         # Log based on exception type
+        error_type = error_info.type
         if isinstance(exception, (AuthenticationError, ValidationError)):
-            self.logger.warning(
-                f"[{context}] {type(exception).__name__}: {exception}"
-            )
+            self.logger.warning("[%s] %s: %s", context, error_type, exception)
         elif isinstance(exception, (ConnectionError, CryptographyError)):
-            self.logger.error(
-                f"[{context}] {type(exception).__name__}: {exception}"
-            )
+            self.logger.error("[%s] %s: %s", context, error_type, exception)
         elif isinstance(exception, StorageError):
-            self.logger.error(
-                f"[{context}] {type(exception).__name__}: {exception}"
-            )
+            self.logger.error("[%s] %s: %s", context, error_type, exception)
         else:
-            self.logger.critical(
-                f"[{context}] Unexpected error: {type(exception).__name__}: {exception}"
-            )
+            self.logger.critical("[%s] Unexpected error: %s: %s", context, error_type, exception)
 
-    def log_debug(self, message: str, **kwargs: Any) -> None:
+    def log_debug(self, message: str, *args: Any, **kwargs: Any) -> None:
         """Log debug message."""
-        self.logger.debug(message, **kwargs)
+        self.logger.debug(message, *args, **kwargs)
 
-    def log_info(self, message: str, **kwargs: Any) -> None:
+    def log_info(self, message: str, *args: Any, **kwargs: Any) -> None:
         """Log info message."""
-        self.logger.info(message, **kwargs)
+        self.logger.info(message, *args, **kwargs)
 
-    def log_warning(self, message: str, **kwargs: Any) -> None:
+    def log_warning(self, message: str, *args: Any, **kwargs: Any) -> None:
         """Log warning message."""
-        self.logger.warning(message, **kwargs)
+        self.logger.warning(message, *args, **kwargs)
 
-    def log_error(self, message: str, **kwargs: Any) -> None:
+    def log_error(self, message: str, *args: Any, **kwargs: Any) -> None:
         """Log error message."""
-        self.logger.error(message, **kwargs)
+        self.logger.error(message, *args, **kwargs)
 
-    def log_critical(self, message: str, **kwargs: Any) -> None:
+    def log_critical(self, message: str, *args: Any, **kwargs: Any) -> None:
         """Log critical message."""
-        self.logger.critical(message, **kwargs)
+        self.logger.critical(message, *args, **kwargs)
 
     def get_error_history(
         self, count: int = 10, severity: Optional[LogLevel] = None
@@ -175,20 +322,62 @@ class ErrorHandler:
         Get recent error history.
 
         Args:
-            count: Number of errors to return
-            severity: Filter by severity level
+            count: Number of most recent errors to return (0 for all)
+            severity: Only return errors with this severity
 
         Returns:
-            List of error dictionaries
+            List of error dictionaries, oldest first
         """
-        history = self.error_history[-count:] if count else self.error_history
-        if severity:
-            history = [e for e in history if e["severity"] == severity.value]
+        return [dict(error) for error in self._recent_errors(count, severity)]
+
+    def _recent_errors(self, count: int, severity: Optional[LogLevel]) -> list[ErrorRecord]:
+        """Recent error records, oldest first; tracebacks are not rendered yet."""
+        with self._history_lock:
+            if severity:
+                source: Deque[ErrorRecord] = self._by_severity.get(_LEVEL_VALUES[severity], deque())
+            else:
+                source = self.error_history
+            if not count:
+                return list(source)
+            history = list(islice(reversed(source), count))
+        history.reverse()
         return history
 
+    def search_error_history(self, *keywords: str) -> list[Dict[str, Any]]:
+        """
+        Find errors whose message contains any of the keywords (case-insensitive).
+
+        Args:
+            keywords: Substrings to look for
+
+        Returns:
+            Matching error dictionaries, oldest first
+        """
+        needles = [keyword.casefold() for keyword in keywords]
+        return [
+            dict(error)
+            for error in self._recent_errors(0, None)
+            if any(needle in error.message.casefold() for needle in needles)
+        ]
+
+    def dump_history(self, path: str) -> None:
+        """
+        Write the full error history to a JSON file.
+
+        Args:
+            path: Destination file path
+        """
+        records = self.get_error_history(count=0)
+        dump_path = Path(path).expanduser()
+        dump_path.parent.mkdir(parents=True, exist_ok=True)
+        dump_path.write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+
     def clear_error_history(self) -> None:
         """Clear error history."""
-        self.error_history.clear()
+        with self._history_lock:
+            self.error_history.clear()
+            self._type_counts.clear()
+            self._by_severity.clear()
 
     def get_error_summary(self) -> Dict[str, Any]:
         """
@@ -197,22 +386,17 @@ class ErrorHandler:
         Returns:
             Summary dictionary with error counts by type and severity
         """
-        summary = {
-            "total_errors": len(self.error_history),
-            "by_type": {},
-            "by_severity": {},
-        }
-
-        for error in self.error_history:
-            # Count by type
-            error_type = error["type"]
-            summary["by_type"][error_type] = summary["by_type"].get(error_type, 0) + 1
-
-            # Count by severity
-            severity = error["severity"]
-            summary["by_severity"][severity] = summary["by_severity"].get(severity, 0) + 1
-
-        return summary
+        # Unary plus drops counts that eviction brought down to zero
+        with self._history_lock:
+            return {
+                "total_errors": len(self.error_history),
+                "by_type": dict(+self._type_counts),
+                "by_severity": {
+                    severity: len(errors)
+                    for severity, errors in self._by_severity.items()
+                    if errors
+                },
+            }
 
 
 # Global error handler instance
@@ -240,30 +424,53 @@ def configure_logging(
         handler.add_file_handler(log_file)
 
 
+@contextmanager
+def scoped_file_handler(
+    error_handler: ErrorHandler, log_file: str, background: bool = False
+) -> Iterator[logging.Handler]:
+    """
+    Log to a file for the duration of a with-block.
+
+    Args:
+        error_handler: Error handler whose logger gets the file handler
+        log_file: Path to log file
+        background: Write from a listener thread (see add_file_handler)
+
+    Yields:
+        The handler attached to the logger; it is detached and closed on exit
+    """
+    handler = error_handler.add_file_handler(log_file, background=background)
+    try:
+        yield handler
+    finally:
+        error_handler.logger.removeHandler(handler)
+        handler.close()
+
+
 # Convenience logging functions
-def log_debug(message: str, **kwargs: Any) -> None:
+def log_debug(message: str, *args: Any, **kwargs: Any) -> None:
     """Log debug message."""
-    _error_handler.log_debug(message, **kwargs)
+    _error_handler.log_debug(message, *args, **kwargs)
 
 
-def log_info(message: str, **kwargs: Any) -> None:
+def log_info(message: str, *args: Any, **kwargs: Any) -> None:
     """Log info message."""
-    _error_handler.log_info(message, **kwargs)
+    _error_handler.log_info(message, *args, **kwargs)
 
 
-def log_warning(message: str, **kwargs: Any) -> None:
+def log_warning(message: str, *args: Any, **kwargs: Any) -> None:
     """Log warning message."""
-    _error_handler.log_warning(message, **kwargs)
+    _error_handler.log_warning(message, *args, **kwargs)
 
 
-def log_error(message: str, **kwargs: Any) -> None:
+def log_error(message: str, *args: Any, **kwargs: Any) -> None:
     """Log error message."""
-    _error_handler.log_error(message, **kwargs)
+    _error_handler.log_error(message, *args, **kwargs)
 
 
-def log_critical(message: str, **kwargs: Any) -> None:
+def log_critical(message: str, *args: Any, **kwargs: Any) -> None:
     """Log critical message."""
-    _error_handler.log_critical(message, **kwargs)
+    _error_handler.log_critical(message, *args, **kwargs)
 
 
 def handle_exception(
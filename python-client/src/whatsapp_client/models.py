@@ -39,26 +39,11 @@ class Message(BaseModel):
 class RegisterRequest(BaseModel):
     """User registration request."""
 
-    username: str
-    password: str
+    # Length limits are enforced by pydantic-core without a Python validator call
+    username: str = Field(min_length=3, max_length=100)
+    password: str = Field(min_length=6)
     avatar: Optional[str] = None
 
-    @field_validator("username")
-    @classmethod
-    def validate_username(cls, v: str) -> str:
-        if len(v) < 3:
-            raise ValueError("Username must be at least 3 characters")
-        if len(v) > 100:
-            raise ValueError("Username must be at most 100 characters")
-        return v
-
-    @field_validator("password")
-    @classmethod
-    def validate_password(cls, v: str) -> str:
-        if len(v) < 6:
-            raise ValueError("Password must be at least 6 characters")
-        return v
-
 
 class LoginRequest(BaseModel):
     """User login request."""
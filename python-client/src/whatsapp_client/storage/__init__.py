@@ -3,6 +3,6 @@
 from .messages import MessageStorage
 from .fingerprints import FingerprintStorage
 from .groups import GroupStorage
-from .keys import KeyStorage
+from .keys import Argon2Params, KeyStorage
 
-__all__ = ["MessageStorage", "FingerprintStorage", "GroupStorage", "KeyStorage"]
+__all__ = ["MessageStorage", "FingerprintStorage", "GroupStorage", "KeyStorage", "Argon2Params"]
@@ -8,6 +8,9 @@ from typing import Dict, Optional, List
 
 logger = logging.getLogger(__name__)
 
+# Bump when the table definitions in _init_db change
+SCHEMA_VERSION = 1
+
 
 class FingerprintStorage:
     """Store and manage fingerprint verifications."""
@@ -34,6 +37,11 @@ class FingerprintStorage:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            conn.close()
+            return
+        
         # Fingerprints table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS fingerprints (
@@ -52,6 +60,7 @@ class FingerprintStorage:
             CREATE INDEX IF NOT EXISTS idx_verified ON fingerprints(verified)
         """)
         
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
         conn.commit()
         conn.close()
     
@@ -116,21 +125,16 @@ class FingerprintStorage:
         cursor = conn.cursor()
         
         try:
-            cursor.execute(
-                "SELECT * FROM fingerprints WHERE peer_id = ?",
-                (peer_id,)
-            )
+            cursor.execute("""
+                SELECT peer_id, identity_key, fingerprint, verified, verified_at, last_updated
+                FROM fingerprints WHERE peer_id = ?
+            """, (peer_id,))
             row = cursor.fetchone()
             
             if row:
-                return {
-                    "peer_id": row["peer_id"],
-                    "identity_key": row["identity_key"],
-                    "fingerprint": row["fingerprint"],
-                    "verified": bool(row["verified"]),
-                    "verified_at": row["verified_at"],
-                    "last_updated": row["last_updated"],
-                }
+                fp = dict(row)
+                fp["verified"] = bool(fp["verified"])
+                return fp
             return None
             
         except Exception as e:
@@ -209,20 +213,12 @@ class FingerprintStorage:
         cursor = conn.cursor()
         
         try:
-            cursor.execute(
-                "SELECT * FROM fingerprints WHERE verified = 1 ORDER BY verified_at DESC"
-            )
-            rows = cursor.fetchall()
-            
-            result = []
-            for row in rows:
-                result.append({
-                    "peer_id": row["peer_id"],
-                    "fingerprint": row["fingerprint"],
-                    "verified_at": row["verified_at"],
-                })
+            cursor.execute("""
+                SELECT peer_id, fingerprint, verified_at FROM fingerprints
+                WHERE verified = 1 ORDER BY verified_at DESC
+            """)
             
-            return result
+            return [dict(row) for row in cursor.fetchall()]
             
         except Exception as e:
             logger.error(f"Failed to get verified fingerprints: {e}")
@@ -242,19 +238,14 @@ class FingerprintStorage:
         cursor = conn.cursor()
         
         try:
-            cursor.execute(
-                "SELECT * FROM fingerprints ORDER BY last_updated DESC"
-            )
-            rows = cursor.fetchall()
+            cursor.execute("""
+                SELECT peer_id, fingerprint, verified, last_updated FROM fingerprints
+                ORDER BY last_updated DESC
+            """)
             
-            result = []
-            for row in rows:
-                result.append({
-                    "peer_id": row["peer_id"],
-                    "fingerprint": row["fingerprint"],
-                    "verified": bool(row["verified"]),
-                    "last_updated": row["last_updated"],
-                })
+            result = [dict(row) for row in cursor.fetchall()]
+            for fp in result:
+                fp["verified"] = bool(fp["verified"])
             
             return result
             
@@ -264,6 +255,42 @@ class FingerprintStorage:
         finally:
             conn.close()
     
+    def get_fingerprints_by_prefix(self, prefix: str) -> List[Dict]:
+        """
+        Get stored fingerprints for peers whose ID starts with a prefix.
+        
+        Uses a range scan on the peer_id primary key index rather than
+        filtering all records in Python.
+        
+        Args:
+            prefix: Peer ID prefix
+            
+        Returns:
+            List of matching fingerprint records, ordered by peer ID
+        """
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                SELECT peer_id, fingerprint, verified, last_updated FROM fingerprints
+                WHERE peer_id >= ? AND peer_id < ?
+                ORDER BY peer_id
+            """, (prefix, prefix + "\uffff"))
+            
+            result = [dict(row) for row in cursor.fetchall()]
+            for fp in result:
+                fp["verified"] = bool(fp["verified"])
+            
+            return result
+            
+        except Exception as e:
+            logger.error(f"Failed to get fingerprints by prefix: {e}")
+            return []
+        finally:
+            conn.close()
+    
     def delete_fingerprint(self, peer_id: str) -> bool:
         """
         Delete stored fingerprint.
@@ -5,14 +5,32 @@ import logging
 import sqlite3
 import uuid
 from pathlib import Path
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Bump when the table definitions in _init_db change
+SCHEMA_VERSION = 2
+
+# Columns returned for group metadata, in result-dict order
+_GROUP_COLUMNS = "id, name, description, owner_id, created_at, updated_at"
+
+_INSERT_MESSAGE_SQL = """
+    INSERT INTO group_messages (id, group_id, from_user, content, created_at)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
 
 class GroupStorage:
-    """Store and manage group chats."""
+    """
+    Store and manage group chats.
+
+    Membership lookups are served from a per-instance cache that is kept in
+    sync with this instance's own writes. Groups are loaded from the database
+    when first looked up, but once cached, membership changes made by another
+    instance or process are not seen; use a single writer per database.
+    """
 
     def __init__(self, storage_path: str, user_id: str):
         """
@@ -29,6 +47,11 @@ class GroupStorage:
         self.db_path = self.storage_path / "groups.db"
         self._init_db()
 
+        # group_id -> {user_id: role}, mirrors the group_members table as
+        # written through this instance (see class docstring)
+        self._members: Dict[str, Dict[str, str]] = {}
+        self._load_members()
+
         logger.debug(f"Initialized group storage at {self.db_path}")
 
     def _init_db(self) -> None:
@@ -37,6 +60,19 @@ class GroupStorage:
         cursor = conn.cursor()
 
         try:
+            version = cursor.execute("PRAGMA user_version").fetchone()[0]
+            if version >= SCHEMA_VERSION:
+                return
+
+            # Tables created before version 2 lack ON DELETE CASCADE;
+            # move them aside so they are recreated below
+            rebuilt = []
+            for table in ("group_members", "group_messages"):
+                fks = cursor.execute(f"PRAGMA foreign_key_list({table})").fetchall()
+                if fks and fks[0][6] != "CASCADE":
+                    cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+                    rebuilt.append(table)
+
             # Groups table
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS groups (
@@ -57,7 +93,7 @@ class GroupStorage:
                     role TEXT DEFAULT 'member',
                     joined_at INTEGER NOT NULL,
                     PRIMARY KEY (group_id, user_id),
-                    FOREIGN KEY (group_id) REFERENCES groups(id)
+                    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
                 )
             """)
 
@@ -69,10 +105,15 @@ class GroupStorage:
                     from_user TEXT NOT NULL,
                     content TEXT NOT NULL,
                     created_at INTEGER NOT NULL,
-                    FOREIGN KEY (group_id) REFERENCES groups(id)
+                    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
                 )
             """)
 
+            for table in rebuilt:
+                cursor.execute(f"INSERT INTO {table} SELECT * FROM {table}_old")
+                cursor.execute(f"DROP TABLE {table}_old")
+
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
             conn.commit()
             logger.debug("Group storage tables initialized")
 
@@ -82,6 +123,57 @@ class GroupStorage:
         finally:
             conn.close()
 
+    def _load_members(self) -> None:
+        """Load all group memberships into the in-memory cache."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute("SELECT group_id, user_id, role FROM group_members")
+            for group_id, user_id, role in cursor.fetchall():
+                self._members.setdefault(group_id, {})[user_id] = role
+
+        except Exception as e:
+            logger.error(f"Failed to load group members: {e}")
+        finally:
+            conn.close()
+
+    def _get_members(self, group_id: str) -> Dict[str, str]:
+        """
+        Get cached member roles for a group.
+
+        Falls back to the database for groups not yet in the cache
+        (e.g. created by another storage instance).
+
+        Args:
+            group_id: Group ID
+
+        Returns:
+            Dict mapping user ID to role
+        """
+        members = self._members.get(group_id)
+        if members is not None:
+            return members
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute(
+                "SELECT user_id, role FROM group_members WHERE group_id = ?",
+                (group_id,)
+            )
+            members = dict(cursor.fetchall())
+            if members:
+                self._members[group_id] = members
+            return members
+
+        except Exception as e:
+            logger.error(f"Failed to load members for group {group_id}: {e}")
+            return {}
+        finally:
+            conn.close()
+
     def create_group(
         self,
         name: str,
@@ -131,6 +223,10 @@ class GroupStorage:
             conn.commit()
             logger.info(f"Created group {group_id}: {name}")
 
+            members = {m: "member" for m in (member_ids or [])}
+            members[self.user_id] = "owner"
+            self._members[group_id] = members
+
             return {
                 "id": group_id,
                 "name": name,
@@ -167,28 +263,21 @@ class GroupStorage:
 
         try:
             cursor.execute(
-                "SELECT * FROM groups WHERE id = ?",
+                f"SELECT {_GROUP_COLUMNS} FROM groups WHERE id = ?",
                 (group_id,)
             )
             row = cursor.fetchone()
 
             if row:
+                group = dict(row)
+
                 # Get members
                 cursor.execute(
                     "SELECT user_id, role FROM group_members WHERE group_id = ?",
                     (group_id,)
                 )
-                members = [dict(m) for m in cursor.fetchall()]
-
-                return {
-                    "id": row["id"],
-                    "name": row["name"],
-                    "description": row["description"],
-                    "owner_id": row["owner_id"],
-                    "created_at": row["created_at"],
-                    "updated_at": row["updated_at"],
-                    "members": members,
-                }
+                group["members"] = [dict(m) for m in cursor.fetchall()]
+                return group
             return None
 
         except Exception as e:
@@ -211,30 +300,21 @@ class GroupStorage:
         try:
             # Get groups where user is member
             cursor.execute("""
-                SELECT g.* FROM groups g
+                SELECT g.id, g.name, g.description, g.owner_id, g.created_at, g.updated_at
+                FROM groups g
                 INNER JOIN group_members gm ON g.id = gm.group_id
                 WHERE gm.user_id = ?
                 ORDER BY g.updated_at DESC
             """, (self.user_id,))
 
-            groups = []
-            for row in cursor.fetchall():
+            groups = [dict(row) for row in cursor.fetchall()]
+            for group in groups:
                 # Get members for each group
                 cursor.execute(
                     "SELECT user_id, role FROM group_members WHERE group_id = ?",
-                    (row["id"],)
+                    (group["id"],)
                 )
-                members = [dict(m) for m in cursor.fetchall()]
-
-                groups.append({
-                    "id": row["id"],
-                    "name": row["name"],
-                    "description": row["description"],
-                    "owner_id": row["owner_id"],
-                    "created_at": row["created_at"],
-                    "updated_at": row["updated_at"],
-                    "members": members,
-                })
+                group["members"] = [dict(m) for m in cursor.fetchall()]
 
             return groups
 
@@ -275,6 +355,10 @@ class GroupStorage:
             )
 
             conn.commit()
+            # Groups not cached yet are loaded in full by _get_members
+            members = self._members.get(group_id)
+            if members is not None:
+                members.setdefault(member_id, role)
             logger.info(f"Added {member_id} to group {group_id}")
             return True
 
@@ -314,6 +398,9 @@ class GroupStorage:
             )
 
             conn.commit()
+            members = self._members.get(group_id)
+            if members is not None:
+                members.pop(member_id, None)
             logger.info(f"Removed {member_id} from group {group_id}")
             return True
 
@@ -350,10 +437,10 @@ class GroupStorage:
         cursor = conn.cursor()
 
         try:
-            cursor.execute("""
-                INSERT INTO group_messages (id, group_id, from_user, content, created_at)
-                VALUES (?, ?, ?, ?, ?)
-            """, (message_id, group_id, from_user, content, now))
+            cursor.execute(
+                _INSERT_MESSAGE_SQL,
+                (message_id, group_id, from_user, content, now)
+            )
 
             cursor.execute(
                 "UPDATE groups SET updated_at = ? WHERE id = ?",
@@ -371,6 +458,51 @@ class GroupStorage:
         finally:
             conn.close()
 
+    def save_group_messages(
+        self,
+        group_id: str,
+        messages: List[Tuple[str, str]],
+    ) -> bool:
+        """
+        Save several group messages in a single transaction.
+
+        Args:
+            group_id: Group ID
+            messages: List of (from_user, content) tuples, in send order
+
+        Returns:
+            True if successful
+        """
+        import time
+
+        now = int(time.time())
+        rows = [
+            (str(uuid.uuid4()), group_id, from_user, content, now)
+            for from_user, content in messages
+        ]
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        try:
+            cursor.executemany(_INSERT_MESSAGE_SQL, rows)
+
+            cursor.execute(
+                "UPDATE groups SET updated_at = ? WHERE id = ?",
+                (now, group_id)
+            )
+
+            conn.commit()
+            logger.debug(f"Saved {len(rows)} messages to group {group_id}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to save group messages: {e}")
+            conn.rollback()
+            return False
+        finally:
+            conn.close()
+
     def get_group_messages(self, group_id: str, limit: int = 50) -> List[Dict]:
         """
         Get group messages.
@@ -388,23 +520,14 @@ class GroupStorage:
 
         try:
             cursor.execute("""
-                SELECT * FROM group_messages
+                SELECT id, group_id, from_user, content, created_at
+                FROM group_messages
                 WHERE group_id = ?
                 ORDER BY created_at ASC
                 LIMIT ?
             """, (group_id, limit))
 
-            messages = []
-            for row in cursor.fetchall():
-                messages.append({
-                    "id": row["id"],
-                    "group_id": row["group_id"],
-                    "from_user": row["from_user"],
-                    "content": row["content"],
-                    "created_at": row["created_at"],
-                })
-
-            return messages
+            return [dict(row) for row in cursor.fetchall()]
 
         except Exception as e:
             logger.error(f"Failed to get group messages: {e}")
@@ -423,21 +546,7 @@ class GroupStorage:
         Returns:
             True if user is member
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        try:
-            cursor.execute(
-                "SELECT 1 FROM group_members WHERE group_id = ? AND user_id = ?",
-                (group_id, user_id)
-            )
-            return cursor.fetchone() is not None
-
-        except Exception as e:
-            logger.error(f"Failed to check membership: {e}")
-            return False
-        finally:
-            conn.close()
+        return user_id in self._get_members(group_id)
 
     def is_owner(self, group_id: str, user_id: str) -> bool:
         """
@@ -450,21 +559,7 @@ class GroupStorage:
         Returns:
             True if user is owner
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        try:
-            cursor.execute(
-                "SELECT 1 FROM group_members WHERE group_id = ? AND user_id = ? AND role = 'owner'",
-                (group_id, user_id)
-            )
-            return cursor.fetchone() is not None
-
-        except Exception as e:
-            logger.error(f"Failed to check ownership: {e}")
-            return False
-        finally:
-            conn.close()
+        return self._get_members(group_id).get(user_id) == "owner"
 
     def get_member_role(self, group_id: str, user_id: str) -> Optional[str]:
         """
@@ -477,22 +572,7 @@ class GroupStorage:
         Returns:
             Role string or None
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        try:
-            cursor.execute(
-                "SELECT role FROM group_members WHERE group_id = ? AND user_id = ?",
-                (group_id, user_id)
-            )
-            row = cursor.fetchone()
-            return row[0] if row else None
-
-        except Exception as e:
-            logger.error(f"Failed to get member role: {e}")
-            return None
-        finally:
-            conn.close()
+        return self._get_members(group_id).get(user_id)
 
     def delete_group(self, group_id: str) -> bool:
         """
@@ -508,25 +588,15 @@ class GroupStorage:
         cursor = conn.cursor()
 
         try:
-            # Delete group messages
-            cursor.execute(
-                "DELETE FROM group_messages WHERE group_id = ?",
-                (group_id,)
-            )
-
-            # Delete group members
-            cursor.execute(
-                "DELETE FROM group_members WHERE group_id = ?",
-                (group_id,)
-            )
-
-            # Delete group
+            # Members and messages are removed by ON DELETE CASCADE
+            cursor.execute("PRAGMA foreign_keys = ON")
             cursor.execute(
                 "DELETE FROM groups WHERE id = ?",
                 (group_id,)
             )
 
             conn.commit()
+            self._members.pop(group_id, None)
             logger.info(f"Deleted group {group_id}")
             return True
 
@@ -3,9 +3,10 @@
 import json
 import logging
 import os
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, Optional, Any
-import base64
+import binascii
 
 try:
     from cryptography.hazmat.primitives.ciphers.aead import AESGCM
@@ -14,21 +15,49 @@ try:
 except ImportError:
     raise ImportError("cryptography package required for encrypted key storage")
 
+try:
+    # argon2-cffi wraps the optimized phc-winner-argon2 build; output is identical
+    from argon2.low_level import Type, hash_secret_raw
+except ImportError:
+    hash_secret_raw = None
+
 logger = logging.getLogger(__name__)
 
+# Argon2id parameters
+ARGON2_LENGTH = 32  # 256-bit key for AES-256
+ARGON2_LANES = 4  # parallelism
+ARGON2_MEMORY_COST = 65536  # 64MB
+ARGON2_ITERATIONS = 3
+
+
+@dataclass(frozen=True)
+class Argon2Params:
+    """Argon2id cost parameters used to derive the storage key."""
+
+    memory_cost: int = ARGON2_MEMORY_COST
+    iterations: int = ARGON2_ITERATIONS
+    lanes: int = ARGON2_LANES
+
 
 class KeyStorage:
     """Encrypted storage for cryptographic keys."""
 
-    def __init__(self, storage_path: str, user_id: str):
+    def __init__(
+        self,
+        storage_path: str,
+        user_id: str,
+        kdf_params: Optional[Argon2Params] = None,
+    ):
         """
         Initialize encrypted key storage.
 
         Args:
             storage_path: Base storage directory path
             user_id: Current user ID
+            kdf_params: Argon2id cost parameters (defaults to Argon2Params())
         """
         self.user_id = user_id
+        self.kdf_params = kdf_params or Argon2Params()
         self.storage_path = Path(storage_path).expanduser()
         self.storage_path.mkdir(parents=True, exist_ok=True)
 
@@ -38,12 +67,13 @@ class KeyStorage:
 
         logger.debug(f"Initialized key storage at {self.keys_file}")
 
-    def _derive_key(self, password: bytes) -> bytes:
+    def _derive_key(self, password: bytes, params: Optional[Argon2Params] = None) -> bytes:
         """
         Derive encryption key from password using Argon2id.
 
         Args:
             password: User password
+            params: Argon2id costs to use (defaults to this storage's kdf_params)
 
         Returns:
             32-byte derived key
@@ -52,13 +82,27 @@ class KeyStorage:
             # Generate new salt for new keys
             self.salt = secrets.token_bytes(16)
 
+        if params is None:
+            params = self.kdf_params
+
+        if hash_secret_raw is not None:
+            return hash_secret_raw(
+                password,
+                self.salt,
+                time_cost=params.iterations,
+                memory_cost=params.memory_cost,
+                parallelism=params.lanes,
+                hash_len=ARGON2_LENGTH,
+                type=Type.ID,
+            )
+
         # Argon2id KDF with cryptography library
         kdf = Argon2id(
             salt=self.salt,
-            length=32,  # 256-bit key for AES-256
-            lanes=4,  # parallelism
-            memory_cost=65536,  # 64MB
-            iterations=3,
+            length=ARGON2_LENGTH,
+            lanes=params.lanes,
+            memory_cost=params.memory_cost,
+            iterations=params.iterations,
         )
 
         derived_key = kdf.derive(password)
@@ -88,8 +132,8 @@ class KeyStorage:
             # Generate nonce
             nonce = secrets.token_bytes(12)
 
-            # Serialize keys data
-            json_data = json.dumps(keys_data).encode()
+            # Serialize keys data (compact, never shown to the user)
+            json_data = json.dumps(keys_data, separators=(",", ":")).encode()
 
             # Encrypt
             cipher = AESGCM(derived_key)
@@ -98,9 +142,14 @@ class KeyStorage:
             # Prepare storage
             storage_data = {
                 "version": "1.0",
-                "salt": base64.b64encode(self.salt).decode(),
-                "nonce": base64.b64encode(nonce).decode(),
-                "ciphertext": base64.b64encode(ciphertext).decode(),
+                "salt": binascii.b2a_base64(self.salt, newline=False).decode(),
+                "kdf": {
+                    "memory_cost": self.kdf_params.memory_cost,
+                    "iterations": self.kdf_params.iterations,
+                    "lanes": self.kdf_params.lanes,
+                },
+                "nonce": binascii.b2a_base64(nonce, newline=False).decode(),
+                "ciphertext": binascii.b2a_base64(ciphertext, newline=False).decode(),
             }
 
             # Write to file with restricted permissions
@@ -137,24 +186,27 @@ class KeyStorage:
                 return None
 
             # Read file
-            with open(self.keys_file, "r") as f:
-                storage_data = json.load(f)
+            storage_data = json.loads(self.keys_file.read_bytes())
 
             # Extract components
-            self.salt = base64.b64decode(storage_data["salt"])
-            nonce = base64.b64decode(storage_data["nonce"])
-            ciphertext = base64.b64decode(storage_data["ciphertext"])
+            self.salt = binascii.a2b_base64(storage_data["salt"])
+            nonce = binascii.a2b_base64(storage_data["nonce"])
+            ciphertext = binascii.a2b_base64(storage_data["ciphertext"])
+
+            # Derive with the costs the file was written with; files saved
+            # before these were recorded used the original defaults
+            params = Argon2Params(**storage_data.get("kdf", {}))
 
             # Derive key
             password_bytes = password.encode()
-            derived_key = self._derive_key(password_bytes)
+            derived_key = self._derive_key(password_bytes, params)
 
             # Decrypt
             cipher = AESGCM(derived_key)
             plaintext = cipher.decrypt(nonce, ciphertext, None)
 
             # Deserialize
-            keys_data = json.loads(plaintext.decode())
+            keys_data = json.loads(plaintext)
 
             logger.info(f"Loaded encrypted keys from {self.keys_file}")
             return keys_data
@@ -210,7 +262,7 @@ class KeyStorage:
                 return json.dumps(keys_data, indent=2)
             elif export_format == "base64":
                 json_str = json.dumps(keys_data)
-                return base64.b64encode(json_str.encode()).decode()
+                return binascii.b2a_base64(json_str.encode(), newline=False).decode()
             else:
                 raise ValueError(f"Unknown export format: {export_format}")
 
@@ -239,8 +291,7 @@ class KeyStorage:
             if import_format == "json":
                 keys_data = json.loads(import_data)
             elif import_format == "base64":
-                json_str = base64.b64decode(import_data).decode()
-                keys_data = json.loads(json_str)
+                keys_data = json.loads(binascii.a2b_base64(import_data))
             else:
                 raise ValueError(f"Unknown import format: {import_format}")
 
@@ -265,13 +316,8 @@ class KeyStorage:
             backup_file = Path(backup_path).expanduser()
             backup_file.parent.mkdir(parents=True, exist_ok=True)
 
-            # Read current encrypted file
-            with open(self.keys_file, "rb") as src:
-                data = src.read()
-
-            # Write backup
-            with open(backup_file, "wb") as dst:
-                dst.write(data)
+            # Copy current encrypted file to backup
+            backup_file.write_bytes(self.keys_file.read_bytes())
 
             # Set permissions
             try:
@@ -303,11 +349,7 @@ class KeyStorage:
                 raise FileNotFoundError(f"Backup not found: {backup_path}")
 
             # Copy backup to keys file
-            with open(backup_file, "rb") as src:
-                data = src.read()
-
-            with open(self.keys_file, "wb") as dst:
-                dst.write(data)
+            self.keys_file.write_bytes(backup_file.read_bytes())
 
             # Set permissions
             try:
@@ -4,15 +4,32 @@ import json
 import logging
 import os
 import sqlite3
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from ..models import Message
 from ..exceptions import WhatsAppClientError
 
 logger = logging.getLogger(__name__)
 
+# Shared by save_message and save_messages; columns match _message_row()
+INSERT_MESSAGE_SQL = """
+    INSERT OR IGNORE INTO messages (
+        id, from_user, to_user, content, type, timestamp, status, encrypted, image_data
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Columns read back into a Message, in _row_to_message() order
+MESSAGE_COLUMNS = "id, from_user, to_user, content, type, timestamp, status, image_data"
+
+# Applied to every connection opened by MessageStorage._connect()
+CONNECTION_PRAGMAS = (
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",
+)
+
 
 class MessageStorage:
     """
@@ -26,26 +43,74 @@ class MessageStorage:
         Initialize message storage.
         
         Args:
-            storage_path: Base storage directory
+            storage_path: Base storage directory, or ":memory:" for a database
+                that lives only as long as this instance
             user_id: Current user ID
         """
-        self.storage_path = Path(storage_path).expanduser()
         self.user_id = user_id
+        self.in_memory = storage_path == ":memory:"
         
-        # Create storage directory
-        self.storage_path.mkdir(parents=True, exist_ok=True)
+        if self.in_memory:
+            # The database lives in this instance's connection
+            self.storage_path = None
+            self.db_path = ":memory:"
+        else:
+            self.storage_path = Path(storage_path).expanduser()
+            
+            # Create storage directory
+            self.storage_path.mkdir(parents=True, exist_ok=True)
+            
+            # Database path
+            self.db_path = self.storage_path / f"{user_id}_messages.db"
         
-        # Database path
-        self.db_path = self.storage_path / f"{user_id}_messages.db"
+        # Under WAL, synchronous=NORMAL only fsyncs at checkpoints. Set
+        # WHATSAPP_SQLITE_SAFE=1 to keep FULL when every commit must survive power loss.
+        self.synchronous = "FULL" if os.environ.get("WHATSAPP_SQLITE_SAFE") == "1" else "NORMAL"
+        
+        # Opened on first use and reused: the first statement on a fresh
+        # connection costs far more than the query itself
+        self._conn: Optional[sqlite3.Connection] = None
+        
+        # Messages buffered by bulk(), flushed in one transaction on exit
+        self._pending: Optional[List[Message]] = None
         
         # Initialize database
         self._init_db()
     
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Get this storage's connection, opening it with the storage PRAGMAs on first use.
+        
+        The connection is not tied to the creating thread, but an instance
+        should still only be used from one thread at a time.
+        """
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            self._conn = conn
+        return self._conn
+    
+    def close(self) -> None:
+        """
+        Close the database connection.
+        
+        A file-backed storage reopens it on the next call; an in-memory one
+        loses its data.
+        """
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
     def _init_db(self) -> None:
         """Initialize SQLite database schema."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
+        # WAL is persistent, so setting it once here covers later connections
+        cursor.execute("PRAGMA journal_mode = WAL")
+        
         # Messages table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS messages (
@@ -82,53 +147,181 @@ class MessageStorage:
             )
         """)
         
+        self.fts_enabled = self._init_fts(cursor)
+        
         conn.commit()
-        conn.close()
         
         logger.debug(f"Initialized message database: {self.db_path}")
     
+    def _init_fts(self, cursor: sqlite3.Cursor) -> bool:
+        """
+        Create the full-text index used by search_messages.
+        
+        The trigram tokenizer keeps the substring semantics of the old
+        ``LIKE '%query%'`` search while answering from an index.
+        
+        Args:
+            cursor: Cursor inside the schema transaction
+            
+        Returns:
+            True if the index is available, False if this SQLite build lacks
+            FTS5 or the trigram tokenizer
+        """
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+        ).fetchone()
+        
+        try:
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                    content, content='messages', content_rowid='rowid', tokenize='trigram'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            logger.debug(f"Full-text search unavailable, using LIKE: {e}")
+            return False
+        
+        # Keep the external-content index in sync with the messages table
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+                INSERT INTO messages_fts(rowid, content) VALUES (new.rowid, new.content);
+            END
+        """)
+        
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+                INSERT INTO messages_fts(messages_fts, rowid, content)
+                VALUES ('delete', old.rowid, old.content);
+            END
+        """)
+        
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages
+            BEGIN
+                INSERT INTO messages_fts(messages_fts, rowid, content)
+                VALUES ('delete', old.rowid, old.content);
+                INSERT INTO messages_fts(rowid, content) VALUES (new.rowid, new.content);
+            END
+        """)
+        
+        # Index messages stored before the FTS table existed
+        if not exists:
+            cursor.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+        
+        return True
+    
+    @staticmethod
+    def _message_row(message: Message) -> Tuple[Any, ...]:
+        """Build the INSERT parameters for a message."""
+        return (
+            message.id,
+            message.from_user,
+            message.to,
+            message.content,
+            message.type,
+            message.timestamp,
+            message.status,
+            1 if message.content.startswith("E2EE:") else 0,
+            message.image_data,
+        )
+    
+    @staticmethod
+    def _row_to_message(row: Tuple[Any, ...]) -> Message:
+        """Build a Message from a plain tuple row selected with MESSAGE_COLUMNS."""
+        message_id, from_user, to_user, content, message_type, timestamp, status, image_data = row
+        return Message(
+            id=message_id,
+            from_user=from_user,
+            to=to_user,
+            content=content,
+            type=message_type,
+            timestamp=timestamp,
+            status=status,
+            image_data=image_data,
+        )
+    
     def save_message(self, message: Message) -> None:
         """
         Save a message to storage.
         
+        Inside a ``bulk()`` block the message is buffered and written together
+        with the rest of the batch when the block exits.
+        
         Args:
             message: Message to save
         """
-        conn = sqlite3.connect(self.db_path)
+        if self._pending is not None:
+            self._pending.append(message)
+            return
+        
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
-            # Check if message already exists (deduplication)
-            cursor.execute("SELECT id FROM messages WHERE id = ?", (message.id,))
-            if cursor.fetchone():
-                logger.debug(f"Message {message.id} already exists, skipping")
-                return
-            
-            # Insert message
-            cursor.execute("""
-                INSERT INTO messages (
-                    id, from_user, to_user, content, type, timestamp, status, encrypted, image_data
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                message.id,
-                message.from_user,
-                message.to,
-                message.content,
-                message.type,
-                message.timestamp,
-                message.status,
-                1 if message.content.startswith("E2EE:") else 0,
-                message.image_data,
-            ))
+            # The primary key deduplicates: a repeated ID inserts nothing
+            cursor.execute(INSERT_MESSAGE_SQL, self._message_row(message))
             
             conn.commit()
-            logger.debug(f"Saved message {message.id} to storage")
+            if cursor.rowcount == 0:
+                logger.debug(f"Message {message.id} already exists, skipping")
+            else:
+                logger.debug(f"Saved message {message.id} to storage")
             
         except Exception as e:
+            conn.rollback()
             logger.error(f"Failed to save message: {e}")
             raise WhatsAppClientError(f"Failed to save message: {e}")
         finally:
-            conn.close()
+            cursor.close()
+    
+    def save_messages(self, messages: Iterable[Message]) -> None:
+        """
+        Save a batch of messages in a single transaction.
+        
+        Messages whose ID is already stored are skipped.
+        
+        Args:
+            messages: Messages to save
+        """
+        rows = [self._message_row(message) for message in messages]
+        if not rows:
+            return
+        
+        conn = self._connect()
+        
+        try:
+            with conn:
+                conn.executemany(INSERT_MESSAGE_SQL, rows)
+            
+            logger.debug(f"Saved {len(rows)} messages to storage")
+            
+        except Exception as e:
+            logger.error(f"Failed to save messages: {e}")
+            raise WhatsAppClientError(f"Failed to save messages: {e}")
+    
+    @contextmanager
+    def bulk(self) -> Iterator["MessageStorage"]:
+        """
+        Batch ``save_message`` calls into one transaction.
+        
+        Messages saved inside the block are written with ``save_messages``
+        when it exits without an error, and discarded otherwise.
+        
+        Yields:
+            This storage instance
+        """
+        if self._pending is not None:
+            # Nested block: the outermost one flushes
+            yield self
+            return
+        
+        self._pending = []
+        try:
+            yield self
+            pending = self._pending
+        finally:
+            self._pending = None
+        self.save_messages(pending)
     
     def update_message_status(self, message_id: str, status: str) -> None:
         """
@@ -138,7 +331,7 @@ class MessageStorage:
             message_id: Message ID
             status: New status (sent, delivered, read)
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -150,9 +343,10 @@ class MessageStorage:
             logger.debug(f"Updated message {message_id} status to {status}")
             
         except Exception as e:
+            conn.rollback()
             logger.error(f"Failed to update message status: {e}")
         finally:
-            conn.close()
+            cursor.close()
     
     def get_message_by_id(self, message_id: str) -> Optional[Message]:
         """
@@ -164,35 +358,25 @@ class MessageStorage:
         Returns:
             Message object or None if not found
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
             cursor.execute(
-                "SELECT * FROM messages WHERE id = ?",
+                f"SELECT {MESSAGE_COLUMNS} FROM messages WHERE id = ?",
                 (message_id,)
             )
             row = cursor.fetchone()
             
             if row:
-                return Message(
-                    id=row["id"],
-                    from_user=row["from_user"],
-                    to=row["to_user"],
-                    content=row["content"],
-                    type=row["type"],
-                    timestamp=row["timestamp"],
-                    status=row["status"],
-                    image_data=row["image_data"],
-                )
+                return self._row_to_message(row)
             return None
             
         except Exception as e:
             logger.error(f"Failed to get message: {e}")
             return None
         finally:
-            conn.close()
+            cursor.close()
     
     def get_messages(
         self,
@@ -211,14 +395,13 @@ class MessageStorage:
         Returns:
             List of messages in chronological order (oldest first)
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
             # Build query
-            query = """
-                SELECT * FROM messages
+            query = f"""
+                SELECT {MESSAGE_COLUMNS} FROM messages
                 WHERE (from_user = ? AND to_user = ?) OR (from_user = ? AND to_user = ?)
             """
             params = [self.user_id, peer_id, peer_id, self.user_id]
@@ -234,19 +417,7 @@ class MessageStorage:
             rows = cursor.fetchall()
             
             # Convert to Message objects (reverse for chronological order)
-            messages = []
-            for row in reversed(rows):
-                msg = Message(
-                    id=row["id"],
-                    from_user=row["from_user"],
-                    to=row["to_user"],
-                    content=row["content"],
-                    type=row["type"],
-                    timestamp=row["timestamp"],
-                    status=row["status"],
-                    image_data=row["image_data"],
-                )
-                messages.append(msg)
+            messages = [self._row_to_message(row) for row in reversed(rows)]
             
             logger.debug(f"Retrieved {len(messages)} messages with {peer_id}")
             return messages
@@ -255,7 +426,7 @@ class MessageStorage:
             logger.error(f"Failed to get messages: {e}")
             return []
         finally:
-            conn.close()
+            cursor.close()
     
     def get_recent_conversations(self, limit: int = 20) -> List[Dict[str, Any]]:
         """
@@ -267,42 +438,34 @@ class MessageStorage:
         Returns:
             List of conversation summaries with last message
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        conn = self._connect()
         cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
         
         try:
-            # Get last message for each peer
+            # Rank each peer's messages newest first and keep the top one, so
+            # timestamp ties still yield a single row per conversation
             query = """
-                WITH peer_messages AS (
-                    SELECT 
-                        CASE 
-                            WHEN from_user = ? THEN to_user
-                            ELSE from_user
-                        END as peer_id,
-                        MAX(timestamp) as last_timestamp
-                    FROM messages
-                    GROUP BY peer_id
-                )
-                SELECT 
-                    m.id,
-                    m.from_user,
-                    m.to_user,
-                    m.content,
-                    m.type,
-                    m.timestamp,
-                    m.status,
-                    m.image_data,
-                    pm.peer_id
-                FROM messages m
-                JOIN peer_messages pm ON (
-                    m.timestamp = pm.last_timestamp AND
-                    (
-                        (m.from_user = ? AND m.to_user = pm.peer_id) OR
-                        (m.to_user = ? AND m.from_user = pm.peer_id)
+                SELECT * FROM (
+                    SELECT
+                        *,
+                        ROW_NUMBER() OVER (
+                            PARTITION BY peer_id ORDER BY timestamp DESC, rowid DESC
+                        ) AS rank
+                    FROM (
+                        SELECT
+                            id, from_user, to_user, content, type, timestamp, status,
+                            image_data, rowid,
+                            CASE
+                                WHEN from_user = ? THEN to_user
+                                ELSE from_user
+                            END AS peer_id
+                        FROM messages
+                        WHERE from_user = ? OR to_user = ?
                     )
                 )
-                ORDER BY m.timestamp DESC
+                WHERE rank = 1
+                ORDER BY timestamp DESC
                 LIMIT ?
             """
             
@@ -332,7 +495,7 @@ class MessageStorage:
             logger.error(f"Failed to get conversations: {e}")
             return []
         finally:
-            conn.close()
+            cursor.close()
     
     def search_messages(
         self,
@@ -351,49 +514,48 @@ class MessageStorage:
         Returns:
             List of matching messages
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
-            # Build query
-            sql = """
-                SELECT * FROM messages
-                WHERE content LIKE ?
-            """
-            params = [f"%{query}%"]
+            # Build query. Trigrams need at least three characters, so shorter
+            # queries fall back to a LIKE scan.
+            if self.fts_enabled and len(query) >= 3:
+                sql = f"""
+                    SELECT {MESSAGE_COLUMNS} FROM messages m
+                    WHERE m.rowid IN (
+                        SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?
+                    )
+                """
+                # Quote as a single FTS phrase so operators in the query are literal
+                params = ['"' + query.replace('"', '""') + '"']
+            else:
+                sql = f"""
+                    SELECT {MESSAGE_COLUMNS} FROM messages m
+                    WHERE content LIKE ?
+                """
+                params = [f"%{query}%"]
             
             if peer_id:
-                sql += " AND ((from_user = ? AND to_user = ?) OR (from_user = ? AND to_user = ?))"
+                sql += (
+                    " AND ((m.from_user = ? AND m.to_user = ?)"
+                    " OR (m.from_user = ? AND m.to_user = ?))"
+                )
                 params.extend([self.user_id, peer_id, peer_id, self.user_id])
             
-            sql += " ORDER BY timestamp DESC LIMIT ?"
+            sql += " ORDER BY m.timestamp DESC LIMIT ?"
             params.append(limit)
             
             cursor.execute(sql, params)
             rows = cursor.fetchall()
             
-            messages = []
-            for row in rows:
-                msg = Message(
-                    id=row["id"],
-                    from_user=row["from_user"],
-                    to=row["to_user"],
-                    content=row["content"],
-                    type=row["type"],
-                    timestamp=row["timestamp"],
-                    status=row["status"],
-                    image_data=row["image_data"],
-                )
-                messages.append(msg)
-            
-            return messages
+            return [self._row_to_message(row) for row in rows]
             
         except Exception as e:
             logger.error(f"Failed to search messages: {e}")
             return []
         finally:
-            conn.close()
+            cursor.close()
     
     def delete_conversation(self, peer_id: str) -> int:
         """
@@ -405,7 +567,7 @@ class MessageStorage:
         Returns:
             Number of messages deleted
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -421,10 +583,11 @@ class MessageStorage:
             return deleted
             
         except Exception as e:
+            conn.rollback()
             logger.error(f"Failed to delete conversation: {e}")
             return 0
         finally:
-            conn.close()
+            cursor.close()
     
     def get_stats(self) -> Dict[str, int]:
         """
@@ -433,37 +596,24 @@ class MessageStorage:
         Returns:
             Dictionary with statistics
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
-            # Total messages
-            cursor.execute("SELECT COUNT(*) FROM messages")
-            total = cursor.fetchone()[0]
-            
-            # Messages sent
-            cursor.execute("SELECT COUNT(*) FROM messages WHERE from_user = ?", (self.user_id,))
-            sent = cursor.fetchone()[0]
-            
-            # Messages received
-            cursor.execute("SELECT COUNT(*) FROM messages WHERE to_user = ?", (self.user_id,))
-            received = cursor.fetchone()[0]
-            
-            # Encrypted messages
-            cursor.execute("SELECT COUNT(*) FROM messages WHERE encrypted = 1")
-            encrypted = cursor.fetchone()[0]
-            
-            # Unique peers
+            # One scan computes every counter; SUM() is NULL on an empty table
             cursor.execute("""
-                SELECT COUNT(DISTINCT peer_id) FROM (
-                    SELECT CASE 
+                SELECT
+                    COUNT(*),
+                    COALESCE(SUM(from_user = ?), 0),
+                    COALESCE(SUM(to_user = ?), 0),
+                    COALESCE(SUM(encrypted = 1), 0),
+                    COUNT(DISTINCT CASE
                         WHEN from_user = ? THEN to_user
                         ELSE from_user
-                    END as peer_id
-                    FROM messages
-                )
-            """, (self.user_id,))
-            peers = cursor.fetchone()[0]
+                    END)
+                FROM messages
+            """, (self.user_id, self.user_id, self.user_id))
+            total, sent, received, encrypted, peers = cursor.fetchone()
             
             return {
                 "total_messages": total,
@@ -477,4 +627,4 @@ class MessageStorage:
             logger.error(f"Failed to get stats: {e}")
             return {}
         finally:
-            conn.close()
+            cursor.close()
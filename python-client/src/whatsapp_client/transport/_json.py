@@ -0,0 +1,21 @@
+"""JSON codec shared by the REST and WebSocket transports."""
+
+import json
+from typing import Any
+
+try:
+    # orjson encodes and decodes bodies and frames several times faster than the json module
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(data: Any) -> str:
+    """Encode a request body or message frame as compact JSON text."""
+    if orjson is not None:
+        return orjson.dumps(data).decode()
+    return json.dumps(data, separators=(",", ":"))
+
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch one type
+loads = orjson.loads if orjson is not None else json.loads
@@ -4,10 +4,16 @@ import logging
 from typing import Any, Dict, Optional
 import aiohttp
 
+from . import _json
 from ..exceptions import ConnectionError as ClientConnectionError
 
 logger = logging.getLogger(__name__)
 
+# Keep idle pooled connections open across pauses between interactive
+# commands, so each request does not pay a new TLS handshake
+# (aiohttp's default is 15 seconds)
+KEEPALIVE_TIMEOUT = 120.0
+
 
 class RestClient:
     """Async REST API client."""
@@ -26,7 +32,10 @@ class RestClient:
     async def _ensure_session(self) -> aiohttp.ClientSession:
         """Ensure aiohttp session is created."""
         if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession()
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(keepalive_timeout=KEEPALIVE_TIMEOUT),
+                json_serialize=_json.dumps,
+            )
         return self._session
 
     def set_token(self, token: Optional[str]) -> None:
@@ -65,7 +74,7 @@ class RestClient:
         try:
             session = await self._ensure_session()
             async with session.post(url, json=data, headers=self._get_headers()) as response:
-                response_data = await response.json()
+                response_data = await response.json(loads=_json.loads)
                 logger.debug(f"Response status: {response.status}")
                 return response_data
 
@@ -98,7 +107,7 @@ class RestClient:
             async with session.get(
                 url, params=params, headers=self._get_headers()
             ) as response:
-                response_data = await response.json()
+                response_data = await response.json(loads=_json.loads)
                 logger.debug(f"Response status: {response.status}")
                 return response_data
 
@@ -130,7 +139,7 @@ class RestClient:
             async with session.delete(url, headers=self._get_headers()) as response:
                 # Handle both JSON and empty responses
                 if response.content_type == "application/json":
-                    response_data = await response.json()
+                    response_data = await response.json(loads=_json.loads)
                 else:
                     response_data = {"status": "ok"}
                 logger.debug(f"Response status: {response.status}")
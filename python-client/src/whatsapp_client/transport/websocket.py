@@ -1,6 +1,7 @@
 """WebSocket client for real-time communication."""
 
 import asyncio
+import inspect
 import json
 import logging
 from typing import Optional, Callable, Any, Dict
@@ -8,6 +9,7 @@ from enum import Enum
 
 import websockets
 
+from . import _json
 from ..exceptions import WhatsAppClientError
 
 logger = logging.getLogger(__name__)
@@ -242,7 +244,7 @@ class WebSocketClient:
         Register a message handler.
         
         Args:
-            handler: Async function to handle messages
+            handler: Function or async function to handle messages
             
         Returns:
             The handler (for decorator usage)
@@ -298,7 +300,7 @@ class WebSocketClient:
             raise WhatsAppClientError("WebSocket not connected")
         
         try:
-            data = json.dumps(message)
+            data = _json.dumps(message)
             logger.debug(f"Sending WebSocket message: {message.get('type')}")
             if message.get('type') == 'message':
                 # Log message details for debugging
@@ -317,7 +319,7 @@ class WebSocketClient:
         try:
             async for message in self._ws:
                 try:
-                    data = json.loads(message)
+                    data = _json.loads(message)
                     await self._route_message(data)
                 except json.JSONDecodeError as e:
                     logger.error(f"Invalid JSON received: {e}")
@@ -346,44 +348,45 @@ class WebSocketClient:
         msg_type = data.get("type")
         
         if msg_type == "message":
-            for handler in self._message_handlers:
-                try:
-                    await handler(data)
-                except Exception as e:
-                    logger.error(f"Message handler error: {e}")
+            await self._dispatch(self._message_handlers, data, "Message")
         
         elif msg_type == "typing":
-            for handler in self._typing_handlers:
-                try:
-                    await handler(data)
-                except Exception as e:
-                    logger.error(f"Typing handler error: {e}")
+            await self._dispatch(self._typing_handlers, data, "Typing")
         
         elif msg_type == "status":
-            for handler in self._status_handlers:
-                try:
-                    await handler(data)
-                except Exception as e:
-                    logger.error(f"Status handler error: {e}")
+            await self._dispatch(self._status_handlers, data, "Status")
         
         elif msg_type == "presence":
-            for handler in self._presence_handlers:
-                try:
-                    await handler(data)
-                except Exception as e:
-                    logger.error(f"Presence handler error: {e}")
+            await self._dispatch(self._presence_handlers, data, "Presence")
 
         elif msg_type == "read":
             # Read receipts - treat as status updates
-            for handler in self._status_handlers:
-                try:
-                    await handler(data)
-                except Exception as e:
-                    logger.error(f"Read receipt handler error: {e}")
+            await self._dispatch(self._status_handlers, data, "Read receipt")
 
         else:
             logger.debug(f"Unknown message type: {msg_type}")
     
+    @staticmethod
+    async def _dispatch(handlers: list, arg: Any, label: str) -> None:
+        """
+        Call each handler in order, awaiting only those that return an awaitable.
+        
+        Plain functions are called directly, so they can be registered alongside
+        coroutine functions. A failing handler is logged and does not stop the others.
+        
+        Args:
+            handlers: Registered handlers
+            arg: Value passed to each handler
+            label: Handler kind used in error logs
+        """
+        for handler in handlers:
+            try:
+                result = handler(arg)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"{label} handler error: {e}")
+    
     async def _schedule_reconnect(self) -> None:
         """Schedule reconnection with exponential backoff."""
         if self._reconnect_task and not self._reconnect_task.done():
@@ -430,8 +433,4 @@ class WebSocketClient:
         Args:
             connected: True if connected, False if disconnected
         """
-        for handler in self._connection_handlers:
-            try:
-                await handler(connected)
-            except Exception as e:
-                logger.error(f"Connection handler error: {e}")
+        await self._dispatch(self._connection_handlers, connected, "Connection")
@@ -0,0 +1,38 @@
+"""Shared pytest fixtures."""
+
+import pytest
+
+from whatsapp_client import WhatsAppClient
+from whatsapp_client.storage import Argon2Params, FingerprintStorage, GroupStorage, KeyStorage
+
+
+@pytest.fixture(scope="session")
+def fast_kdf():
+    """Cheapest Argon2id costs; pass as kdf_params wherever a test derives a storage key."""
+    return Argon2Params(memory_cost=8, iterations=1, lanes=1)
+
+
+@pytest.fixture
+def auth_client():
+    """Client that appears logged in as user_123."""
+    client = WhatsAppClient(server_url="http://test.com")
+    client._auth._user_id = "user_123"
+    return client
+
+
+@pytest.fixture
+def fp_storage(tmp_path):
+    """Create fingerprint storage in a temporary directory."""
+    return FingerprintStorage("test_user", str(tmp_path))
+
+
+@pytest.fixture
+def group_storage(tmp_path):
+    """Create group storage in a temporary directory."""
+    return GroupStorage(str(tmp_path), "test_user")
+
+
+@pytest.fixture
+def key_storage(tmp_path, fast_kdf):
+    """Create key storage with the cheapest Argon2id costs; tests check persistence only."""
+    return KeyStorage(str(tmp_path), "test_user", kdf_params=fast_kdf)
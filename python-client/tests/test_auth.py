@@ -17,9 +17,9 @@ from whatsapp_client.exceptions import (
 
 
 @pytest.fixture
-def client():
+def client(fast_kdf):
     """Create a test client."""
-    return WhatsAppClient(server_url="http://localhost:8787")
+    return WhatsAppClient(server_url="http://localhost:8787", kdf_params=fast_kdf)
 
 
 # ============================================================================
@@ -312,16 +312,16 @@ async def test_tc_auth_008_verify_uuid_v4_format(client):
 
 
 @pytest.mark.asyncio
-async def test_tc_auth_009_verify_uuid_uniqueness():
+async def test_tc_auth_009_verify_uuid_uniqueness(fast_kdf):
     """TC-AUTH-009: Verify UUID uniqueness across users.
     
     Requirement: FR-AUTH-003
     Priority: High
     Type: Integration Test
     """
-    client1 = WhatsAppClient(server_url="http://localhost:8787")
-    client2 = WhatsAppClient(server_url="http://localhost:8787")
-    client3 = WhatsAppClient(server_url="http://localhost:8787")
+    client1 = WhatsAppClient(server_url="http://localhost:8787", kdf_params=fast_kdf)
+    client2 = WhatsAppClient(server_url="http://localhost:8787", kdf_params=fast_kdf)
+    client3 = WhatsAppClient(server_url="http://localhost:8787", kdf_params=fast_kdf)
     
     mock_responses = [
         {"id": "550e8400-e29b-41d4-a716-446655440001", "username": "user1", "token": "token1", "avatar": None, "lastSeen": 1234567890, "role": "user", "is_active": 1, "can_send_images": 1, "created_at": 1234567890},
@@ -555,6 +555,40 @@ async def test_logout(client):
     assert client._key_manager is None
 
 
+@pytest.mark.asyncio
+async def test_login_again_closes_previous_message_storage(tmp_path, fast_kdf):
+    """Test that logging in again closes the previous login's message database."""
+    client = WhatsAppClient(
+        server_url="http://localhost:8787",
+        storage_path=str(tmp_path),
+        auto_connect=False,
+        kdf_params=fast_kdf,
+    )
+    mock_response = {
+        "id": "user_123",
+        "username": "alice",
+        "avatar": None,
+        "lastSeen": 1234567890,
+        "role": "user",
+        "is_active": 1,
+        "can_send_images": 1,
+        "created_at": 1234567890,
+        "token": "test_token",
+    }
+    mock_upload_response = {"success": True}
+
+    with patch.object(client._rest, "post", new=AsyncMock(side_effect=[mock_response, mock_upload_response] * 2)):
+        await client.login("alice", "password123")
+        first_storage = client._message_storage
+        first_storage._connect()
+
+        await client.login("alice", "password123")
+
+    assert client._message_storage is not first_storage
+    assert first_storage._conn is None
+    await client.close()
+
+
 @pytest.mark.asyncio
 async def test_context_manager():
     """Test async context manager."""
@@ -564,9 +598,9 @@ async def test_context_manager():
 
 
 @pytest.mark.asyncio
-async def test_close():
+async def test_close(fast_kdf):
     """Test client cleanup."""
-    client = WhatsAppClient(server_url="http://localhost:8787")
+    client = WhatsAppClient(server_url="http://localhost:8787", kdf_params=fast_kdf)
 
     # Mock login
     mock_response = {
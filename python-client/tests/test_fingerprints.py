@@ -3,8 +3,6 @@
 import pytest
 import sqlite3
 from unittest.mock import AsyncMock, MagicMock, patch, mock_open
-from pathlib import Path
-import tempfile
 import os
 
 from whatsapp_client.client import WhatsAppClient
@@ -17,97 +15,87 @@ from cryptography.hazmat.primitives.asymmetric import x25519
 class TestFingerprintStorage:
     """Test FingerprintStorage class."""
 
-    def setup_method(self):
-        """Set up test fixtures."""
-        self.temp_dir = tempfile.mkdtemp()
-        self.storage = FingerprintStorage(self.temp_dir, "test_user")
-
-    def teardown_method(self):
-        """Clean up."""
-        import shutil
-        shutil.rmtree(self.temp_dir, ignore_errors=True)
-
-    def test_save_and_get_fingerprint(self):
+    def test_save_and_get_fingerprint(self, fp_storage):
         """Test saving and retrieving fingerprint."""
         peer_id = "peer_123"
         identity_key = "identity_key_data"
         fingerprint = "A1B2C3D4E5F6" * 5  # 60 chars
 
-        self.storage.save_fingerprint(peer_id, identity_key, fingerprint)
+        fp_storage.save_fingerprint(peer_id, identity_key, fingerprint)
 
-        result = self.storage.get_fingerprint(peer_id)
+        result = fp_storage.get_fingerprint(peer_id)
         assert result is not None
         assert result["peer_id"] == peer_id
         assert result["fingerprint"] == fingerprint
         assert result["identity_key"] == identity_key
         assert result["verified"] == False
 
-    def test_save_fingerprint_overwrites_existing(self):
+    def test_save_fingerprint_overwrites_existing(self, fp_storage):
         """Test that saving overwrites existing fingerprint."""
         peer_id = "peer_123"
         fp1 = "A1B2C3D4E5F6" * 5
         fp2 = "F6E5D4C3B2A1" * 5
 
-        self.storage.save_fingerprint(peer_id, "id_key1", fp1)
-        self.storage.save_fingerprint(peer_id, "id_key2", fp2)
+        fp_storage.save_fingerprint(peer_id, "id_key1", fp1)
+        fp_storage.save_fingerprint(peer_id, "id_key2", fp2)
 
-        result = self.storage.get_fingerprint(peer_id)
+        result = fp_storage.get_fingerprint(peer_id)
         assert result["fingerprint"] == fp2
         assert result["identity_key"] == "id_key2"
 
-    def test_verify_fingerprint(self):
+    def test_verify_fingerprint(self, fp_storage):
         """Test verifying a fingerprint."""
         peer_id = "peer_123"
         fingerprint = "A1B2C3D4E5F6" * 5
 
-        self.storage.save_fingerprint(peer_id, "id_key", fingerprint)
-        assert self.storage.is_verified(peer_id) == False
+        fp_storage.save_fingerprint(peer_id, "id_key", fingerprint)
+        assert fp_storage.is_verified(peer_id) == False
 
         # Verify
-        success = self.storage.verify_fingerprint(peer_id, True)
+        success = fp_storage.verify_fingerprint(peer_id, True)
         assert success == True
-        assert self.storage.is_verified(peer_id) == True
+        assert fp_storage.is_verified(peer_id) == True
 
         # Unverify
-        success = self.storage.verify_fingerprint(peer_id, False)
+        success = fp_storage.verify_fingerprint(peer_id, False)
         assert success == True
-        assert self.storage.is_verified(peer_id) == False
+        assert fp_storage.is_verified(peer_id) == False
 
-    def test_get_nonexistent_fingerprint(self):
+    def test_get_nonexistent_fingerprint(self, fp_storage):
         """Test getting nonexistent fingerprint returns None."""
-        result = self.storage.get_fingerprint("nonexistent")
+        result = fp_storage.get_fingerprint("nonexistent")
         assert result is None
 
-    def test_is_verified_nonexistent(self):
+    def test_is_verified_nonexistent(self, fp_storage):
         """Test checking if nonexistent fingerprint is verified."""
-        result = self.storage.is_verified("nonexistent")
+        result = fp_storage.is_verified("nonexistent")
         assert result == False
 
-    def test_delete_fingerprint(self):
+    def test_delete_fingerprint(self, fp_storage):
         """Test deleting a fingerprint."""
         peer_id = "peer_123"
         fingerprint = "A1B2C3D4E5F6" * 5
 
-        self.storage.save_fingerprint(peer_id, "id_key", fingerprint)
-        assert self.storage.get_fingerprint(peer_id) is not None
+        fp_storage.save_fingerprint(peer_id, "id_key", fingerprint)
+        assert fp_storage.get_fingerprint(peer_id) is not None
 
         # Delete
-        self.storage.delete_fingerprint(peer_id)
-        assert self.storage.get_fingerprint(peer_id) is None
+        fp_storage.delete_fingerprint(peer_id)
+        assert fp_storage.get_fingerprint(peer_id) is None
 
-    def test_get_verified_fingerprints(self):
+    def test_get_verified_fingerprints(self, fp_storage):
         """Test retrieving all verified fingerprints."""
         # Add some fingerprints
-        self.storage.save_fingerprint("peer_1", "id1", "A1B2C3D4E5F6" * 5)
-        self.storage.save_fingerprint("peer_2", "id2", "F6E5D4C3B2A1" * 5)
-        self.storage.save_fingerprint("peer_3", "id3", "C3B2A1F6E5D4" * 5)
+        fp_storage.save_fingerprint("peer_1", "id1", "A1B2C3D4E5F6" * 5)
+        fp_storage.save_fingerprint("peer_2", "id2", "F6E5D4C3B2A1" * 5)
+        fp_storage.save_fingerprint("peer_3", "id3", "C3B2A1F6E5D4" * 5)
 
         # Verify some
-        self.storage.verify_fingerprint("peer_1", True)
-        self.storage.verify_fingerprint("peer_3", True)
+        fp_storage.verify_fingerprint("peer_1", True)
+        fp_storage.verify_fingerprint("peer_3", True)
 
         # Get verified
-        verified = self.storage.get_verified_fingerprints()
+        verified = fp_storage.get_verified_fingerprints()
         assert len(verified) == 2
 
         peer_ids = [v["peer_id"] for v in verified]
@@ -115,28 +103,31 @@ class TestFingerprintStorage:
         assert "peer_3" in peer_ids
         assert "peer_2" not in peer_ids
 
-    def test_get_all_fingerprints(self):
+    def test_get_all_fingerprints(self, fp_storage):
         """Test retrieving all fingerprints."""
         # Use unique peer IDs to avoid conflicts from other tests
-        self.storage.save_fingerprint("peer_unique_1", "id1", "A1B2C3D4E5F6" * 5)
-        self.storage.save_fingerprint("peer_unique_2", "id2", "F6E5D4C3B2A1" * 5)
+        fp_storage.save_fingerprint("peer_unique_1", "id1", "A1B2C3D4E5F6" * 5)
+        fp_storage.save_fingerprint("peer_unique_2", "id2", "F6E5D4C3B2A1" * 5)
+
+        all_fps = fp_storage.get_all_fingerprints()
+        assert len(all_fps) == 2
 
         # Count only our new fingerprints
-        all_fps = self.storage.get_all_fingerprints()
-        our_fps = [fp for fp in all_fps if fp["peer_id"].startswith("peer_unique")]
-        assert len(our_fps) == 2
+        our_fps = fp_storage.get_fingerprints_by_prefix("peer_unique")
+        assert [fp["peer_id"] for fp in our_fps] == ["peer_unique_1", "peer_unique_2"]
+        assert fp_storage.get_fingerprints_by_prefix("peer_other") == []
 
-    def test_fingerprint_persistence(self):
+    def test_fingerprint_persistence(self, fp_storage, tmp_path):
         """Test fingerprints persist across instances."""
         peer_id = "peer_123"
         fingerprint = "A1B2C3D4E5F6" * 5
 
-        storage1 = FingerprintStorage(self.temp_dir, "test_user")
+        storage1 = FingerprintStorage("test_user", str(tmp_path))
         storage1.save_fingerprint(peer_id, "id_key", fingerprint)
         storage1.verify_fingerprint(peer_id, True)
 
         # Create new instance
-        storage2 = FingerprintStorage(self.temp_dir, "test_user")
+        storage2 = FingerprintStorage("test_user", str(tmp_path))
         result = storage2.get_fingerprint(peer_id)
 
         assert result is not None
@@ -187,6 +178,7 @@ class TestClientFingerprintMethods:
         """Test comparing None fingerprints."""
         assert WhatsAppClient.compare_fingerprints(None, None) == False
         assert WhatsAppClient.compare_fingerprints("A1B2C3D4E5F6" * 5, None) == False
+        assert WhatsAppClient.compare_fingerprints(None, "A1B2C3D4E5F6" * 5) == False
     
     def test_get_own_fingerprint_not_authenticated(self):
         """Test getting fingerprint without authentication."""
@@ -199,135 +191,112 @@ class TestClientFingerprintMethods:
 class TestFingerprintIntegration:
     """Integration tests for fingerprint verification."""
 
-    def test_fingerprint_lifecycle(self):
+    def test_fingerprint_lifecycle(self, tmp_path):
         """Test complete fingerprint storage lifecycle."""
-        temp_dir = tempfile.mkdtemp()
-        
-        try:
-            storage = FingerprintStorage("test_user", temp_dir)
-            
-            # 1. Save fingerprint
-            peer_id = "alice"
-            identity_key = "alice_identity_key_123"
-            fingerprint = "A1B2C3D4E5" * 12  # 60 chars
-            
-            storage.save_fingerprint(peer_id, identity_key, fingerprint)
-            
-            # 2. Retrieve fingerprint
-            fp = storage.get_fingerprint(peer_id)
-            assert fp is not None
-            assert fp["peer_id"] == peer_id
-            assert fp["fingerprint"] == fingerprint
-            assert fp["verified"] == False
-            
-            # 3. Verify fingerprint
-            result = storage.verify_fingerprint(peer_id, True)
-            assert result == True
-            
-            # 4. Check verified status
-            assert storage.is_verified(peer_id) == True
-            
-            # 5. Get verified list
-            verified = storage.get_verified_fingerprints()
-            assert len(verified) >= 1
-            
-            # 6. Unverify
-            storage.verify_fingerprint(peer_id, False)
-            assert storage.is_verified(peer_id) == False
-            
-            # 7. Delete
-            storage.delete_fingerprint(peer_id)
-            assert storage.get_fingerprint(peer_id) is None
-            
-        finally:
-            import shutil
-            shutil.rmtree(temp_dir, ignore_errors=True)
+        storage = FingerprintStorage("test_user", str(tmp_path))
+
+        # 1. Save fingerprint
+        peer_id = "alice"
+        identity_key = "alice_identity_key_123"
+        fingerprint = "A1B2C3D4E5" * 12  # 60 chars
+
+        storage.save_fingerprint(peer_id, identity_key, fingerprint)
+
+        # 2. Retrieve fingerprint
+        fp = storage.get_fingerprint(peer_id)
+        assert fp is not None
+        assert fp["peer_id"] == peer_id
+        assert fp["fingerprint"] == fingerprint
+        assert fp["verified"] == False
+
+        # 3. Verify fingerprint
+        result = storage.verify_fingerprint(peer_id, True)
+        assert result == True
+
+        # 4. Check verified status
+        assert storage.is_verified(peer_id) == True
+
+        # 5. Get verified list
+        verified = storage.get_verified_fingerprints()
+        assert len(verified) >= 1
+
+        # 6. Unverify
+        storage.verify_fingerprint(peer_id, False)
+        assert storage.is_verified(peer_id) == False
+
+        # 7. Delete
+        storage.delete_fingerprint(peer_id)
+        assert storage.get_fingerprint(peer_id) is None
     
-    def test_multiple_peer_fingerprints(self):
+    def test_multiple_peer_fingerprints(self, tmp_path):
         """Test managing multiple peer fingerprints."""
-        temp_dir = tempfile.mkdtemp()
-        
-        try:
-            storage = FingerprintStorage("test_user", temp_dir)
-            
-            # Add multiple peers
-            peers = ["alice", "bob", "charlie"]
-            for peer in peers:
-                fp = "F" * 60
-                storage.save_fingerprint(peer, f"{peer}_key", fp)
-            
-            # Verify some
-            storage.verify_fingerprint("alice", True)
-            storage.verify_fingerprint("charlie", True)
-            
-            # Get all fingerprints
-            all_fps = storage.get_all_fingerprints()
-            assert len(all_fps) >= 3
-            
-            # Get verified only
-            verified = storage.get_verified_fingerprints()
-            assert len(verified) >= 2
-            
-            verified_peers = [v["peer_id"] for v in verified]
-            assert "alice" in verified_peers
-            assert "charlie" in verified_peers
-            assert "bob" not in verified_peers
-            
-        finally:
-            import shutil
-            shutil.rmtree(temp_dir, ignore_errors=True)
+        storage = FingerprintStorage("test_user", str(tmp_path))
+
+        # Add multiple peers
+        peers = ["alice", "bob", "charlie"]
+        for peer in peers:
+            fp = "F" * 60
+            storage.save_fingerprint(peer, f"{peer}_key", fp)
+
+        # Verify some
+        storage.verify_fingerprint("alice", True)
+        storage.verify_fingerprint("charlie", True)
+
+        # Get all fingerprints
+        all_fps = storage.get_all_fingerprints()
+        assert len(all_fps) == 3
+
+        # Look up by peer ID prefix
+        matches = storage.get_fingerprints_by_prefix("ch")
+        assert [fp["peer_id"] for fp in matches] == ["charlie"]
+        assert matches[0]["verified"] == True
+
+        # Get verified only
+        verified = storage.get_verified_fingerprints()
+        assert len(verified) >= 2
+
+        verified_peers = [v["peer_id"] for v in verified]
+        assert "alice" in verified_peers
+        assert "charlie" in verified_peers
+        assert "bob" not in verified_peers
 
 
 class TestFingerprintSchema:
     """Test fingerprint database schema."""
 
-    def test_fingerprint_schema_creation(self):
+    def test_fingerprint_schema_creation(self, tmp_path):
         """Test fingerprint table schema is created correctly."""
-        temp_dir = tempfile.mkdtemp()
-        
-        try:
-            storage = FingerprintStorage("test_user", temp_dir)
+        storage = FingerprintStorage("test_user", str(tmp_path))
 
-            # Check table exists
-            db_path = Path(temp_dir) / "fingerprints.db"
-            assert db_path.exists()
+        # Check table exists
+        db_path = tmp_path / "fingerprints.db"
+        assert db_path.exists()
 
-            # Check schema
-            conn = sqlite3.connect(str(db_path))
-            cursor = conn.cursor()
+        # Check schema
+        conn = sqlite3.connect(str(db_path))
+        cursor = conn.cursor()
 
-            cursor.execute("PRAGMA table_info(fingerprints)")
-            columns = {row[1]: row[2] for row in cursor.fetchall()}
+        cursor.execute("PRAGMA table_info(fingerprints)")
+        columns = {row[1]: row[2] for row in cursor.fetchall()}
 
-            assert "peer_id" in columns
-            assert "identity_key" in columns
-            assert "fingerprint" in columns
-            assert "verified" in columns
-            assert "verified_at" in columns
-            assert "last_updated" in columns
+        assert "peer_id" in columns
+        assert "identity_key" in columns
+        assert "fingerprint" in columns
+        assert "verified" in columns
+        assert "verified_at" in columns
+        assert "last_updated" in columns
 
-            conn.close()
+        conn.close()
 
-        finally:
-            import shutil
-            shutil.rmtree(temp_dir, ignore_errors=True)
-
-    def test_fingerprint_constraints(self):
+    def test_fingerprint_constraints(self, tmp_path):
         """Test fingerprint table constraints."""
-        temp_dir = tempfile.mkdtemp()
-        
-        try:
-            storage = FingerprintStorage("test_user", temp_dir)
-
-            # Try to save with same peer_id (should overwrite)
-            storage.save_fingerprint("peer_constraint_1", "id_key1", "FP1" * 20)
-            storage.save_fingerprint("peer_constraint_1", "id_key2", "FP2" * 20)
+        storage = FingerprintStorage("test_user", str(tmp_path))
 
-            # Check only one record exists via get_fingerprint
-            constraint_fp = storage.get_fingerprint("peer_constraint_1")
-            assert constraint_fp is not None
-            assert constraint_fp["identity_key"] == "id_key2"
+        # Try to save with same peer_id (should overwrite)
+        storage.save_fingerprint("peer_constraint_1", "id_key1", "FP1" * 20)
+        storage.save_fingerprint("peer_constraint_1", "id_key2", "FP2" * 20)
 
-        finally:
-            import shutil
-            shutil.rmtree(temp_dir, ignore_errors=True)
+        # Check only one record exists via get_fingerprint
+        constraint_fp = storage.get_fingerprint("peer_constraint_1")
+        assert constraint_fp is not None
+        assert constraint_fp["identity_key"] == "id_key2"
@@ -0,0 +1,36 @@
+"""Tests for identifier generation."""
+
+import time
+
+from whatsapp_client.ids import new_message_id
+
+
+def test_message_id_format():
+    """Test that message IDs are 26 Crockford base32 characters."""
+    message_id = new_message_id()
+    
+    assert len(message_id) == 26
+    assert set(message_id) <= set("0123456789ABCDEFGHJKMNPQRSTVWXYZ")
+
+
+def test_message_id_encodes_timestamp():
+    """Test that the first 10 characters carry the millisecond timestamp."""
+    before = time.time_ns() // 1_000_000
+    message_id = new_message_id()
+    after = time.time_ns() // 1_000_000
+    
+    timestamp = 0
+    for char in message_id[:10]:
+        timestamp = timestamp * 32 + "0123456789ABCDEFGHJKMNPQRSTVWXYZ".index(char)
+    
+    assert before <= timestamp <= after
+
+
+def test_message_ids_sort_by_creation_time():
+    """Test that IDs from later milliseconds sort after earlier ones."""
+    first = new_message_id()
+    time.sleep(0.002)
+    second = new_message_id()
+    
+    assert first < second
+    assert len({new_message_id() for _ in range(1000)}) == 1000
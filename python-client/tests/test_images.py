@@ -1,47 +1,128 @@
 """Tests for US10: Image and File Sending."""
 
+import base64
+import binascii
+import collections
 import pytest
+import mmap
 import os
+import sqlite3
 from unittest.mock import AsyncMock, MagicMock, patch, mock_open
 from pathlib import Path
 from whatsapp_client import WhatsAppClient
-from whatsapp_client.transport import WebSocketClient
 from whatsapp_client.storage import MessageStorage
 from whatsapp_client.models import Message
 from whatsapp_client.exceptions import WhatsAppClientError
 
 
-class TestImageSending:
-    """Test image sending functionality."""
+# Attribute bag standing in for an authenticated User
+_User = collections.namedtuple("_User", "id username")
+
+# Received image message; tests derive variants with model_copy(update=...)
+# so pydantic validation runs once at import
+_IMAGE_MESSAGE = Message(
+    id="msg_123",
+    from_user="user_456",
+    to="user_123",
+    content="",
+    type="image",
+    timestamp=1234567890,
+    status="delivered",
+    image_data=None,
+)
+
+
+class _StorageStub:
+    """Message storage stand-in; only save_message is used by send_image."""
     
-    @pytest.mark.asyncio
-    async def test_send_image_from_bytes(self):
-        """Test sending image from bytes."""
+    def __init__(self):
+        self.save_message = MagicMock()
+
+
+def _b64(data: bytes) -> str:
+    """Base64-encode bytes to str via binascii's C entry point."""
+    return binascii.b2a_base64(data, newline=False).decode("ascii")
+
+
+# Payloads and their base64 forms, encoded once at import
+_FAKE_IMG = b"fake_image"
+_FAKE_IMG_B64 = _b64(_FAKE_IMG)
+_FAKE_IMG_DATA = b"fake_image_data"
+_FAKE_IMG_DATA_B64 = _b64(_FAKE_IMG_DATA)
+
+
+@pytest.fixture(scope="class")
+def class_storage(tmp_path_factory):
+    """Message storage shared by a test class."""
+    storage_path = tmp_path_factory.mktemp("storage")
+    return MessageStorage(user_id="user_123", storage_path=str(storage_path))
+
+
+@pytest.fixture
+def image_storage(class_storage):
+    """Shared message storage, emptied after each test."""
+    yield class_storage
+    conn = sqlite3.connect(class_storage.db_path)
+    with conn:
+        conn.execute("DELETE FROM messages")
+    conn.close()
+
+
+class FakeWS:
+    """Minimal connected WebSocket stand-in that records sent messages."""
+    
+    is_connected = True
+    
+    def __init__(self):
+        self.calls = []
+    
+    async def send_message(self, **kwargs):
+        self.calls.append(kwargs)
+
+
+@pytest.fixture(scope="module")
+def error_client():
+    """Authenticated client for tests that fail before anything is sent."""
+    client = WhatsAppClient(server_url="http://test.com")
+    client._auth._user_id = "user_123"
+    return client
+
+
+@pytest.fixture
+def make_client():
+    """Factory for clients wired to a storage stub and a FakeWS."""
+    def _make(user_id="user_123", encrypted=True):
         client = WhatsAppClient(server_url="http://test.com")
+        client._auth._user_id = user_id
         
-        # Mock authenticated state
-        client._auth._user_id = "user_123"
-        client._auth._user = MagicMock(id="user_123", username="alice")
+        if encrypted:
+            mock_session = MagicMock()
+            mock_session.encrypt_message = MagicMock(return_value="encrypted_data")
+            client._session_manager = mock_session
+            client.ensure_session = AsyncMock()
+        else:
+            client._session_manager = None
         
-        # Mock session manager
-        mock_session = MagicMock()
-        mock_session.encrypt_message = MagicMock(return_value="encrypted_data")
-        client._session_manager = mock_session
-        client.ensure_session = AsyncMock()
+        client._message_storage = _StorageStub()
         
-        # Mock message storage
-        mock_storage = MagicMock(spec=MessageStorage)
-        mock_storage.save_message = MagicMock()
-        client._message_storage = mock_storage
+        client._ws = FakeWS()
         
-        # Mock WebSocket
-        mock_ws = AsyncMock(spec=WebSocketClient)
-        mock_ws.send_message = AsyncMock()
-        mock_ws.is_connected = True
-        client._ws = mock_ws
+        return client
+    return _make
+
+
+@pytest.mark.xdist_group(name="images_sending")
+class TestImageSending:
+    """Test image sending functionality."""
+    
+    @pytest.mark.asyncio
+    async def test_send_image_from_bytes(self, make_client):
+        """Test sending image from bytes."""
+        client = make_client()
+        client._auth._user = _User("user_123", "alice")
         
         # Create fake image data
-        image_data = b"fake_image_data"
+        image_data = _FAKE_IMG_DATA
         
         # Send image
         message = await client.send_image(
@@ -57,116 +138,57 @@ class TestImageSending:
         assert message.image_data is not None
         
         # Verify storage called
-        mock_storage.save_message.assert_called_once()
+        client._message_storage.save_message.assert_called_once()
         
         # Verify WebSocket called
-        mock_ws.send_message.assert_called_once()
+        assert len(client._ws.calls) == 1
     
     @pytest.mark.asyncio
-    async def test_send_image_from_file(self, tmp_path):
+    async def test_send_image_from_file(self, make_client):
         """Test sending image from file path."""
-        client = WhatsAppClient(server_url="http://test.com")
-        
-        # Mock authenticated state
-        client._auth._user_id = "user_123"
-        
-        # Mock session manager
-        mock_session = MagicMock()
-        mock_session.encrypt_message = MagicMock(return_value="encrypted_data")
-        client._session_manager = mock_session
-        client.ensure_session = AsyncMock()
+        client = make_client()
         
-        # Mock storage and WebSocket
-        client._message_storage = MagicMock(spec=MessageStorage)
-        client._message_storage.save_message = MagicMock()
-        
-        mock_ws = AsyncMock(spec=WebSocketClient)
-        mock_ws.send_message = AsyncMock()
-        mock_ws.is_connected = True
-        client._ws = mock_ws
-        
-        # Create temporary image file
-        image_path = tmp_path / "test_image.jpg"
+        # Serve the file contents from memory instead of the filesystem
         image_data = b"fake_jpeg_data"
-        image_path.write_bytes(image_data)
-        
-        # Send image
-        message = await client.send_image(
-            to="user_456",
-            image_path=str(image_path)
-        )
+        with patch("pathlib.Path.read_bytes", return_value=image_data) as mock_read:
+            message = await client.send_image(
+                to="user_456",
+                image_path="test_image.jpg"
+            )
+        mock_read.assert_called_once()
         
         # Verify message created
         assert message.type == "image"
         assert message.image_data is not None
     
     @pytest.mark.asyncio
-    async def test_send_image_file_not_found(self):
-        """Test error when image file doesn't exist."""
-        client = WhatsAppClient(server_url="http://test.com")
-        client._auth._user_id = "user_123"
-        
-        with pytest.raises(WhatsAppClientError, match="Image file not found"):
-            await client.send_image(
-                to="user_456",
-                image_path="/nonexistent/image.jpg"
-            )
-    
-    @pytest.mark.asyncio
-    async def test_send_image_no_source_error(self):
-        """Test error when neither image_path nor image_data provided."""
-        client = WhatsAppClient(server_url="http://test.com")
-        client._auth._user_id = "user_123"
-        
-        with pytest.raises(ValueError, match="Either image_path or image_data must be provided"):
-            await client.send_image(to="user_456")
-    
-    @pytest.mark.asyncio
-    async def test_send_image_both_sources_error(self):
-        """Test error when both image_path and image_data provided."""
-        client = WhatsAppClient(server_url="http://test.com")
-        client._auth._user_id = "user_123"
-        
-        with pytest.raises(ValueError, match="Cannot specify both"):
-            await client.send_image(
-                to="user_456",
-                image_path="test.jpg",
-                image_data=b"data"
-            )
+    @pytest.mark.parametrize("kwargs, exc, match", [
+        ({"image_path": "/nonexistent/image.jpg"}, WhatsAppClientError, "Image file not found"),
+        ({}, ValueError, "Either image_path or image_data must be provided"),
+        ({"image_path": "test.jpg", "image_data": b"data"}, ValueError, "Cannot specify both"),
+    ])
+    async def test_send_image_argument_errors(self, error_client, kwargs, exc, match):
+        """Test errors for missing, conflicting, or nonexistent image sources."""
+        with pytest.raises(exc, match=match):
+            await error_client.send_image(to="user_456", **kwargs)
     
     @pytest.mark.asyncio
-    async def test_send_image_size_limit(self):
+    async def test_send_image_size_limit(self, error_client):
         """Test size limit enforcement."""
-        client = WhatsAppClient(server_url="http://test.com")
-        client._auth._user_id = "user_123"
-        
-        # Create image larger than limit
-        large_image = b"x" * (6 * 1024 * 1024)  # 6MB
-        
-        with pytest.raises(WhatsAppClientError, match="Image too large"):
-            await client.send_image(
-                to="user_456",
-                image_data=large_image,
-                max_size=5 * 1024 * 1024  # 5MB limit
-            )
+        # Image larger than limit; anonymous mmap pages are never touched,
+        # so only the length check sees the 6MB
+        with mmap.mmap(-1, 6 * 1024 * 1024) as large_image:
+            with pytest.raises(WhatsAppClientError, match="Image too large"):
+                await error_client.send_image(
+                    to="user_456",
+                    image_data=large_image,
+                    max_size=5 * 1024 * 1024  # 5MB limit
+                )
     
     @pytest.mark.asyncio
-    async def test_send_image_without_encryption(self):
+    async def test_send_image_without_encryption(self, make_client):
         """Test sending image without encryption."""
-        client = WhatsAppClient(server_url="http://test.com")
-        
-        # Mock authenticated state but no session manager
-        client._auth._user_id = "user_123"
-        client._session_manager = None
-        
-        # Mock storage and WebSocket
-        client._message_storage = MagicMock(spec=MessageStorage)
-        client._message_storage.save_message = MagicMock()
-        
-        mock_ws = AsyncMock(spec=WebSocketClient)
-        mock_ws.send_message = AsyncMock()
-        mock_ws.is_connected = True
-        client._ws = mock_ws
+        client = make_client(encrypted=False)
         
         # Send image
         image_data = b"test_data"
@@ -180,40 +202,36 @@ class TestImageSending:
         assert message.image_data is not None
 
 
+@pytest.mark.xdist_group(name="images_receiving")
 class TestImageReceiving:
     """Test image receiving and saving functionality."""
     
     @pytest.mark.asyncio
-    async def test_save_image_to_file(self, tmp_path):
-        """Test saving received image to file."""
+    @pytest.mark.parametrize("relpath", ["saved_image.jpg", "subdir/nested/image.jpg"])
+    async def test_save_image(self, tmp_path, relpath):
+        """Test saving received image to file, creating parent directories."""
         client = WhatsAppClient(server_url="http://test.com")
         
         # Mock session manager for decryption
         mock_session = MagicMock()
-        mock_session.decrypt_message = MagicMock(return_value="ZmFrZV9pbWFnZV9kYXRh")  # base64 of "fake_image_data"
+        mock_session.decrypt_message = MagicMock(return_value=_FAKE_IMG_DATA_B64)
         client._session_manager = mock_session
         
         # Create message with image data
-        import base64
-        original_data = b"fake_image_data"
-        encoded_data = base64.b64encode(original_data).decode('utf-8')
-        
-        message = Message(
-            id="msg_123",
-            from_user="user_456",
-            to="user_123",
-            content="Image message",
-            type="image",
-            timestamp=1234567890,
-            status="delivered",
-            image_data=encoded_data,
-        )
+        original_data = _FAKE_IMG_DATA
+        encoded_data = _FAKE_IMG_DATA_B64
         
-        # Save image
-        output_path = tmp_path / "saved_image.jpg"
+        message = _IMAGE_MESSAGE.model_copy(update={
+            "content": "Image message",
+            "image_data": encoded_data,
+        })
+        
+        # Save image (nested paths don't exist yet)
+        output_path = tmp_path / relpath
         await client.save_image(message, str(output_path))
         
-        # Verify file created
+        # Verify directory and file created
+        assert output_path.parent.is_dir()
         assert output_path.exists()
         
         # Verify content
@@ -225,15 +243,10 @@ class TestImageReceiving:
         """Test error when trying to save non-image message."""
         client = WhatsAppClient(server_url="http://test.com")
         
-        message = Message(
-            id="msg_123",
-            from_user="user_456",
-            to="user_123",
-            content="Text message",
-            type="text",
-            timestamp=1234567890,
-            status="delivered",
-        )
+        message = _IMAGE_MESSAGE.model_copy(update={
+            "content": "Text message",
+            "type": "text",
+        })
         
         with pytest.raises(ValueError, match="Message is not an image type"):
             await client.save_image(message, "/tmp/image.jpg")
@@ -243,50 +256,13 @@ class TestImageReceiving:
         """Test error when message has no image data."""
         client = WhatsAppClient(server_url="http://test.com")
         
-        message = Message(
-            id="msg_123",
-            from_user="user_456",
-            to="user_123",
-            content="Image message",
-            type="image",
-            timestamp=1234567890,
-            status="delivered",
-            image_data=None,
-        )
+        message = _IMAGE_MESSAGE.model_copy(update={
+            "content": "Image message",
+        })
         
         with pytest.raises(ValueError, match="Message has no image data"):
             await client.save_image(message, "/tmp/image.jpg")
     
-    @pytest.mark.asyncio
-    async def test_save_image_creates_directory(self, tmp_path):
-        """Test that save_image creates parent directories."""
-        client = WhatsAppClient(server_url="http://test.com")
-        
-        # Mock session manager
-        mock_session = MagicMock()
-        mock_session.decrypt_message = MagicMock(return_value="ZmFrZV9kYXRh")  # base64
-        client._session_manager = mock_session
-        
-        import base64
-        message = Message(
-            id="msg_123",
-            from_user="user_456",
-            to="user_123",
-            content="",
-            type="image",
-            timestamp=1234567890,
-            status="delivered",
-            image_data=base64.b64encode(b"fake_data").decode('utf-8'),
-        )
-        
-        # Save to nested path that doesn't exist
-        output_path = tmp_path / "subdir" / "nested" / "image.jpg"
-        await client.save_image(message, str(output_path))
-        
-        # Verify directory and file created
-        assert output_path.exists()
-        assert output_path.parent.exists()
-    
     @pytest.mark.asyncio
     async def test_decode_image(self):
         """Test decoding image data."""
@@ -294,13 +270,12 @@ class TestImageReceiving:
         
         # Mock session manager
         mock_session = MagicMock()
-        mock_session.decrypt_message = MagicMock(return_value="ZmFrZV9pbWFnZV9kYXRh")
+        mock_session.decrypt_message = MagicMock(return_value=_FAKE_IMG_DATA_B64)
         client._session_manager = mock_session
         
         # Decode image
-        import base64
-        original_data = b"fake_image_data"
-        encoded = base64.b64encode(original_data).decode('utf-8')
+        original_data = _FAKE_IMG_DATA
+        encoded = _FAKE_IMG_DATA_B64
         
         decoded = client.decode_image(encoded, decrypt=True, from_user="user_456")
         
@@ -311,9 +286,8 @@ class TestImageReceiving:
         """Test decoding without decryption."""
         client = WhatsAppClient(server_url="http://test.com")
         
-        import base64
-        original_data = b"fake_image_data"
-        encoded = base64.b64encode(original_data).decode('utf-8')
+        original_data = _FAKE_IMG_DATA
+        encoded = _FAKE_IMG_DATA_B64
         
         # Decode without decryption
         decoded = client.decode_image(encoded, decrypt=False)
@@ -328,28 +302,26 @@ class TestImageReceiving:
             client.decode_image("data", decrypt=True)
 
 
+@pytest.mark.xdist_group(name="images_storage")
 class TestImageStorage:
     """Test image data storage."""
     
     @pytest.mark.asyncio
-    async def test_save_and_retrieve_image_message(self, tmp_path):
+    async def test_save_and_retrieve_image_message(self, image_storage):
         """Test saving and retrieving image message."""
-        storage = MessageStorage(user_id="user_123", storage_path=str(tmp_path))
+        storage = image_storage
         
-        import base64
-        image_data = base64.b64encode(b"fake_image").decode('utf-8')
+        image_data = _FAKE_IMG_B64
         
         # Save image message
-        message = Message(
-            id="msg_456",
-            from_user="user_123",
-            to="user_789",
-            content="Check this out!",
-            type="image",
-            timestamp=1234567890,
-            status="sent",
-            image_data=image_data,
-        )
+        message = _IMAGE_MESSAGE.model_copy(update={
+            "id": "msg_456",
+            "from_user": "user_123",
+            "to": "user_789",
+            "content": "Check this out!",
+            "status": "sent",
+            "image_data": image_data,
+        })
         storage.save_message(message)
         
         # Retrieve by ID
@@ -361,24 +333,20 @@ class TestImageStorage:
         assert retrieved.image_data == image_data
     
     @pytest.mark.asyncio
-    async def test_get_messages_includes_image_data(self, tmp_path):
+    async def test_get_messages_includes_image_data(self, image_storage):
         """Test that get_messages includes image_data."""
-        storage = MessageStorage(user_id="user_123", storage_path=str(tmp_path))
+        storage = image_storage
         
-        import base64
-        image_data = base64.b64encode(b"fake_image").decode('utf-8')
+        image_data = _FAKE_IMG_B64
         
         # Save image message
-        message = Message(
-            id="msg_456",
-            from_user="user_123",
-            to="user_789",
-            content="",
-            type="image",
-            timestamp=1234567890,
-            status="sent",
-            image_data=image_data,
-        )
+        message = _IMAGE_MESSAGE.model_copy(update={
+            "id": "msg_456",
+            "from_user": "user_123",
+            "to": "user_789",
+            "status": "sent",
+            "image_data": image_data,
+        })
         storage.save_message(message)
         
         # Get messages
@@ -389,23 +357,15 @@ class TestImageStorage:
         assert messages[0].image_data == image_data
 
 
+@pytest.mark.xdist_group(name="images_integration")
 class TestIntegration:
     """Integration tests for image functionality."""
     
     @pytest.mark.asyncio
-    async def test_send_and_receive_image_flow(self, tmp_path):
+    async def test_send_and_receive_image_flow(self, make_client, tmp_path):
         """Test complete flow of sending and receiving image."""
-        # Sender
-        sender = WhatsAppClient(server_url="http://test.com")
-        sender._auth._user_id = "user_alice"
-        sender._session_manager = None  # No encryption for simplicity
-        sender._message_storage = MagicMock(spec=MessageStorage)
-        sender._message_storage.save_message = MagicMock()
-        
-        mock_ws = AsyncMock(spec=WebSocketClient)
-        mock_ws.send_message = AsyncMock()
-        mock_ws.is_connected = True
-        sender._ws = mock_ws
+        # Sender (no encryption for simplicity)
+        sender = make_client(user_id="user_alice", encrypted=False)
         
         # Create and send image
         image_data = b"test_image_content"
@@ -424,17 +384,14 @@ class TestIntegration:
         receiver._session_manager = None
         
         # Simulate receiving the message
-        import base64
-        received_message = Message(
-            id=sent_message.id,
-            from_user="user_alice",
-            to="user_bob",
-            content="Test photo",
-            type="image",
-            timestamp=sent_message.timestamp,
-            status="delivered",
-            image_data=sent_message.image_data,
-        )
+        received_message = _IMAGE_MESSAGE.model_copy(update={
+            "id": sent_message.id,
+            "from_user": "user_alice",
+            "to": "user_bob",
+            "content": "Test photo",
+            "timestamp": sent_message.timestamp,
+            "image_data": sent_message.image_data,
+        })
         
         # Save received image
         output_path = tmp_path / "received_image.jpg"
@@ -445,6 +402,5 @@ class TestIntegration:
         saved_data = output_path.read_bytes()
         
         # Should match original (since no encryption)
-        import base64
         expected = base64.b64decode(sent_message.image_data)
         assert saved_data == expected
@@ -1,55 +1,68 @@
 """Tests for US13: Local Storage and Key Persistence."""
 
+import asyncio
 import pytest
-import tempfile
 import os
+import shutil
 import json
 import base64
 from pathlib import Path
+from types import MappingProxyType
 from unittest.mock import AsyncMock, MagicMock, patch
 
-from whatsapp_client.storage import KeyStorage
+from whatsapp_client.storage import Argon2Params, KeyStorage
 from whatsapp_client.crypto.key_manager import KeyManager
 from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
 
+# Read-only key fixture; tests get a shallow copy and replace values rather than mutate
+_TEST_KEYS = MappingProxyType(
+    {
+        "identity_public_key": base64.b64encode(b"identity_public_123").decode(),
+        "identity_private_key": base64.b64encode(b"identity_private_123").decode(),
+        "signing_public_key": base64.b64encode(b"signing_public_123").decode(),
+        "signing_private_key": base64.b64encode(b"signing_private_123").decode(),
+        "signed_prekey": {
+            "keyId": 1,
+            "publicKey": "signed_prekey_pub",
+            "signature": "sig_123",
+            "privateKey": base64.b64encode(b"signed_prekey_priv").decode(),
+        },
+        "one_time_prekeys": [
+            {
+                "keyId": 1,
+                "publicKey": "otpk_pub_1",
+                "privateKey": base64.b64encode(b"otpk_priv_1").decode(),
+            },
+            {
+                "keyId": 2,
+                "publicKey": "otpk_pub_2",
+                "privateKey": base64.b64encode(b"otpk_priv_2").decode(),
+            },
+        ],
+    }
+)
+
+_PASSWORD = "secure_test_password_123"
+
+
+@pytest.fixture(scope="class")
+def saved_storage(tmp_path_factory, fast_kdf):
+    """Key storage with _TEST_KEYS saved once, for tests that only read it back."""
+    storage = KeyStorage(str(tmp_path_factory.mktemp("saved")), "test_user", kdf_params=fast_kdf)
+    storage.save_keys(dict(_TEST_KEYS), _PASSWORD)
+    return storage
+
 
 class TestKeyStorage:
     """Test KeyStorage class for encrypted key persistence."""
 
-    def setup_method(self):
+    @pytest.fixture(autouse=True)
+    def setup(self, key_storage):
         """Set up test fixtures."""
-        self.temp_dir = tempfile.mkdtemp()
-        self.storage = KeyStorage(self.temp_dir, "test_user")
-        self.password = "secure_test_password_123"
-        self.test_keys = {
-            "identity_public_key": base64.b64encode(b"identity_public_123").decode(),
-            "identity_private_key": base64.b64encode(b"identity_private_123").decode(),
-            "signing_public_key": base64.b64encode(b"signing_public_123").decode(),
-            "signing_private_key": base64.b64encode(b"signing_private_123").decode(),
-            "signed_prekey": {
-                "keyId": 1,
-                "publicKey": "signed_prekey_pub",
-                "signature": "sig_123",
-                "privateKey": base64.b64encode(b"signed_prekey_priv").decode(),
-            },
-            "one_time_prekeys": [
-                {
-                    "keyId": 1,
-                    "publicKey": "otpk_pub_1",
-                    "privateKey": base64.b64encode(b"otpk_priv_1").decode(),
-                },
-                {
-                    "keyId": 2,
-                    "publicKey": "otpk_pub_2",
-                    "privateKey": base64.b64encode(b"otpk_priv_2").decode(),
-                },
-            ],
-        }
-
-    def teardown_method(self):
-        """Clean up."""
-        import shutil
-        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        self.storage = key_storage
+        self.temp_dir = str(key_storage.storage_path)
+        self.password = _PASSWORD
+        self.test_keys = dict(_TEST_KEYS)
 
     def test_has_keys_returns_false_initially(self):
         """Test that has_keys returns False when no keys are saved."""
@@ -76,6 +89,7 @@ class TestKeyStorage:
         loaded_keys = self.storage.load_keys("wrong_password")
         assert loaded_keys is None
 
+    @pytest.mark.skipif(os.name == "nt", reason="POSIX file permissions")
     def test_save_keys_creates_file_with_restricted_permissions(self):
         """Test that key file has restricted permissions (Unix only)."""
         self.storage.save_keys(self.test_keys, self.password)
@@ -84,10 +98,9 @@ class TestKeyStorage:
         assert keys_file.exists()
 
         # Check file permissions (Unix: 0600)
-        if os.name != 'nt':  # Skip on Windows
-            file_stat = keys_file.stat()
-            perms = oct(file_stat.st_mode)[-3:]
-            assert perms == "600"
+        file_stat = keys_file.stat()
+        perms = oct(file_stat.st_mode)[-3:]
+        assert perms == "600"
 
     def test_clear_keys_removes_file(self):
         """Test that clear_keys removes the keys file."""
@@ -97,47 +110,23 @@ class TestKeyStorage:
         self.storage.clear_keys()
         assert not self.storage.has_keys()
 
-    def test_export_keys_json_format(self):
-        """Test exporting keys in JSON format."""
-        self.storage.save_keys(self.test_keys, self.password)
-
-        exported = self.storage.export_keys(self.password, export_format="json")
+    @pytest.mark.parametrize("fmt", ["json", "base64"])
+    def test_export_import_roundtrip(self, saved_storage, fmt, fast_kdf):
+        """Test exporting keys and importing them into a new storage."""
+        exported = saved_storage.export_keys(_PASSWORD, export_format=fmt)
         assert exported is not None
 
-        # Parse exported JSON
-        exported_data = json.loads(exported)
+        # Parse exported data
+        exported_json = exported if fmt == "json" else base64.b64decode(exported)
+        exported_data = json.loads(exported_json)
         assert "identity_public_key" in exported_data
         assert "signing_private_key" in exported_data
 
-    def test_export_keys_base64_format(self):
-        """Test exporting keys in Base64 format."""
-        self.storage.save_keys(self.test_keys, self.password)
-
-        exported = self.storage.export_keys(self.password, export_format="base64")
-        assert exported is not None
-
-        # Verify it's valid base64
-        decoded = base64.b64decode(exported)
-        assert len(decoded) > 0
-
-    def test_export_keys_returns_none_with_wrong_password(self):
-        """Test that export with wrong password returns None."""
-        self.storage.save_keys(self.test_keys, self.password)
-
-        exported = self.storage.export_keys("wrong_password", export_format="json")
-        assert exported is None
-
-    def test_import_keys_json_format(self):
-        """Test importing keys from JSON format."""
-        # Export as JSON
-        self.storage.save_keys(self.test_keys, self.password)
-        exported = self.storage.export_keys(self.password, export_format="json")
-
         # Create new storage and import
-        new_storage = KeyStorage(self.temp_dir, "test_user_2")
+        new_storage = KeyStorage(self.temp_dir, "test_user_2", kdf_params=fast_kdf)
         new_password = "new_password_456"
 
-        success = new_storage.import_keys(exported, new_password, import_format="json")
+        success = new_storage.import_keys(exported, new_password, import_format=fmt)
         assert success
         assert new_storage.has_keys()
 
@@ -145,22 +134,10 @@ class TestKeyStorage:
         loaded = new_storage.load_keys(new_password)
         assert loaded["identity_public_key"] == self.test_keys["identity_public_key"]
 
-    def test_import_keys_base64_format(self):
-        """Test importing keys from Base64 format."""
-        # Export as base64
-        self.storage.save_keys(self.test_keys, self.password)
-        exported = self.storage.export_keys(self.password, export_format="base64")
-
-        # Create new storage and import
-        new_storage = KeyStorage(self.temp_dir, "test_user_3")
-        new_password = "import_password_789"
-
-        success = new_storage.import_keys(exported, new_password, import_format="base64")
-        assert success
-
-        # Verify imported keys
-        loaded = new_storage.load_keys(new_password)
-        assert loaded["identity_public_key"] == self.test_keys["identity_public_key"]
+    def test_export_keys_returns_none_with_wrong_password(self, saved_storage):
+        """Test that export with wrong password returns None."""
+        exported = saved_storage.export_keys("wrong_password", export_format="json")
+        assert exported is None
 
     def test_backup_and_restore_keys(self):
         """Test backing up and restoring keys."""
@@ -216,10 +193,10 @@ class TestKeyStorage:
         assert loaded["one_time_prekeys"][0]["keyId"] == 1
         assert loaded["one_time_prekeys"][1]["keyId"] == 2
 
-    def test_multiple_users_have_separate_key_files(self):
+    def test_multiple_users_have_separate_key_files(self, fast_kdf):
         """Test that different users have separate key files."""
-        storage1 = KeyStorage(self.temp_dir, "user1")
-        storage2 = KeyStorage(self.temp_dir, "user2")
+        storage1 = KeyStorage(self.temp_dir, "user1", kdf_params=fast_kdf)
+        storage2 = KeyStorage(self.temp_dir, "user2", kdf_params=fast_kdf)
 
         storage1.save_keys(self.test_keys, self.password)
 
@@ -230,6 +207,35 @@ class TestKeyStorage:
         loaded = storage2.load_keys(self.password)
         assert loaded is None
 
+    def test_load_keys_uses_params_from_file(self):
+        """Test that keys load with the Argon2 costs they were saved with."""
+        self.storage.save_keys(self.test_keys, self.password)
+
+        with open(self.storage.keys_file) as f:
+            assert json.load(f)["kdf"] == {"memory_cost": 8, "iterations": 1, "lanes": 1}
+
+        other = KeyStorage(
+            self.temp_dir, "test_user", kdf_params=Argon2Params(memory_cost=16, lanes=2)
+        )
+        loaded = other.load_keys(self.password)
+        assert loaded is not None
+        assert loaded["identity_public_key"] == self.test_keys["identity_public_key"]
+
+    def test_load_keys_without_params_uses_defaults(self):
+        """Test that key files saved before params were recorded still load."""
+        legacy = KeyStorage(self.temp_dir, "test_user", kdf_params=Argon2Params())
+        legacy.save_keys(self.test_keys, self.password)
+
+        with open(legacy.keys_file) as f:
+            storage_data = json.load(f)
+        del storage_data["kdf"]
+        with open(legacy.keys_file, "w") as f:
+            json.dump(storage_data, f)
+
+        loaded = self.storage.load_keys(self.password)
+        assert loaded is not None
+        assert loaded["identity_public_key"] == self.test_keys["identity_public_key"]
+
     def test_changing_password_on_export_import(self):
         """Test changing password by exporting and importing."""
         # Save with original password
@@ -279,10 +285,9 @@ class TestKeyStorage:
         assert len(loaded["one_time_prekeys"]) == 100
         assert loaded["one_time_prekeys"][50]["keyId"] == 50
 
-    def test_export_creates_valid_json(self):
+    def test_export_creates_valid_json(self, saved_storage):
         """Test that exported JSON is valid and complete."""
-        self.storage.save_keys(self.test_keys, self.password)
-        exported = self.storage.export_keys(self.password, export_format="json")
+        exported = saved_storage.export_keys(_PASSWORD, export_format="json")
 
         # Parse and validate JSON structure
         data = json.loads(exported)
@@ -292,6 +297,22 @@ class TestKeyStorage:
         assert isinstance(data["signed_prekey"], dict)
         assert isinstance(data["one_time_prekeys"], list)
 
+    def test_argon2_backends_derive_same_key(self):
+        """Test that the argon2-cffi backend matches cryptography's Argon2id."""
+        pytest.importorskip("argon2")
+        storage = KeyStorage(self.temp_dir, "argon2_user", kdf_params=Argon2Params())
+        storage.salt = b"0123456789abcdef"
+        derived = storage._derive_key(self.password.encode())
+
+        kdf = Argon2id(
+            salt=storage.salt,
+            length=32,
+            lanes=4,
+            memory_cost=65536,
+            iterations=3,
+        )
+        assert derived == kdf.derive(self.password.encode())
+
     def test_key_encryption_uses_different_salt_each_time(self):
         """Test that each save uses a different salt (different ciphertexts)."""
         # Save twice with same keys and password
@@ -300,8 +321,7 @@ class TestKeyStorage:
 
         # Read first ciphertext
         keys_file = Path(self.storage.keys_file)
-        with open(keys_file, "rb") as f:
-            first_ciphertext = f.read()
+        first_ciphertext = keys_file.read_bytes()
 
         # Clear and save again
         self.storage.clear_keys()
@@ -309,44 +329,49 @@ class TestKeyStorage:
         assert success2
 
         # Read second ciphertext
-        with open(keys_file, "rb") as f:
-            second_ciphertext = f.read()
+        second_ciphertext = keys_file.read_bytes()
 
         # Ciphertexts should be different (due to different salt/nonce)
         assert first_ciphertext != second_ciphertext
 
-        # But both should decrypt to same data
-        loaded1 = self.storage.load_keys(self.password)
-        loaded2 = self.storage.load_keys(self.password)
-        assert loaded1 == loaded2
+        # But the latest save should still decrypt to the same data
+        loaded = self.storage.load_keys(self.password)
+        assert loaded == self.test_keys
+
+
+_INTEGRATION_PASSWORD = "integration_test_password"
+
+
+@pytest.fixture(scope="class")
+def initialized_manager(tmp_path_factory, fast_kdf):
+    """KeyManager whose keys were generated and saved once for the whole class."""
+    km = KeyManager(
+        "test_user", str(tmp_path_factory.mktemp("key_manager")), kdf_params=fast_kdf
+    )
+    asyncio.run(km.initialize(password=_INTEGRATION_PASSWORD))
+    return km
 
 
+@pytest.mark.xdist_group(name="key_manager")
 class TestKeyStorageIntegration:
     """Integration tests for KeyStorage with KeyManager."""
 
-    def setup_method(self):
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path, initialized_manager):
         """Set up test fixtures."""
-        self.temp_dir = tempfile.mkdtemp()
-        self.password = "integration_test_password"
-
-    def teardown_method(self):
-        """Clean up."""
-        import shutil
-        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        self.temp_dir = str(tmp_path)
+        self.password = _INTEGRATION_PASSWORD
+        self.km1 = initialized_manager
 
     @pytest.mark.asyncio
-    async def test_key_manager_persists_keys(self):
+    async def test_key_manager_persists_keys(self, fast_kdf):
         """Test that KeyManager can persist and restore keys."""
-        # Create first manager and initialize
-        km1 = KeyManager("test_user", self.temp_dir)
-        await km1.initialize(password=self.password)
-
         # Get initial keys
-        initial_identity_pub = km1._identity_keypair.public_key
-        initial_signing_pub = km1._signing_keypair.public_key
+        initial_identity_pub = self.km1._identity_keypair.public_key
+        initial_signing_pub = self.km1._signing_keypair.public_key
 
         # Create second manager and initialize (should load from storage)
-        km2 = KeyManager("test_user", self.temp_dir)
+        km2 = KeyManager("test_user", self.km1.storage_path, kdf_params=fast_kdf)
         await km2.initialize(password=self.password)
 
         # Keys should be identical
@@ -354,15 +379,15 @@ class TestKeyStorageIntegration:
         assert km2._signing_keypair.public_key == initial_signing_pub
 
     @pytest.mark.asyncio
-    async def test_wrong_password_generates_new_keys(self):
+    async def test_wrong_password_generates_new_keys(self, fast_kdf):
         """Test that wrong password during load generates new keys."""
-        # Initialize with password
-        km1 = KeyManager("test_user", self.temp_dir)
-        await km1.initialize(password=self.password)
-        initial_identity_pub = km1._identity_keypair.public_key
+        initial_identity_pub = self.km1._identity_keypair.public_key
+
+        # Work on a copy: the wrong-password run overwrites the key file
+        shutil.copy(self.km1.key_storage.keys_file, self.temp_dir)
 
         # Try to initialize with wrong password (should generate new keys)
-        km2 = KeyManager("test_user", self.temp_dir)
+        km2 = KeyManager("test_user", self.temp_dir, kdf_params=fast_kdf)
         await km2.initialize(password="wrong_password")
 
         # Keys should be different (new generation happened)
@@ -371,14 +396,12 @@ class TestKeyStorageIntegration:
         assert km2._identity_keypair.public_key != initial_identity_pub
 
     @pytest.mark.asyncio
-    async def test_initialize_without_password_always_generates_new_keys(self):
+    async def test_initialize_without_password_always_generates_new_keys(self, fast_kdf):
         """Test that initialize without password generates new keys each time."""
-        km1 = KeyManager("test_user_1", self.temp_dir)
-        await km1.initialize(password=self.password)
-        identity_pub_1 = km1._identity_keypair.public_key
+        identity_pub_1 = self.km1._identity_keypair.public_key
 
         # Initialize again without password (should generate new even if file exists)
-        km2 = KeyManager("test_user_1", self.temp_dir)
+        km2 = KeyManager("test_user", self.km1.storage_path, kdf_params=fast_kdf)
         await km2.initialize(password=None)
 
         # Keys might be different (new generation happened)
@@ -389,15 +412,10 @@ class TestKeyStorageIntegration:
 class TestKeyStorageErrorHandling:
     """Test error handling in KeyStorage."""
 
-    def setup_method(self):
+    @pytest.fixture(autouse=True)
+    def setup(self, key_storage):
         """Set up test fixtures."""
-        self.temp_dir = tempfile.mkdtemp()
-        self.storage = KeyStorage(self.temp_dir, "test_user")
-
-    def teardown_method(self):
-        """Clean up."""
-        import shutil
-        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        self.storage = key_storage
 
     def test_save_keys_with_corrupted_data(self):
         """Test saving keys with missing required fields."""
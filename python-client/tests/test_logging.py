@@ -1,12 +1,13 @@
 """Tests for US14: Error Handling and Logging."""
 
 import pytest
-import tempfile
+import json
 import logging
-from pathlib import Path
+import threading
 from datetime import datetime
 
 from whatsapp_client.logging import (
+    BackgroundFileHandler,
     ErrorHandler,
     LogLevel,
     get_error_handler,
@@ -17,6 +18,7 @@ from whatsapp_client.logging import (
     log_error,
     log_critical,
     handle_exception,
+    scoped_file_handler,
 )
 from whatsapp_client.exceptions import (
     ValidationError,
@@ -27,6 +29,18 @@ from whatsapp_client.exceptions import (
 )
 
 
+@pytest.fixture(scope="module")
+def log_dir(tmp_path_factory):
+    """One directory shared by every log file in this module."""
+    return tmp_path_factory.mktemp("logs")
+
+
+@pytest.fixture
+def log_file(log_dir, request):
+    """Log file path unique to the requesting test."""
+    return log_dir / f"{request.node.name}.log"
+
+
 class TestErrorHandler:
     """Test ErrorHandler class."""
 
@@ -35,20 +49,11 @@ class TestErrorHandler:
         # Get fresh handler instance
         self.handler = ErrorHandler()
         self.handler.clear_error_history()
-        
-        # Remove any file handlers to avoid conflicts
-        for handler in list(self.handler.logger.handlers):
-            if isinstance(handler, logging.FileHandler):
-                handler.close()
-                self.handler.logger.removeHandler(handler)
+        self.handler.remove_file_handlers()
 
     def teardown_method(self):
         """Clean up after each test."""
-        # Close and remove file handlers
-        for handler in list(self.handler.logger.handlers):
-            if isinstance(handler, logging.FileHandler):
-                handler.close()
-                self.handler.logger.removeHandler(handler)
+        self.handler.remove_file_handlers()
 
     def test_singleton_pattern(self):
         """Test that ErrorHandler is a singleton."""
@@ -123,7 +128,8 @@ class TestErrorHandler:
         error_info = self.handler.error_history[0]
         assert "timestamp" in error_info
         # Try to parse ISO format timestamp
-        datetime.fromisoformat(error_info["timestamp"])
+        timestamp = datetime.fromisoformat(error_info["timestamp"])
+        assert abs((datetime.now() - timestamp).total_seconds()) < 60
 
     def test_error_history_includes_traceback(self):
         """Test that error history includes traceback."""
@@ -136,6 +142,43 @@ class TestErrorHandler:
         assert "traceback" in error_info
         assert "ValueError" in error_info["traceback"]
 
+    def test_error_history_traceback_without_active_exception(self):
+        """Test traceback for an exception that was never raised."""
+        self.handler.handle_exception(ValueError("Not raised"))
+
+        error_info = self.handler.error_history[0]
+        assert error_info["traceback"] == "ValueError: Not raised\n"
+        assert dict(error_info)["type"] == "ValueError"
+
+    def test_error_history_traceback_concurrent_reads(self):
+        """Test that threads reading a fresh traceback all get the same text."""
+        self.handler.handle_exception(ValueError("Shared"))
+        record = self.handler.error_history[0]
+        results = []
+
+        def read_traceback():
+            results.append(record["traceback"])
+
+        threads = [threading.Thread(target=read_traceback) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == ["ValueError: Shared\n"] * 8
+
+    def test_error_record_attributes(self):
+        """Test that error records expose their fields as attributes."""
+        self.handler.handle_exception(StorageError("Disk full"), context="save")
+
+        record = self.handler.error_history[0]
+        assert record.type == "StorageError"
+        assert record.message == "Disk full"
+        assert record.severity == LogLevel.ERROR.value
+        assert list(record) == ["timestamp", "type", "message", "context", "severity", "traceback"]
+        with pytest.raises(KeyError):
+            record["missing"]
+
     def test_error_history_limit(self):
         """Test that error history has a maximum size."""
         self.handler.max_history = 5
@@ -146,6 +189,27 @@ class TestErrorHandler:
 
         assert len(self.handler.error_history) == 5
 
+    def test_error_history_limit_must_be_positive(self):
+        """Test that max_history rejects values that would keep no errors."""
+        limit = self.handler.max_history
+        for value in (0, -1):
+            with pytest.raises(ValueError):
+                self.handler.max_history = value
+
+        self.handler.handle_exception(ValueError("Kept"))
+        assert self.handler.max_history == limit
+        assert self.handler.get_error_summary()["by_type"] == {"ValueError": 1}
+
+    def test_error_history_limit_keeps_newest(self, monkeypatch):
+        """Test that the oldest errors are evicted first."""
+        monkeypatch.setattr(self.handler, "max_history", 3)
+
+        for i in range(5):
+            self.handler.handle_exception(ValueError(f"Error {i}"))
+
+        messages = [e["message"] for e in self.handler.error_history]
+        assert messages == ["Error 2", "Error 3", "Error 4"]
+
     def test_get_error_history(self):
         """Test getting error history."""
         for i in range(3):
@@ -156,6 +220,20 @@ class TestErrorHandler:
         assert len(history) == 2
         assert history[-1]["message"] == "Error 2"
 
+    def test_get_error_history_returns_plain_dicts(self):
+        """Test that returned history is JSON-serializable and can be modified."""
+        self.handler.handle_exception(ValueError("Error 0"), context="json")
+        self.handler.handle_exception(StorageError("Error 1"))
+
+        history = self.handler.get_error_history()
+        decoded = json.loads(json.dumps(history))
+        assert [e["message"] for e in decoded] == ["Error 0", "Error 1"]
+        assert "ValueError" in decoded[0]["traceback"]
+        assert json.dumps(self.handler.search_error_history("error"))
+
+        history[0]["extra"] = 1
+        assert "extra" not in self.handler.get_error_history()[0]
+
     def test_get_error_history_with_severity_filter(self):
         """Test getting error history with severity filter."""
         # Add various errors with different severities
@@ -170,6 +248,15 @@ class TestErrorHandler:
         assert len(history) == 1
         assert history[0]["severity"] == LogLevel.ERROR.value
 
+    def test_get_error_history_severity_count(self):
+        """Test that count applies to the errors matching the severity."""
+        self.handler.handle_exception(ValueError("Error 0"), severity=LogLevel.ERROR)
+        self.handler.handle_exception(ValueError("Error 1"), severity=LogLevel.ERROR)
+        self.handler.handle_exception(ValidationError("Warning"), severity=LogLevel.WARNING)
+
+        history = self.handler.get_error_history(count=1, severity=LogLevel.ERROR)
+        assert [e["message"] for e in history] == ["Error 1"]
+
     def test_clear_error_history(self):
         """Test clearing error history."""
         error = ValueError("Test error")
@@ -179,6 +266,30 @@ class TestErrorHandler:
         self.handler.clear_error_history()
         assert len(self.handler.error_history) == 0
 
+    def test_search_error_history(self):
+        """Test searching error history by message keywords."""
+        self.handler.handle_exception(WhatsAppConnectionError("Connection TIMEOUT"))
+        self.handler.handle_exception(ValidationError("Empty username"))
+        self.handler.handle_exception(StorageError("Save failed"))
+
+        matches = self.handler.search_error_history("timeout", "failed")
+        assert [e["type"] for e in matches] == ["ConnectionError", "StorageError"]
+        assert self.handler.search_error_history() == []
+
+    def test_dump_history(self, tmp_path):
+        """Test writing error history to a JSON file."""
+        self.handler.handle_exception(ValueError("Error: 用户名"), context="dump")
+
+        dump_file = tmp_path / "errors.json"
+        self.handler.dump_history(str(dump_file))
+
+        records = json.loads(dump_file.read_text(encoding="utf-8"))
+        assert len(records) == 1
+        assert records[0]["message"] == "Error: 用户名"
+        assert records[0]["context"] == "dump"
+        assert "ValueError" in records[0]["traceback"]
+        datetime.fromisoformat(records[0]["timestamp"])
+
     def test_get_error_summary(self):
         """Test getting error summary."""
         # Add various errors
@@ -194,47 +305,75 @@ class TestErrorHandler:
         assert summary["by_severity"]["WARNING"] == 1
         assert summary["by_severity"]["ERROR"] == 2
 
-    def test_add_file_handler(self):
-        """Test adding file logging handler."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            log_file = Path(temp_dir) / "test.log"
-            self.handler.add_file_handler(str(log_file))
+    def test_error_summary_drops_evicted_errors(self, monkeypatch):
+        """Test that the summary only counts errors still in history."""
+        monkeypatch.setattr(self.handler, "max_history", 2)
+
+        self.handler.handle_exception(ValidationError("Old"), severity=LogLevel.WARNING)
+        self.handler.handle_exception(ValueError("Error 1"))
+        self.handler.handle_exception(ValueError("Error 2"))
+
+        summary = self.handler.get_error_summary()
+        assert summary["total_errors"] == 2
+        assert summary["by_type"] == {"ValueError": 2}
+        assert summary["by_severity"] == {"ERROR": 2}
+
+    def test_concurrent_handle_exception(self):
+        """Test that summary counts stay consistent under concurrent errors."""
+        def record_errors():
+            for i in range(50):
+                self.handler.handle_exception(ValueError(f"Error {i}"))
+
+        threads = [threading.Thread(target=record_errors) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
 
+        summary = self.handler.get_error_summary()
+        assert summary["by_type"]["ValueError"] == summary["total_errors"]
+        assert summary["total_errors"] == len(self.handler.error_history)
+
+    def test_add_file_handler(self, log_file):
+        """Test adding file logging handler."""
+        with scoped_file_handler(self.handler, str(log_file)):
             self.handler.log_info("Test message")
 
             assert log_file.exists()
             with open(log_file, "r") as f:
                 content = f.read()
                 assert "Test message" in content
-            
-            # Close file handlers to allow cleanup on Windows
-            for handler in self.handler.logger.handlers:
-                if hasattr(handler, 'close'):
-                    try:
-                        handler.close()
-                    except:
-                        pass
-
-    def test_file_handler_with_errors(self):
-        """Test file handler logs errors."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            log_file = Path(temp_dir) / "errors.log"
-            self.handler.add_file_handler(str(log_file))
 
+    def test_file_handler_with_errors(self, log_file):
+        """Test file handler logs errors."""
+        with scoped_file_handler(self.handler, str(log_file)):
             error = ValueError("Test error")
             self.handler.handle_exception(error)
 
             with open(log_file, "r") as f:
                 content = f.read()
                 assert "ValueError" in content or "Test error" in content
-            
-            # Close file handlers
-            for handler in self.handler.logger.handlers:
-                if hasattr(handler, 'close'):
-                    try:
-                        handler.close()
-                    except:
-                        pass
+
+    def test_background_file_handler(self, log_file):
+        """Test that background file handler writes records on close."""
+        with scoped_file_handler(self.handler, str(log_file), background=True) as file_handler:
+            self.handler.log_info("Background message")
+
+        assert file_handler not in self.handler.logger.handlers
+        assert "Background message" in log_file.read_text()
+
+    def test_remove_file_handlers(self, log_dir):
+        """Test that remove_file_handlers detaches plain and background handlers."""
+        self.handler.add_file_handler(str(log_dir / "plain.log"))
+        self.handler.add_file_handler(str(log_dir / "background.log"), background=True)
+
+        self.handler.remove_file_handlers()
+
+        assert all(
+            not isinstance(h, (logging.FileHandler, BackgroundFileHandler))
+            for h in self.handler.logger.handlers
+        )
+        assert self.handler.logger.handlers
 
 
 class TestLoggingFunctions:
@@ -244,20 +383,11 @@ class TestLoggingFunctions:
         """Set up test fixtures."""
         self.handler = get_error_handler()
         self.handler.clear_error_history()
-        
-        # Remove any file handlers to avoid conflicts
-        for handler in list(self.handler.logger.handlers):
-            if isinstance(handler, logging.FileHandler):
-                handler.close()
-                self.handler.logger.removeHandler(handler)
+        self.handler.remove_file_handlers()
 
     def teardown_method(self):
         """Clean up after each test."""
-        # Close and remove file handlers
-        for handler in list(self.handler.logger.handlers):
-            if isinstance(handler, logging.FileHandler):
-                handler.close()
-                self.handler.logger.removeHandler(handler)
+        self.handler.remove_file_handlers()
 
     def test_log_debug(self):
         """Test log_debug function."""
@@ -269,6 +399,13 @@ class TestLoggingFunctions:
         log_info("Info message")
         # Should not raise
 
+    def test_log_info_formats_args(self, caplog):
+        """Test that log_info applies %-style arguments."""
+        with caplog.at_level(logging.INFO, logger="whatsapp_client"):
+            log_info("User %s joined %d groups", "alice", 3)
+
+        assert "User alice joined 3 groups" in caplog.text
+
     def test_log_warning(self):
         """Test log_warning function."""
         log_warning("Warning message")
@@ -299,23 +436,12 @@ class TestLoggingFunctions:
         configure_logging(log_level=LogLevel.ERROR)
         assert self.handler.log_level == LogLevel.ERROR
 
-    def test_configure_logging_with_file(self):
+    def test_configure_logging_with_file(self, log_file):
         """Test configure_logging with file."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            log_file = Path(temp_dir) / "app.log"
-            configure_logging(log_level=LogLevel.INFO, log_file=str(log_file))
+        configure_logging(log_level=LogLevel.INFO, log_file=str(log_file))
 
-            log_info("Test message")
-            assert log_file.exists()
-            
-            # Close file handlers
-            handler = get_error_handler()
-            for h in handler.logger.handlers:
-                if hasattr(h, 'close'):
-                    try:
-                        h.close()
-                    except:
-                        pass
+        log_info("Test message")
+        assert log_file.exists()
 
 
 class TestErrorHandlingIntegration:
@@ -325,20 +451,11 @@ class TestErrorHandlingIntegration:
         """Set up test fixtures."""
         self.handler = get_error_handler()
         self.handler.clear_error_history()
-        
-        # Remove any file handlers to avoid conflicts
-        for handler in list(self.handler.logger.handlers):
-            if isinstance(handler, logging.FileHandler):
-                handler.close()
-                self.handler.logger.removeHandler(handler)
+        self.handler.remove_file_handlers()
 
     def teardown_method(self):
         """Clean up after each test."""
-        # Close and remove file handlers
-        for handler in list(self.handler.logger.handlers):
-            if isinstance(handler, logging.FileHandler):
-                handler.close()
-                self.handler.logger.removeHandler(handler)
+        self.handler.remove_file_handlers()
 
     def test_multiple_errors_tracking(self):
         """Test tracking multiple errors."""
@@ -361,6 +478,15 @@ class TestErrorHandlingIntegration:
         error_info = self.handler.error_history[0]
         assert error_info["context"] == "save_message"
 
+    def test_repeated_context_shares_string(self):
+        """Test that equal dynamic contexts are stored as one string object."""
+        for i in range(2):
+            handle_exception(ValueError(f"Error {i}"), context="".join(["send_", "message"]))
+
+        first, second = self.handler.get_error_history(count=2)
+        assert first["context"] == "send_message"
+        assert first["context"] is second["context"]
+
     def test_error_message_preservation(self):
         """Test that error message is preserved."""
         error_msg = "Network connection failed"
@@ -398,20 +524,11 @@ class TestErrorHandlingEdgeCases:
         """Set up test fixtures."""
         self.handler = get_error_handler()
         self.handler.clear_error_history()
-        
-        # Remove any file handlers to avoid conflicts
-        for handler in list(self.handler.logger.handlers):
-            if isinstance(handler, logging.FileHandler):
-                handler.close()
-                self.handler.logger.removeHandler(handler)
+        self.handler.remove_file_handlers()
 
     def teardown_method(self):
         """Clean up after each test."""
-        # Close and remove file handlers
-        for handler in list(self.handler.logger.handlers):
-            if isinstance(handler, logging.FileHandler):
-                handler.close()
-                self.handler.logger.removeHandler(handler)
+        self.handler.remove_file_handlers()
 
     def test_handle_exception_with_no_context(self):
         """Test handling exception without context."""
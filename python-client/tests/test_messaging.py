@@ -2,12 +2,17 @@
 
 import pytest
 import asyncio
+import json
 from unittest.mock import AsyncMock, MagicMock, patch
+import sqlite3
 import time
 import uuid
+from pathlib import Path
+
+import websockets
 
 from whatsapp_client import WhatsAppClient
-from whatsapp_client.transport import WebSocketClient, ConnectionState
+from whatsapp_client.transport import RestClient, WebSocketClient, ConnectionState, _json
 from whatsapp_client.storage import MessageStorage
 from whatsapp_client.models import Message
 from whatsapp_client.exceptions import WhatsAppClientError
@@ -19,12 +24,36 @@ def temp_storage(tmp_path):
     return str(tmp_path / "test_storage")
 
 
+@pytest.fixture(scope="session")
+def message_db_template(tmp_path_factory):
+    """Message database with the schema already created, built once per session."""
+    storage = MessageStorage(str(tmp_path_factory.mktemp("template")), "test_user_id")
+    return storage.db_path
+
+
 @pytest.fixture
-def message_storage(temp_storage):
-    """Create message storage instance."""
+def message_storage(temp_storage, message_db_template):
+    """Create message storage instance from a copy of the template database."""
+    target = Path(temp_storage)
+    target.mkdir(parents=True)
+    
+    source = sqlite3.connect(message_db_template)
+    dest = sqlite3.connect(target / message_db_template.name)
+    try:
+        source.backup(dest)
+    finally:
+        source.close()
+        dest.close()
+    
     return MessageStorage(temp_storage, "test_user_id")
 
 
+@pytest.fixture
+def memory_storage():
+    """Create message storage backed by an in-memory database."""
+    return MessageStorage(":memory:", "test_user_id")
+
+
 @pytest.mark.asyncio
 async def test_websocket_connection():
     """Test WebSocket connection initialization."""
@@ -67,6 +96,118 @@ async def test_websocket_message_sending():
     await ws.close()
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize("use_orjson", [True, False])
+async def test_websocket_frame_codec(use_orjson, monkeypatch):
+    """Test that frames round-trip with and without orjson installed."""
+    if use_orjson:
+        orjson = pytest.importorskip("orjson")
+        monkeypatch.setattr(_json, "loads", orjson.loads)
+    else:
+        monkeypatch.setattr(_json, "orjson", None)
+        monkeypatch.setattr(_json, "loads", json.loads)
+    
+    ws = WebSocketClient(
+        server_url="http://localhost:8787",
+        user_id="test_user",
+        auto_reconnect=False,
+    )
+    mock_ws = AsyncMock()
+    ws._ws = mock_ws
+    ws._state = ConnectionState.CONNECTED
+    
+    await ws.send_message("recipient_id", "héllo \u2603", "text")
+    frame = mock_ws.send.call_args[0][0]
+    
+    assert isinstance(frame, str)
+    assert _json.loads(frame)["payload"]["content"] == "héllo \u2603"
+    with pytest.raises(json.JSONDecodeError):
+        _json.loads("{not json")
+    
+    await ws.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("use_orjson", [True, False])
+async def test_rest_json_codec(use_orjson, monkeypatch):
+    """Test that REST bodies round-trip with and without orjson installed."""
+    web = pytest.importorskip("aiohttp.web")
+    if use_orjson:
+        orjson = pytest.importorskip("orjson")
+        monkeypatch.setattr(_json, "loads", orjson.loads)
+    else:
+        monkeypatch.setattr(_json, "orjson", None)
+        monkeypatch.setattr(_json, "loads", json.loads)
+    
+    async def echo(request):
+        return web.json_response({"received": await request.json()})
+    
+    app = web.Application()
+    app.router.add_post("/echo", echo)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    
+    client = RestClient(f"http://127.0.0.1:{port}")
+    try:
+        response = await client.post("/echo", {"content": "héllo \u2603", "n": 1})
+    finally:
+        await client.close()
+        await runner.cleanup()
+    
+    assert response == {"received": {"content": "héllo \u2603", "n": 1}}
+
+
+@pytest.fixture
+async def loopback_ws_server():
+    """Local WebSocket server that records frames and replies to each chat message."""
+    received = []
+    
+    async def handler(conn):
+        async for frame in conn:
+            data = json.loads(frame)
+            received.append(data)
+            if data["type"] == "message":
+                await conn.send(json.dumps({
+                    "type": "message",
+                    "from": data["payload"]["to"],
+                    "content": data["payload"]["content"],
+                }))
+    
+    async with websockets.serve(handler, "127.0.0.1", 0) as server:
+        host, port = server.sockets[0].getsockname()[:2]
+        yield f"http://{host}:{port}", received
+
+
+@pytest.mark.asyncio
+async def test_websocket_loopback_roundtrip(loopback_ws_server):
+    """Test real frames over a local socket: auth, send, and routed reply."""
+    server_url, received = loopback_ws_server
+    ws = WebSocketClient(
+        server_url=server_url,
+        user_id="test_user",
+        username="alice",
+        auto_reconnect=False,
+    )
+    replies = asyncio.Queue()
+    
+    @ws.on_message
+    async def handle_message(msg):
+        await replies.put(msg)
+    
+    await ws.connect()
+    await ws.send_message("bob", "Hello, Bob!")
+    reply = await asyncio.wait_for(replies.get(), timeout=5)
+    
+    assert [frame["type"] for frame in received] == ["auth", "message"]
+    assert received[1]["payload"]["content"] == "Hello, Bob!"
+    assert reply == {"type": "message", "from": "bob", "content": "Hello, Bob!"}
+    
+    await ws.close()
+
+
 @pytest.mark.asyncio
 async def test_websocket_event_handlers():
     """Test WebSocket event handler registration."""
@@ -94,13 +235,41 @@ async def test_websocket_event_handlers():
     await ws.close()
 
 
+@pytest.mark.asyncio
+async def test_websocket_sync_and_async_handlers():
+    """Test that plain and async handlers both run, in order, despite a failure."""
+    ws = WebSocketClient(
+        server_url="http://localhost:8787",
+        user_id="test_user",
+    )
+    calls = []
+    
+    @ws.on_typing
+    def failing(data):
+        raise RuntimeError("boom")
+    
+    @ws.on_typing
+    def plain(data):
+        calls.append(("plain", data["from"]))
+    
+    @ws.on_typing
+    async def coro(data):
+        calls.append(("async", data["from"]))
+    
+    await ws._route_message({"type": "typing", "from": "alice", "typing": True})
+    
+    assert calls == [("plain", "alice"), ("async", "alice")]
+    
+    await ws.close()
+
+
 def test_message_storage_initialization(message_storage):
     """Test message storage initialization."""
     assert message_storage.user_id == "test_user_id"
     assert message_storage.db_path.exists()
 
 
-def test_save_and_retrieve_messages(message_storage):
+def test_save_and_retrieve_messages(memory_storage):
     """Test saving and retrieving messages."""
     # Create test messages
     msg1 = Message(
@@ -124,11 +293,10 @@ def test_save_and_retrieve_messages(message_storage):
     )
     
     # Save messages
-    message_storage.save_message(msg1)
-    message_storage.save_message(msg2)
+    memory_storage.save_messages([msg1, msg2])
     
     # Retrieve messages
-    messages = message_storage.get_messages("alice", limit=10)
+    messages = memory_storage.get_messages("alice", limit=10)
     
     assert len(messages) == 2
     assert messages[0].id == "msg1"  # Chronological order
@@ -154,9 +322,57 @@ def test_message_deduplication(message_storage):
     # Should only have one message
     messages = message_storage.get_messages("alice")
     assert len(messages) == 1
+    
+    # A resend with the same ID must not overwrite the stored copy
+    message_storage.save_message(msg.model_copy(update={"content": "Changed"}))
+    assert message_storage.get_messages("alice")[0].content == "Hello"
 
 
-def test_update_message_status(message_storage):
+def test_bulk_defers_writes_until_exit(memory_storage):
+    """Test that save_message inside bulk() is flushed in one batch."""
+    msgs = [
+        Message(
+            id=f"msg{i}",
+            from_user="test_user_id",
+            to="alice",
+            content=f"Hello {i}",
+            type="text",
+            timestamp=1000 + i,
+            status="sent",
+        )
+        for i in range(3)
+    ]
+    
+    with memory_storage.bulk():
+        for msg in msgs:
+            memory_storage.save_message(msg)
+        memory_storage.save_message(msgs[0])
+        assert memory_storage.get_messages("alice") == []
+    
+    assert [m.id for m in memory_storage.get_messages("alice")] == ["msg0", "msg1", "msg2"]
+
+
+def test_bulk_discards_writes_on_error(memory_storage):
+    """Test that an exception inside bulk() drops the buffered messages."""
+    msg = Message(
+        id="msg1",
+        from_user="test_user_id",
+        to="alice",
+        content="Hello",
+        type="text",
+        timestamp=1000,
+        status="sent",
+    )
+    
+    with pytest.raises(RuntimeError):
+        with memory_storage.bulk():
+            memory_storage.save_message(msg)
+            raise RuntimeError("boom")
+    
+    assert memory_storage.get_messages("alice") == []
+
+
+def test_update_message_status(memory_storage):
     """Test updating message status."""
     msg = Message(
         id="msg1",
@@ -168,14 +384,14 @@ def test_update_message_status(message_storage):
         status="sent",
     )
     
-    message_storage.save_message(msg)
-    message_storage.update_message_status("msg1", "delivered")
+    memory_storage.save_message(msg)
+    memory_storage.update_message_status("msg1", "delivered")
     
-    messages = message_storage.get_messages("alice")
+    messages = memory_storage.get_messages("alice")
     assert messages[0].status == "delivered"
 
 
-def test_search_messages(message_storage):
+def test_search_messages(memory_storage):
     """Test message search functionality."""
     messages = [
         Message(
@@ -190,21 +406,68 @@ def test_search_messages(message_storage):
         for i in range(5)
     ]
     
-    for msg in messages:
-        message_storage.save_message(msg)
+    memory_storage.save_messages(messages)
     
     # Search for "Message"
-    results = message_storage.search_messages("Message", peer_id="alice")
+    results = memory_storage.search_messages("Message", peer_id="alice")
     assert len(results) == 3  # Messages 0, 2, 4
 
 
-def test_get_recent_conversations(message_storage):
+def test_search_messages_substring_and_syntax(memory_storage):
+    """Test that search matches substrings and treats FTS operators literally."""
+    contents = ["Important: call mom", "unimportant", 'quote "AND" OR*', "ok"]
+    memory_storage.save_messages(
+        Message(
+            id=f"msg{i}",
+            from_user="test_user_id",
+            to="alice",
+            content=content,
+            type="text",
+            timestamp=1000 + i,
+            status="sent",
+        )
+        for i, content in enumerate(contents)
+    )
+    
+    assert {m.id for m in memory_storage.search_messages("IMPORTANT")} == {"msg0", "msg1"}
+    assert [m.id for m in memory_storage.search_messages('"AND" OR*')] == ["msg2"]
+    assert [m.id for m in memory_storage.search_messages("ok")] == ["msg3"]
+    
+    memory_storage.delete_conversation("alice")
+    assert memory_storage.search_messages("important") == []
+
+
+def test_search_index_built_for_existing_messages(temp_storage):
+    """Test that messages stored before the FTS table existed are searchable."""
+    storage = MessageStorage(temp_storage, "test_user_id")
+    storage.save_messages([
+        Message(
+            id="msg1",
+            from_user="test_user_id",
+            to="alice",
+            content="legacy message",
+            type="text",
+            timestamp=1000,
+            status="sent",
+        )
+    ])
+    conn = storage._connect()
+    with conn:
+        conn.execute("DROP TABLE messages_fts")
+        conn.execute("DROP TRIGGER messages_fts_insert")
+    storage.close()
+    
+    reopened = MessageStorage(temp_storage, "test_user_id")
+    assert [m.id for m in reopened.search_messages("legacy")] == ["msg1"]
+
+
+def test_get_recent_conversations(memory_storage):
     """Test getting recent conversations."""
     # Add messages with different peers
     peers = ["alice", "bob", "charlie"]
     
-    for i, peer in enumerate(peers):
-        msg = Message(
+    memory_storage.save_messages(
+        Message(
             id=f"msg_{peer}",
             from_user="test_user_id",
             to=peer,
@@ -213,20 +476,42 @@ def test_get_recent_conversations(message_storage):
             timestamp=1000 + i * 100,
             status="sent",
         )
-        message_storage.save_message(msg)
+        for i, peer in enumerate(peers)
+    )
     
-    conversations = message_storage.get_recent_conversations(limit=5)
+    conversations = memory_storage.get_recent_conversations(limit=5)
     
     assert len(conversations) == 3
     # Most recent should be charlie
     assert conversations[0]["peer_id"] == "charlie"
 
 
-def test_delete_conversation(message_storage):
+def test_get_recent_conversations_timestamp_tie(memory_storage):
+    """Test that messages sharing a timestamp still give one conversation entry."""
+    memory_storage.save_messages(
+        Message(
+            id=f"msg{i}",
+            from_user="test_user_id" if i % 2 == 0 else "alice",
+            to="alice" if i % 2 == 0 else "test_user_id",
+            content=f"Message {i}",
+            type="text",
+            timestamp=1000,
+            status="sent",
+        )
+        for i in range(3)
+    )
+    
+    conversations = memory_storage.get_recent_conversations()
+    
+    assert len(conversations) == 1
+    assert conversations[0]["last_message"]["id"] == "msg2"
+
+
+def test_delete_conversation(memory_storage):
     """Test deleting a conversation."""
     # Add messages
-    for i in range(3):
-        msg = Message(
+    memory_storage.save_messages(
+        Message(
             id=f"msg{i}",
             from_user="test_user_id" if i % 2 == 0 else "alice",
             to="alice" if i % 2 == 0 else "test_user_id",
@@ -235,18 +520,30 @@ def test_delete_conversation(message_storage):
             timestamp=1000 + i,
             status="sent",
         )
-        message_storage.save_message(msg)
+        for i in range(3)
+    )
     
     # Delete conversation
-    deleted = message_storage.delete_conversation("alice")
+    deleted = memory_storage.delete_conversation("alice")
     assert deleted == 3
     
     # Verify deletion
-    messages = message_storage.get_messages("alice")
+    messages = memory_storage.get_messages("alice")
     assert len(messages) == 0
 
 
-def test_message_storage_stats(message_storage):
+def test_message_storage_stats_empty(memory_storage):
+    """Test that statistics on an empty database are all zero."""
+    assert memory_storage.get_stats() == {
+        "total_messages": 0,
+        "messages_sent": 0,
+        "messages_received": 0,
+        "encrypted_messages": 0,
+        "unique_peers": 0,
+    }
+
+
+def test_message_storage_stats(memory_storage):
     """Test storage statistics."""
     # Add test messages
     messages = [
@@ -262,10 +559,9 @@ def test_message_storage_stats(message_storage):
         for i in range(6)
     ]
     
-    for msg in messages:
-        message_storage.save_message(msg)
+    memory_storage.save_messages(messages)
     
-    stats = message_storage.get_stats()
+    stats = memory_storage.get_stats()
     
     assert stats["total_messages"] == 6
     assert stats["messages_sent"] == 3
@@ -275,10 +571,11 @@ def test_message_storage_stats(message_storage):
 
 
 @pytest.mark.asyncio
-async def test_client_message_sending_integration(temp_storage):
+async def test_client_message_sending_integration(temp_storage, fast_kdf):
     """Test sending messages through WhatsAppClient."""
     client = WhatsAppClient(
         server_url="http://localhost:8787",
+        kdf_params=fast_kdf,
         storage_path=temp_storage,
         auto_connect=False,  # Don't auto-connect for testing
     )
@@ -326,10 +623,11 @@ async def test_client_message_sending_integration(temp_storage):
 
 
 @pytest.mark.asyncio
-async def test_client_message_receiving(temp_storage):
+async def test_client_message_receiving(temp_storage, fast_kdf):
     """Test receiving messages through WhatsAppClient."""
     client = WhatsAppClient(
         server_url="http://localhost:8787",
+        kdf_params=fast_kdf,
         storage_path=temp_storage,
         auto_connect=False,
     )
@@ -384,10 +682,11 @@ async def test_client_message_receiving(temp_storage):
 
 
 @pytest.mark.asyncio
-async def test_client_get_message_history(temp_storage):
+async def test_client_get_message_history(temp_storage, fast_kdf):
     """Test retrieving message history."""
     client = WhatsAppClient(
         server_url="http://localhost:8787",
+        kdf_params=fast_kdf,
         storage_path=temp_storage,
         auto_connect=False,
     )
@@ -414,8 +713,8 @@ async def test_client_get_message_history(temp_storage):
         await client.login("alice", "password123")
     
     # Add some test messages directly to storage
-    for i in range(5):
-        msg = Message(
+    client._message_storage.save_messages(
+        Message(
             id=f"msg{i}",
             from_user="test_user_id" if i % 2 == 0 else "bob_user_id",
             to="bob_user_id" if i % 2 == 0 else "test_user_id",
@@ -424,7 +723,8 @@ async def test_client_get_message_history(temp_storage):
             timestamp=1000 + i,
             status="sent",
         )
-        client._message_storage.save_message(msg)
+        for i in range(5)
+    )
     
     # Get message history
     messages = await client.get_messages("bob_user_id", limit=10)
@@ -436,10 +736,11 @@ async def test_client_get_message_history(temp_storage):
 
 
 @pytest.mark.asyncio
-async def test_client_search_messages(temp_storage):
+async def test_client_search_messages(temp_storage, fast_kdf):
     """Test searching messages."""
     client = WhatsAppClient(
         server_url="http://localhost:8787",
+        kdf_params=fast_kdf,
         storage_path=temp_storage,
         auto_connect=False,
     )
@@ -472,8 +773,8 @@ async def test_client_search_messages(temp_storage):
         ("important", "Another important one"),
     ]
     
-    for i, (tag, content) in enumerate(messages_data):
-        msg = Message(
+    client._message_storage.save_messages(
+        Message(
             id=f"msg{i}",
             from_user="bob_user_id",
             to="test_user_id",
@@ -482,7 +783,8 @@ async def test_client_search_messages(temp_storage):
             timestamp=1000 + i,
             status="delivered",
         )
-        client._message_storage.save_message(msg)
+        for i, (tag, content) in enumerate(messages_data)
+    )
     
     # Search for "important"
     results = await client.search_messages("important")
@@ -493,10 +795,11 @@ async def test_client_search_messages(temp_storage):
 
 
 @pytest.mark.asyncio
-async def test_typing_indicator(temp_storage):
+async def test_typing_indicator(temp_storage, fast_kdf):
     """Test sending typing indicators."""
     client = WhatsAppClient(
         server_url="http://localhost:8787",
+        kdf_params=fast_kdf,
         storage_path=temp_storage,
         auto_connect=False,
     )
@@ -537,10 +840,11 @@ async def test_typing_indicator(temp_storage):
 
 
 @pytest.mark.asyncio
-async def test_connection_properties(temp_storage):
+async def test_connection_properties(temp_storage, fast_kdf):
     """Test connection state properties."""
     client = WhatsAppClient(
         server_url="http://localhost:8787",
+        kdf_params=fast_kdf,
         storage_path=temp_storage,
         auto_connect=False,
     )
@@ -574,3 +878,66 @@ async def test_connection_properties(temp_storage):
     assert not client.is_connected
     
     await client.close()
+
+
+def test_memory_storage_is_private_and_persistent(memory_storage):
+    """Test that an in-memory database keeps data across calls and per instance."""
+    memory_storage.save_message(Message(
+        id="msg1",
+        from_user="test_user_id",
+        to="alice",
+        content="Hello",
+        type="text",
+        timestamp=1000,
+        status="sent",
+    ))
+    
+    assert [m.id for m in memory_storage.get_messages("alice")] == ["msg1"]
+    assert MessageStorage(":memory:", "test_user_id").get_messages("alice") == []
+
+
+def test_message_storage_uses_wal(message_storage):
+    """Test that the message database is opened in WAL mode."""
+    conn = message_storage._connect()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+
+def test_message_storage_safe_mode(temp_storage, monkeypatch):
+    """Test that WHATSAPP_SQLITE_SAFE=1 keeps synchronous=FULL."""
+    monkeypatch.setenv("WHATSAPP_SQLITE_SAFE", "1")
+    storage = MessageStorage(temp_storage, "test_user_id")
+    
+    assert storage._connect().execute("PRAGMA synchronous").fetchone()[0] == 2  # FULL
+
+
+def test_message_storage_reuses_connection(message_storage):
+    """Test that calls share one connection and close() lets the next call reopen it."""
+    conn = message_storage._connect()
+    message_storage.get_stats()
+    assert message_storage._connect() is conn
+    
+    message_storage.close()
+    assert message_storage.get_stats()["total_messages"] == 0
+    assert message_storage._connect() is not conn
+
+
+@pytest.mark.asyncio
+async def test_send_message_uses_clock(temp_storage, monkeypatch, fast_kdf):
+    """Test that outgoing messages are stamped from clock.now_ms."""
+    monkeypatch.setattr("whatsapp_client.client.now_ms", lambda: 1234)
+    client = WhatsAppClient(
+        server_url="http://localhost:8787",
+        kdf_params=fast_kdf,
+        storage_path=temp_storage,
+        auto_connect=False,
+    )
+    client._auth._user_id = "test_user_id"
+    client._ws = AsyncMock()
+    client._ws.is_connected = True
+    
+    message = await client.send_message_realtime(to="bob_user_id", content="Hi", encrypt=False)
+    
+    assert message.timestamp == 1234
+    
+    await client.close()
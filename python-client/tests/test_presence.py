@@ -1,57 +1,117 @@
 """Tests for US8: Typing Indicators and Presence."""
 
 import pytest
-from unittest.mock import AsyncMock, MagicMock, patch
+from dataclasses import dataclass
+from unittest.mock import AsyncMock, patch
 from whatsapp_client import WhatsAppClient
-from whatsapp_client.transport import WebSocketClient
+from whatsapp_client.client import TYPING_RESEND_INTERVAL
+
+# Every test here is async; share one event loop across the module
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
+
+@pytest.fixture
+def client():
+    """Create a test client."""
+    return WhatsAppClient(server_url="http://test.com")
+
+
+@dataclass(frozen=True)
+class FakeUser:
+    """Logged-in user stand-in; the client only reads id and username."""
+    
+    id: str
+    username: str
+
+
+class RecordingWS:
+    """Minimal connected WebSocket stand-in that records typing indicators."""
+    
+    is_connected = True
+    
+    def __init__(self):
+        self.typing_calls = []
+    
+    async def send_typing(self, to, typing):
+        self.typing_calls.append((to, typing))
 
 
 class TestTypingIndicators:
     """Test typing indicator functionality."""
     
-    @pytest.mark.asyncio
-    async def test_send_typing_indicator(self):
+    async def test_send_typing_indicator(self, auth_client):
         """Test sending typing indicator."""
-        client = WhatsAppClient(server_url="http://test.com")
+        client = auth_client
         
         # Mock authenticated state
-        client._auth._user_id = "user_123"
-        client._auth._user = MagicMock(id="user_123", username="alice")
+        client._auth._user = FakeUser("user_123", "alice")
         
-        # Mock WebSocket
-        mock_ws = AsyncMock(spec=WebSocketClient)
-        mock_ws.send_typing = AsyncMock()
-        client._ws = mock_ws
+        client._ws = RecordingWS()
         
         # Send typing indicator
         await client.send_typing(to="user_456", typing=True)
         
         # Verify WebSocket method was called
-        mock_ws.send_typing.assert_called_once_with("user_456", True)
+        assert client._ws.typing_calls == [("user_456", True)]
     
-    @pytest.mark.asyncio
-    async def test_send_typing_stopped(self):
+    async def test_send_typing_stopped(self, auth_client):
         """Test sending typing stopped indicator."""
-        client = WhatsAppClient(server_url="http://test.com")
+        client = auth_client
         
         # Mock authenticated state
-        client._auth._user_id = "user_123"
-        client._auth._user = MagicMock(id="user_123", username="alice")
+        client._auth._user = FakeUser("user_123", "alice")
         
-        # Mock WebSocket
-        mock_ws = AsyncMock(spec=WebSocketClient)
-        mock_ws.send_typing = AsyncMock()
-        client._ws = mock_ws
+        client._ws = RecordingWS()
         
         # Send typing stopped
         await client.send_typing(to="user_456", typing=False)
         
-        mock_ws.send_typing.assert_called_once_with("user_456", False)
+        assert client._ws.typing_calls == [("user_456", False)]
     
-    @pytest.mark.asyncio
-    async def test_typing_handler_registration(self):
+    async def test_send_typing_coalesces_repeats(self, auth_client):
+        """Test that repeated typing states are dropped until the resend interval."""
+        client = auth_client
+        client._ws = RecordingWS()
+        
+        # Keystrokes: only the first True goes out
+        for _ in range(5):
+            await client.send_typing(to="user_456", typing=True)
+        await client.send_typing(to="user_789", typing=True)
+        
+        # State change is sent immediately
+        await client.send_typing(to="user_456", typing=False)
+        await client.send_typing(to="user_456", typing=True)
+        
+        # Same state is re-announced once the interval has passed
+        state, sent_at = client._typing_sent["user_456"]
+        client._typing_sent["user_456"] = (state, sent_at - TYPING_RESEND_INTERVAL)
+        await client.send_typing(to="user_456", typing=True)
+        
+        assert client._ws.typing_calls == [
+            ("user_456", True),
+            ("user_789", True),
+            ("user_456", False),
+            ("user_456", True),
+            ("user_456", True),
+        ]
+    
+    async def test_typing_state_cleared_on_disconnect_and_logout(self, auth_client):
+        """Test that a dropped connection or logout resets typing coalescing."""
+        client = auth_client
+        client._ws = RecordingWS()
+        
+        await client.send_typing(to="user_456", typing=True)
+        await client._handle_connection(False)
+        await client.send_typing(to="user_456", typing=True)
+        assert client._ws.typing_calls == [("user_456", True), ("user_456", True)]
+        
+        client._ws = None
+        with patch.object(client._auth, "logout", new=AsyncMock()):
+            await client.logout()
+        assert client._typing_sent == {}
+    
+    async def test_typing_handler_registration(self, client):
         """Test registering typing event handler."""
-        client = WhatsAppClient(server_url="http://test.com")
         
         # Create handler
         handler_called = False
@@ -70,10 +130,8 @@ class TestTypingIndicators:
         # Verify handler was called
         assert handler_called
     
-    @pytest.mark.asyncio
-    async def test_typing_event_handling(self):
+    async def test_typing_event_handling(self, client):
         """Test handling typing events from other users."""
-        client = WhatsAppClient(server_url="http://test.com")
         
         typing_events = []
         
@@ -92,10 +150,8 @@ class TestTypingIndicators:
         assert typing_events[0]["typing"] is True
         assert typing_events[2]["typing"] is False
     
-    @pytest.mark.asyncio
-    async def test_multiple_typing_handlers(self):
+    async def test_multiple_typing_handlers(self, client):
         """Test multiple typing handlers."""
-        client = WhatsAppClient(server_url="http://test.com")
         
         handler1_calls = []
         handler2_calls = []
@@ -119,10 +175,8 @@ class TestTypingIndicators:
 class TestPresenceTracking:
     """Test presence tracking functionality."""
     
-    @pytest.mark.asyncio
-    async def test_presence_handler_registration(self):
+    async def test_presence_handler_registration(self, client):
         """Test registering presence event handler."""
-        client = WhatsAppClient(server_url="http://test.com")
         
         handler_called = False
         
@@ -140,105 +194,46 @@ class TestPresenceTracking:
         # Verify handler was called
         assert handler_called
     
-    @pytest.mark.asyncio
-    async def test_presence_tracking_online(self):
-        """Test tracking user coming online."""
-        client = WhatsAppClient(server_url="http://test.com")
-        
-        # User comes online
-        await client._handle_presence({"userId": "user_456", "online": True})
-        
-        # Verify tracking
-        assert client.is_user_online("user_456") is True
-        assert "user_456" in client.get_online_users()
-    
-    @pytest.mark.asyncio
-    async def test_presence_tracking_offline(self):
-        """Test tracking user going offline."""
-        client = WhatsAppClient(server_url="http://test.com")
+    @pytest.mark.parametrize(
+        "events,expected_online,expected_all",
+        [
+            pytest.param([], set(), {}, id="untracked"),
+            pytest.param([("user_456", True)], {"user_456"}, {"user_456": True}, id="online"),
+            pytest.param(
+                [("user_456", True), ("user_456", False)],
+                set(),
+                {"user_456": False},
+                id="online-then-offline",
+            ),
+            pytest.param(
+                [("user_456", True), ("user_789", True), ("user_abc", True)],
+                {"user_456", "user_789", "user_abc"},
+                {"user_456": True, "user_789": True, "user_abc": True},
+                id="multiple-online",
+            ),
+            pytest.param(
+                [("user_456", True), ("user_789", False), ("user_abc", True)],
+                {"user_456", "user_abc"},
+                {"user_456": True, "user_789": False, "user_abc": True},
+                id="mixed",
+            ),
+        ],
+    )
+    async def test_presence_tracking(self, client, events, expected_online, expected_all):
+        """Test online tracking after a sequence of presence events."""
+        
+        for user_id, online in events:
+            await client._handle_presence({"userId": user_id, "online": online})
         
-        # User comes online
-        await client._handle_presence({"userId": "user_456", "online": True})
-        assert client.is_user_online("user_456") is True
-        
-        # User goes offline
-        await client._handle_presence({"userId": "user_456", "online": False})
-        
-        # Verify tracking
-        assert client.is_user_online("user_456") is False
-        assert "user_456" not in client.get_online_users()
-    
-    @pytest.mark.asyncio
-    async def test_multiple_users_online(self):
-        """Test tracking multiple users online."""
-        client = WhatsAppClient(server_url="http://test.com")
-        
-        # Multiple users come online
-        await client._handle_presence({"userId": "user_456", "online": True})
-        await client._handle_presence({"userId": "user_789", "online": True})
-        await client._handle_presence({"userId": "user_abc", "online": True})
-        
-        # Verify all tracked
         online_users = client.get_online_users()
-        assert len(online_users) == 3
-        assert "user_456" in online_users
-        assert "user_789" in online_users
-        assert "user_abc" in online_users
-    
-    @pytest.mark.asyncio
-    async def test_get_online_users(self):
-        """Test getting list of online users."""
-        client = WhatsAppClient(server_url="http://test.com")
-        
-        # Initially empty
-        assert client.get_online_users() == []
-        
-        # Add online users
-        await client._handle_presence({"userId": "user_456", "online": True})
-        await client._handle_presence({"userId": "user_789", "online": True})
-        
-        online = client.get_online_users()
-        assert len(online) == 2
-        assert "user_456" in online
-        assert "user_789" in online
-    
-    @pytest.mark.asyncio
-    async def test_is_user_online(self):
-        """Test checking if specific user is online."""
-        client = WhatsAppClient(server_url="http://test.com")
-        
-        # User not tracked yet
-        assert client.is_user_online("user_456") is False
-        
-        # User comes online
-        await client._handle_presence({"userId": "user_456", "online": True})
-        assert client.is_user_online("user_456") is True
-        
-        # User goes offline
-        await client._handle_presence({"userId": "user_456", "online": False})
-        assert client.is_user_online("user_456") is False
-    
-    @pytest.mark.asyncio
-    async def test_get_all_presence(self):
-        """Test getting all presence data."""
-        client = WhatsAppClient(server_url="http://test.com")
-        
-        # Add mixed online/offline users
-        await client._handle_presence({"userId": "user_456", "online": True})
-        await client._handle_presence({"userId": "user_789", "online": False})
-        await client._handle_presence({"userId": "user_abc", "online": True})
-        
-        presence = client.get_all_presence()
-        
-        assert len(presence) == 3
-        assert presence["user_456"] is True
-        assert presence["user_789"] is False
-        assert presence["user_abc"] is True
+        assert len(online_users) == len(expected_online)
+        assert set(online_users) == expected_online
+        assert client.get_all_presence() == expected_all
+        for user_id in ("user_456", "user_789", "user_abc"):
+            assert client.is_user_online(user_id) is (user_id in expected_online)
     
-    @pytest.mark.asyncio
-    async def test_presence_events_notification(self):
+    async def test_presence_events_notification(self, client):
         """Test presence event handlers are notified."""
-        client = WhatsAppClient(server_url="http://test.com")
         
         presence_events = []
         
@@ -255,14 +250,12 @@ class TestPresenceTracking:
         assert presence_events[0]["online"] is True
         assert presence_events[1]["online"] is False
     
-    @pytest.mark.asyncio
-    async def test_presence_cleared_on_logout(self):
+    async def test_presence_cleared_on_logout(self, auth_client):
         """Test presence tracking cleared on logout."""
-        client = WhatsAppClient(server_url="http://test.com")
+        client = auth_client
         
         # Mock authenticated state
-        client._auth._user_id = "user_123"
-        client._auth._user = MagicMock(id="user_123", username="alice")
+        client._auth._user = FakeUser("user_123", "alice")
         client._auth.logout = AsyncMock()
         
         # Add some presence data
@@ -282,10 +275,8 @@ class TestPresenceTracking:
 class TestIntegration:
     """Integration tests for typing and presence."""
     
-    @pytest.mark.asyncio
-    async def test_typing_and_presence_together(self):
+    async def test_typing_and_presence_together(self, client):
         """Test typing and presence work together."""
-        client = WhatsAppClient(server_url="http://test.com")
         
         typing_events = []
         presence_events = []
@@ -317,10 +308,8 @@ class TestIntegration:
         # Final state: user offline
         assert client.is_user_online("user_456") is False
     
-    @pytest.mark.asyncio
-    async def test_handler_error_doesnt_crash(self):
+    async def test_handler_error_doesnt_crash(self, client):
         """Test that handler errors don't crash the system."""
-        client = WhatsAppClient(server_url="http://test.com")
         
         other_handler_called = False
         
@@ -1,5 +1,7 @@
 """Tests for Double Ratchet encryption/decryption (US4 & US5)."""
 
+import copy
+
 import pytest
 from unittest.mock import AsyncMock, patch, MagicMock
 from nacl.public import PrivateKey, PublicKey
@@ -11,10 +13,72 @@ from whatsapp_client.models import Session
 from whatsapp_client.exceptions import WhatsAppClientError
 
 
+_MOCK_UPLOAD_RESPONSE = {
+    "success": True,
+    "signedPrekeyUploaded": True,
+    "oneTimePrekeysUploaded": 100,
+}
+
+_MOCK_PREKEY_BUNDLE = {
+    "identityKey": "a" * 64,
+    "signingKey": "b" * 64,
+    "fingerprint": "c" * 60,
+    "signedPrekey": {
+        "keyId": 1,
+        "publicKey": "d" * 64,
+        "signature": "e" * 128
+    },
+    "oneTimePrekeys": ["f" * 64]
+}
+
+
+def _mock_user(user_id, username, **extra):
+    """Login response for a user."""
+    return {
+        "id": user_id,
+        "username": username,
+        "avatar": None,
+        "lastSeen": 1234567890,
+        "role": "user",
+        "is_active": 1,
+        "can_send_images": 1,
+        "created_at": 1234567890,
+        **extra,
+    }
+
+
+@pytest.fixture(scope="session")
+def storage_root(tmp_path_factory):
+    """One temporary directory shared by every test's storage."""
+    return tmp_path_factory.mktemp("test_storage_root")
+
+
 @pytest.fixture
-def temp_storage(tmp_path):
-    """Create temporary storage directory."""
-    return str(tmp_path / "test_storage")
+def temp_storage(storage_root, request):
+    """Per-test storage directory under the shared root."""
+    return str(storage_root / request.node.name)
+
+
+@pytest.fixture(scope="module")
+def ratchet_pair_state():
+    """Serialized Alice (sender) / Bob (receiver) ratchets, initialized once per module."""
+    shared_secret = b"x" * 32
+    bob_key = PrivateKey.generate()
+    
+    alice = RatchetEngine()
+    alice.initialize_sender(shared_secret, bob_key.public_key)
+    
+    bob = RatchetEngine()
+    bob.initialize_receiver(shared_secret, bob_key)
+    
+    return alice.serialize_state(), bob.serialize_state()
+
+
+@pytest.fixture
+def ratchet_pair(ratchet_pair_state):
+    """Fresh Alice / Bob ratchets restored from the shared initial state."""
+    alice_state, bob_state = ratchet_pair_state
+    return RatchetEngine.deserialize_state(alice_state), RatchetEngine.deserialize_state(bob_state)
 
 
 def test_ratchet_header_serialization():
@@ -27,15 +91,29 @@ def test_ratchet_header_serialization():
     
     # Serialize (Signal protocol format)
     data = header.to_dict()
-    assert data["ratchetKey"] == "a" * 64
-    assert data["previousChainLength"] == 5
-    assert data["messageNumber"] == 10
+    assert data == {"ratchetKey": "a" * 64, "previousChainLength": 5, "messageNumber": 10}
     
     # Deserialize
-    header2 = RatchetHeader.from_dict(data)
-    assert header2.dh_public_key == header.dh_public_key
-    assert header2.prev_chain_length == header.prev_chain_length
-    assert header2.message_number == header.message_number
+    assert RatchetHeader.from_dict(data) == header
+
+
+@pytest.mark.parametrize("header", [
+    RatchetHeader(dh_public_key="", prev_chain_length=0, message_number=0),
+    RatchetHeader(dh_public_key="0123456789abcdef" * 4, prev_chain_length=1, message_number=0),
+    RatchetHeader(dh_public_key="f" * 64, prev_chain_length=2**31 - 1, message_number=2**31 - 1),
+    RatchetHeader(dh_public_key="QUJD+/==", prev_chain_length=7, message_number=1000),
+])
+def test_ratchet_header_roundtrip(header):
+    """Test that headers survive to_dict/from_dict and are hashable values."""
+    assert RatchetHeader.from_dict(header.to_dict()) == header
+    assert hash(RatchetHeader.from_dict(header.to_dict())) == hash(header)
+
+
+def test_ratchet_header_legacy_format():
+    """Test that the legacy dh/pn/n header format is still accepted."""
+    header = RatchetHeader.from_dict({"dh": "b" * 64, "pn": 3, "n": 4})
+    
+    assert header == RatchetHeader(dh_public_key="b" * 64, prev_chain_length=3, message_number=4)
 
 
 def test_ratchet_initialization():
@@ -79,17 +157,9 @@ def test_ratchet_receiver_initialization():
     assert ratchet.state.root_key == shared_secret
 
 
-def test_encrypt_decrypt_simple():
+def test_encrypt_decrypt_simple(ratchet_pair):
     """Test simple encrypt/decrypt cycle."""
-    # Setup Alice as sender
-    alice = RatchetEngine()
-    shared_secret = b"shared_secret_32bytes_long!!"[:32]
-    bob_identity = PrivateKey.generate()
-    alice.initialize_sender(shared_secret, bob_identity.public_key)
-    
-    # Setup Bob as receiver
-    bob = RatchetEngine()
-    bob.initialize_receiver(shared_secret, bob_identity)
+    alice, bob = ratchet_pair
     
     # Alice encrypts message
     plaintext = "Hello Bob!"
@@ -103,16 +173,9 @@ def test_encrypt_decrypt_simple():
     assert decrypted == plaintext
 
 
-def test_multiple_messages():
+def test_multiple_messages(ratchet_pair):
     """Test multiple message encryption/decryption."""
-    # Setup
-    alice = RatchetEngine()
-    shared_secret = b"x" * 32
-    bob_key = PrivateKey.generate()
-    alice.initialize_sender(shared_secret, bob_key.public_key)
-    
-    bob = RatchetEngine()
-    bob.initialize_receiver(shared_secret, bob_key)
+    alice, bob = ratchet_pair
     
     # Send multiple messages
     messages = ["Message 1", "Message 2", "Message 3"]
@@ -125,16 +188,9 @@ def test_multiple_messages():
         assert decrypted == msg
 
 
-def test_out_of_order_messages():
+def test_out_of_order_messages(ratchet_pair):
     """Test handling out-of-order messages with skipped keys."""
-    # Setup
-    alice = RatchetEngine()
-    shared_secret = b"y" * 32
-    bob_key = PrivateKey.generate()
-    alice.initialize_sender(shared_secret, bob_key.public_key)
-    
-    bob = RatchetEngine()
-    bob.initialize_receiver(shared_secret, bob_key)
+    alice, bob = ratchet_pair
     
     # Alice sends 3 messages
     msg1_cipher, msg1_header = alice.encrypt("Message 1")
@@ -204,15 +260,9 @@ def test_chain_key_derivation():
     assert len(msg_key) == 32
 
 
-def test_max_skipped_keys():
+def test_max_skipped_keys(ratchet_pair):
     """Test DoS protection - max skipped keys limit."""
-    alice = RatchetEngine()
-    shared_secret = b"a" * 32
-    bob_key = PrivateKey.generate()
-    alice.initialize_sender(shared_secret, bob_key.public_key)
-    
-    bob = RatchetEngine()
-    bob.initialize_receiver(shared_secret, bob_key)
+    alice, bob = ratchet_pair
     bob.state.max_skip = 10  # Low limit for testing
     
     # Alice sends many messages
@@ -227,7 +277,6 @@ def test_max_skipped_keys():
         bob.decrypt("dummy", last_header)
 
 
-@pytest.mark.asyncio
 async def test_session_manager_encrypt_decrypt(temp_storage):
     """Test SessionManager encrypt/decrypt integration with two parties."""
     from whatsapp_client.crypto import SessionManager, RatchetEngine
@@ -255,7 +304,6 @@ async def test_session_manager_encrypt_decrypt(temp_storage):
     alice_ratchet.initialize_sender(shared_secret, bob_public)
     alice_session.ratchet_state = alice_ratchet.serialize_state()
     
-    alice_manager._save_session(alice_session)
     alice_manager._sessions["bob"] = alice_session
     
     # Create Bob's session manager (he's the receiver)
@@ -274,7 +322,6 @@ async def test_session_manager_encrypt_decrypt(temp_storage):
     bob_ratchet.initialize_receiver(shared_secret, bob_ephemeral)
     bob_session.ratchet_state = bob_ratchet.serialize_state()
     
-    bob_manager._save_session(bob_session)
     bob_manager._sessions["alice"] = bob_session
     
     # Alice encrypts a message to Bob
@@ -289,41 +336,16 @@ async def test_session_manager_encrypt_decrypt(temp_storage):
     assert decrypted == plaintext
 
 
-@pytest.mark.asyncio
-async def test_client_send_message_integration(temp_storage):
+async def test_client_send_message_integration(temp_storage, fast_kdf):
     """Test WhatsAppClient.send_message with encryption."""
-    client = WhatsAppClient(server_url="http://localhost:8787", storage_path=temp_storage)
+    client = WhatsAppClient(
+        server_url="http://localhost:8787",
+        storage_path=temp_storage,
+        kdf_params=fast_kdf,
+    )
     
     # Mock login
-    mock_user = {
-        "id": "alice_user_id",
-        "username": "alice",
-        "avatar": None,
-        "lastSeen": 1234567890,
-        "token": "mock_jwt_token",
-        "role": "user",
-        "is_active": 1,
-        "can_send_images": 1,
-        "created_at": 1234567890,
-    }
-    
-    mock_upload_response = {
-        "success": True,
-        "signedPrekeyUploaded": True,
-        "oneTimePrekeysUploaded": 100,
-    }
-    
-    mock_prekey_bundle = {
-        "identityKey": "a" * 64,
-        "signingKey": "b" * 64,
-        "fingerprint": "c" * 60,
-        "signedPrekey": {
-            "keyId": 1,
-            "publicKey": "d" * 64,
-            "signature": "e" * 128
-        },
-        "oneTimePrekeys": ["f" * 64]
-    }
+    mock_user = _mock_user("alice_user_id", "alice", token="mock_jwt_token")
     
     mock_message_response = {
         "id": "msg_123",
@@ -335,8 +357,8 @@ async def test_client_send_message_integration(temp_storage):
         "type": "text",
     }
     
-    with patch.object(client._rest, "post", new=AsyncMock(side_effect=[mock_user, mock_upload_response, mock_message_response])):
-        with patch.object(client._rest, "get", new=AsyncMock(return_value=mock_prekey_bundle)):
+    with patch.object(client._rest, "post", new=AsyncMock(side_effect=[mock_user, dict(_MOCK_UPLOAD_RESPONSE), mock_message_response])):
+        with patch.object(client._rest, "get", new=AsyncMock(return_value=copy.deepcopy(_MOCK_PREKEY_BUNDLE))):
             with patch.object(client._rest, "delete", new=AsyncMock(return_value={"status": "ok"})):
                 with patch("whatsapp_client.crypto.x3dh.X3DHProtocol.verify_prekey_signature", return_value=True):
                     with patch.object(client, "_connect_websocket", new=AsyncMock()):
@@ -353,49 +375,34 @@ async def test_client_send_message_integration(temp_storage):
                     assert message.content == "Hello Bob!"  # Client returns plaintext
                     assert message.status == "sent"
                     assert message.to == "bob_user_id"
-async def test_client_decrypt_message(temp_storage):
+
+
+async def test_client_decrypt_message(temp_storage, fast_kdf):
     """Test WhatsAppClient.decrypt_message with two separate ratchets."""
-    alice_client = WhatsAppClient(server_url="http://localhost:8787", storage_path=f"{temp_storage}/alice")
-    bob_client = WhatsAppClient(server_url="http://localhost:8787", storage_path=f"{temp_storage}/bob")
-    
-    # Mock login for Alice
-    mock_user_alice = {
-        "id": "alice_user_id",
-        "username": "alice",
-        "avatar": None,
-        "lastSeen": 1234567890,
-        "role": "user",
-        "is_active": 1,
-        "can_send_images": 1,
-        "created_at": 1234567890,
-    }
-    
-    # Mock login for Bob
-    mock_user_bob = {
-        "id": "bob_user_id",
-        "username": "bob",
-        "avatar": None,
-        "lastSeen": 1234567890,
-        "role": "user",
-        "is_active": 1,
-        "can_send_images": 1,
-        "created_at": 1234567890,
-    }
+    alice_client = WhatsAppClient(
+        server_url="http://localhost:8787",
+        storage_path=f"{temp_storage}/alice",
+        kdf_params=fast_kdf,
+    )
+    bob_client = WhatsAppClient(
+        server_url="http://localhost:8787",
+        storage_path=f"{temp_storage}/bob",
+        kdf_params=fast_kdf,
+    )
     
-    mock_upload_response = {
-        "success": True,
-        "signedPrekeyUploaded": True,
-        "oneTimePrekeysUploaded": 100,
-    }
+    # Mock logins for Alice and Bob
+    mock_user_alice = _mock_user("alice_user_id", "alice")
+    mock_user_bob = _mock_user("bob_user_id", "bob")
     
-    with patch.object(alice_client._rest, "post", new=AsyncMock(side_effect=[mock_user_alice, mock_upload_response])):
+    with patch.object(alice_client._rest, "post", new=AsyncMock(side_effect=[mock_user_alice, dict(_MOCK_UPLOAD_RESPONSE)])):
         await alice_client.login("alice", "password123")
     
-    with patch.object(bob_client._rest, "post", new=AsyncMock(side_effect=[mock_user_bob, mock_upload_response])):
+    with patch.object(bob_client._rest, "post", new=AsyncMock(side_effect=[mock_user_bob, dict(_MOCK_UPLOAD_RESPONSE)])):
         await bob_client.login("bob", "password123")
     
     # Setup symmetric sessions - Bob publishes his DH key, Alice uses it
     shared_secret = ("a" * 64)
+    shared_secret_bytes = bytes.fromhex(shared_secret)
     bob_ephemeral = PrivateKey.generate()
     bob_public = bob_ephemeral.public_key
     
@@ -412,7 +419,7 @@ async def test_client_decrypt_message(temp_storage):
     # Initialize Alice's ratchet as sender
     from whatsapp_client.crypto import RatchetEngine
     alice_ratchet = RatchetEngine()
-    alice_ratchet.initialize_sender(bytes.fromhex(shared_secret), bob_public)
+    alice_ratchet.initialize_sender(shared_secret_bytes, bob_public)
     alice_session.ratchet_state = alice_ratchet.serialize_state()
     
     alice_client._session_manager._sessions["bob_user_id"] = alice_session
@@ -429,7 +436,7 @@ async def test_client_decrypt_message(temp_storage):
     
     # Initialize Bob's ratchet as receiver
     bob_ratchet = RatchetEngine()
-    bob_ratchet.initialize_receiver(bytes.fromhex(shared_secret), bob_ephemeral)
+    bob_ratchet.initialize_receiver(shared_secret_bytes, bob_ephemeral)
     bob_session.ratchet_state = bob_ratchet.serialize_state()
     
     bob_client._session_manager._sessions["alice_user_id"] = bob_session
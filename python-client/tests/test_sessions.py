@@ -1,38 +1,36 @@
 """Tests for session management and X3DH protocol."""
 
 import pytest
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock
 from pathlib import Path
-import tempfile
-import shutil
 
 from nacl.public import PrivateKey
-from nacl.encoding import RawEncoder
 
 from whatsapp_client import WhatsAppClient
 from whatsapp_client.crypto import X3DHProtocol, SessionManager
 from whatsapp_client.models import PrekeyBundle, Session
 
+# Every test here is async; share one event loop across the module
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
 
 @pytest.fixture
-def temp_storage():
+def temp_storage(tmp_path):
     """Create temporary storage directory."""
-    temp_dir = tempfile.mkdtemp()
-    yield temp_dir
-    shutil.rmtree(temp_dir)
+    return str(tmp_path)
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def alice_keys():
     """Generate Alice's key pair."""
     identity_key = PrivateKey.generate()
     return {
         "private": identity_key,
-        "public": identity_key.public_key.encode(encoder=RawEncoder).hex()
+        "public": bytes(identity_key.public_key).hex()
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def bob_keys():
     """Generate Bob's key bundle."""
     from nacl.signing import SigningKey
@@ -43,22 +41,22 @@ def bob_keys():
     one_time_prekeys = [PrivateKey.generate() for _ in range(3)]
     
     # Create signature for signed prekey
-    signed_prekey_bytes = signed_prekey.public_key.encode(encoder=RawEncoder)
+    signed_prekey_bytes = bytes(signed_prekey.public_key)
     signature = signing_key.sign(signed_prekey_bytes).signature
     
     return {
         "identity_private": identity_key,
-        "identity_public": identity_key.public_key.encode(encoder=RawEncoder).hex(),
+        "identity_public": bytes(identity_key.public_key).hex(),
         "signing_private": signing_key,
-        "signing_public": signing_key.verify_key.encode(encoder=RawEncoder).hex(),
+        "signing_public": bytes(signing_key.verify_key).hex(),
         "signed_prekey_private": signed_prekey,
-        "signed_prekey_public": signed_prekey.public_key.encode(encoder=RawEncoder).hex(),
+        "signed_prekey_public": bytes(signed_prekey.public_key).hex(),
         "signature": signature.hex(),
-        "one_time_prekeys": [k.public_key.encode(encoder=RawEncoder).hex() for k in one_time_prekeys]
+        "one_time_prekeys": [bytes(k.public_key).hex() for k in one_time_prekeys]
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def prekey_bundle(bob_keys):
     """Create prekey bundle for Bob."""
     return PrekeyBundle(
@@ -71,13 +69,23 @@ def prekey_bundle(bob_keys):
     )
 
 
-@pytest.mark.asyncio
-async def test_x3dh_session_initiation(alice_keys, prekey_bundle):
+@pytest.fixture(scope="module")
+def x3dh_result(alice_keys, prekey_bundle):
+    """Run Alice's X3DH handshake against Bob's bundle once per module."""
+    return X3DHProtocol.initiate_session(alice_keys["private"], prekey_bundle)
+
+
+@pytest.fixture
+def fast_x3dh(monkeypatch):
+    """Skip the X3DH key agreement in tests about SessionManager bookkeeping."""
+    result = (b"\x00" * 32, PrivateKey.generate(), b"\x00" * 32)
+    monkeypatch.setattr(X3DHProtocol, "initiate_session", staticmethod(lambda *args: result))
+    return result
+
+
+async def test_x3dh_session_initiation(x3dh_result):
     """Test X3DH protocol session initiation."""
-    shared_secret, ephemeral_key, initial_message_key = X3DHProtocol.initiate_session(
-        alice_keys["private"],
-        prekey_bundle
-    )
+    shared_secret, ephemeral_key, initial_message_key = x3dh_result
     
     # Verify outputs
     assert isinstance(shared_secret, bytes)
@@ -87,7 +95,6 @@ async def test_x3dh_session_initiation(alice_keys, prekey_bundle):
     assert len(initial_message_key) == 32
 
 
-@pytest.mark.asyncio
 async def test_x3dh_without_one_time_prekey(alice_keys, bob_keys):
     """Test X3DH when no one-time prekey is available."""
     bundle = PrekeyBundle(
@@ -108,7 +115,6 @@ async def test_x3dh_without_one_time_prekey(alice_keys, bob_keys):
     assert len(shared_secret) == 32
 
 
-@pytest.mark.asyncio
 async def test_prekey_signature_verification(bob_keys):
     """Test signed prekey signature verification."""
     is_valid = X3DHProtocol.verify_prekey_signature(
@@ -120,7 +126,6 @@ async def test_prekey_signature_verification(bob_keys):
     assert is_valid is True
 
 
-@pytest.mark.asyncio
 async def test_invalid_signature_rejected(bob_keys):
     """Test that invalid signatures are rejected."""
     # Create invalid signature
@@ -135,7 +140,6 @@ async def test_invalid_signature_rejected(bob_keys):
     assert is_valid is False
 
 
-@pytest.mark.asyncio
 async def test_session_manager_initialization(temp_storage):
     """Test session manager initialization."""
     manager = SessionManager("alice_user_id", temp_storage)
@@ -145,22 +149,18 @@ async def test_session_manager_initialization(temp_storage):
     assert manager.sessions_dir.is_dir()
 
 
-@pytest.mark.asyncio
-async def test_session_persistence(temp_storage, alice_keys, prekey_bundle):
+async def test_session_persistence(temp_storage, prekey_bundle, x3dh_result):
     """Test session is saved and loaded correctly."""
     manager = SessionManager("alice_user_id", temp_storage)
     
     # Create mock session
-    shared_secret, ephemeral_key, initial_message_key = X3DHProtocol.initiate_session(
-        alice_keys["private"],
-        prekey_bundle
-    )
+    shared_secret, ephemeral_key, initial_message_key = x3dh_result
     
     session = Session(
         session_id="test_session_123",
         peer_id="bob_user_id",
         shared_secret=shared_secret.hex(),
-        ephemeral_key=ephemeral_key.encode(encoder=RawEncoder).hex(),
+        ephemeral_key=bytes(ephemeral_key).hex(),
         initial_message_key=initial_message_key.hex(),
         created_at="2025-12-16T10:00:00",
         one_time_prekey_used=prekey_bundle.one_time_prekeys[0]
@@ -178,7 +178,6 @@ async def test_session_persistence(temp_storage, alice_keys, prekey_bundle):
     assert loaded_session.shared_secret == session.shared_secret
 
 
-@pytest.mark.asyncio
 async def test_get_session_from_cache(temp_storage):
     """Test getting session from memory cache."""
     manager = SessionManager("alice_user_id", temp_storage)
@@ -204,7 +203,6 @@ async def test_get_session_from_cache(temp_storage):
     assert cached_session.session_id == session.session_id
 
 
-@pytest.mark.asyncio
 async def test_delete_session(temp_storage):
     """Test session deletion."""
     manager = SessionManager("alice_user_id", temp_storage)
@@ -231,7 +229,6 @@ async def test_delete_session(temp_storage):
     assert not manager._get_session_file("bob_user_id").exists()
 
 
-@pytest.mark.asyncio
 async def test_list_sessions(temp_storage):
     """Test listing all sessions."""
     manager = SessionManager("alice_user_id", temp_storage)
@@ -258,8 +255,7 @@ async def test_list_sessions(temp_storage):
     assert "david" in sessions
 
 
-@pytest.mark.asyncio
-async def test_ensure_session_creates_new(temp_storage, alice_keys, prekey_bundle):
+async def test_ensure_session_creates_new(temp_storage, alice_keys, prekey_bundle, fast_x3dh):
     """Test ensure_session creates new session when none exists."""
     manager = SessionManager("alice_user_id", temp_storage)
     
@@ -284,7 +280,6 @@ async def test_ensure_session_creates_new(temp_storage, alice_keys, prekey_bundl
     assert session.one_time_prekey_used == prekey_bundle.one_time_prekeys[0]
 
 
-@pytest.mark.asyncio
 async def test_ensure_session_reuses_existing(temp_storage, alice_keys):
     """Test ensure_session returns existing session."""
     manager = SessionManager("alice_user_id", temp_storage)
@@ -318,10 +313,13 @@ async def test_ensure_session_reuses_existing(temp_storage, alice_keys):
     mark_used.assert_not_called()
 
 
-@pytest.mark.asyncio
-async def test_client_ensure_session_integration(temp_storage):
+async def test_client_ensure_session_integration(temp_storage, monkeypatch, fast_x3dh, fast_kdf):
     """Test WhatsAppClient.ensure_session integration."""
-    client = WhatsAppClient(server_url="http://localhost:8787", storage_path=temp_storage)
+    client = WhatsAppClient(
+        server_url="http://localhost:8787",
+        storage_path=temp_storage,
+        kdf_params=fast_kdf,
+    )
     
     # Mock login
     mock_user = {
@@ -358,20 +356,24 @@ async def test_client_ensure_session_integration(temp_storage):
         }
     }
     
-    with patch.object(client._rest, "post", new=AsyncMock(side_effect=[mock_user, mock_upload_response])):
-        with patch.object(client._rest, "get", new=AsyncMock(return_value=mock_prekey_bundle)):
-            with patch.object(client._rest, "delete", new=AsyncMock(return_value={"status": "ok"})):
-                with patch("whatsapp_client.crypto.x3dh.X3DHProtocol.verify_prekey_signature", return_value=True):
-                    await client.login("alice", "password123")
-                    
-                    # Ensure session
-                    session = await client.ensure_session("bob_user_id")
-                    
-                    assert session is not None
-                    assert session.peer_id == "bob_user_id"
+    monkeypatch.setattr(
+        client._rest, "post", AsyncMock(side_effect=[mock_user, mock_upload_response])
+    )
+    monkeypatch.setattr(client._rest, "get", AsyncMock(return_value=mock_prekey_bundle))
+    monkeypatch.setattr(client._rest, "delete", AsyncMock(return_value={"status": "ok"}))
+    monkeypatch.setattr(
+        X3DHProtocol, "verify_prekey_signature", staticmethod(lambda *args: True)
+    )
+    
+    await client.login("alice", "password123")
+    
+    # Ensure session
+    session = await client.ensure_session("bob_user_id")
+    
+    assert session is not None
+    assert session.peer_id == "bob_user_id"
 
 
-@pytest.mark.asyncio
 async def test_client_get_session(temp_storage):
     """Test WhatsAppClient.get_session."""
     client = WhatsAppClient(server_url="http://localhost:8787", storage_path=temp_storage)
@@ -380,33 +382,12 @@ async def test_client_get_session(temp_storage):
     session = client.get_session("bob_user_id")
     assert session is None
     
-    # Mock login
-    mock_user = {
-        "id": "alice_user_id",
-        "username": "alice",
-        "avatar": None,
-        "lastSeen": 1234567890,
-        "role": "user",
-        "is_active": 1,
-        "can_send_images": 1,
-        "created_at": 1234567890,
-    }
-    
-    mock_upload_response = {
-        "success": True,
-        "signedPrekeyUploaded": True,
-        "oneTimePrekeysUploaded": 100,
-    }
-    
-    with patch.object(client._rest, "post", new=AsyncMock(side_effect=[mock_user, mock_upload_response])):
-        await client.login("alice", "password123")
-        
-        # After login, still no session
-        session = client.get_session("bob_user_id")
-        assert session is None
+    # After login the client delegates to its session manager, still no session
+    client._session_manager = SessionManager("alice_user_id", temp_storage)
+    session = client.get_session("bob_user_id")
+    assert session is None
 
 
-@pytest.mark.asyncio
 async def test_client_list_sessions(temp_storage):
     """Test WhatsAppClient.list_sessions."""
     client = WhatsAppClient(server_url="http://localhost:8787", storage_path=temp_storage)
@@ -415,27 +396,7 @@ async def test_client_list_sessions(temp_storage):
     sessions = client.list_sessions()
     assert sessions == []
     
-    # Mock login
-    mock_user = {
-        "id": "alice_user_id",
-        "username": "alice",
-        "avatar": None,
-        "lastSeen": 1234567890,
-        "role": "user",
-        "is_active": 1,
-        "can_send_images": 1,
-        "created_at": 1234567890,
-    }
-    
-    mock_upload_response = {
-        "success": True,
-        "signedPrekeyUploaded": True,
-        "oneTimePrekeysUploaded": 100,
-    }
-    
-    with patch.object(client._rest, "post", new=AsyncMock(side_effect=[mock_user, mock_upload_response])):
-        await client.login("alice", "password123")
-        
-        # After login
-        sessions = client.list_sessions()
-        assert sessions == []
+    # After login
+    client._session_manager = SessionManager("alice_user_id", temp_storage)
+    sessions = client.list_sessions()
+    assert sessions == []
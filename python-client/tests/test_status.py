@@ -1,28 +1,46 @@
 """Tests for US9: Message Status Tracking and Read Receipts."""
 
 import pytest
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, patch
 from whatsapp_client import WhatsAppClient
-from whatsapp_client.transport import WebSocketClient
 from whatsapp_client.storage import MessageStorage
 from whatsapp_client.models import Message
 
+# Every test here is async; share one event loop across the module
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
+
+@pytest.fixture
+def client():
+    """Create a test client."""
+    return WhatsAppClient(server_url="http://test.com")
+
+
+@pytest.fixture
+def mock_storage():
+    """Message storage stand-in that records status updates."""
+    return MagicMock(spec=MessageStorage)
+
+
+@pytest.fixture
+def mock_ws():
+    """Connected WebSocket stand-in that records read receipts."""
+    ws = AsyncMock()
+    ws.is_connected = True
+    return ws
+
 
 class TestMessageStatusTracking:
     """Test message status tracking functionality."""
     
-    @pytest.mark.asyncio
-    async def test_status_update_handling(self):
+    async def test_status_update_handling(self, auth_client, mock_storage):
         """Test handling status updates from WebSocket."""
-        client = WhatsAppClient(server_url="http://test.com")
+        client = auth_client
         
         # Mock authenticated state
-        client._auth._user_id = "user_123"
-        client._auth._user = MagicMock(id="user_123", username="alice")
+        client._auth._user = SimpleNamespace(id="user_123", username="alice")
         
-        # Mock message storage
-        mock_storage = MagicMock(spec=MessageStorage)
-        mock_storage.update_message_status = MagicMock()
         client._message_storage = mock_storage
         
         # Simulate status update
@@ -34,10 +52,8 @@ class TestMessageStatusTracking:
         # Verify storage was updated
         mock_storage.update_message_status.assert_called_once_with("msg_456", "delivered")
     
-    @pytest.mark.asyncio
-    async def test_status_handler_registration(self):
+    async def test_status_handler_registration(self, client):
         """Test registering status event handler."""
-        client = WhatsAppClient(server_url="http://test.com")
         
         handler_called = False
         received_data = None
@@ -59,10 +75,8 @@ class TestMessageStatusTracking:
         assert received_data["messageId"] == "msg_456"
         assert received_data["status"] == "read"
     
-    @pytest.mark.asyncio
-    async def test_on_message_status_alias(self):
+    async def test_on_message_status_alias(self, client):
         """Test on_message_status is an alias for on_status."""
-        client = WhatsAppClient(server_url="http://test.com")
         
         handler_called = False
         
@@ -80,14 +94,9 @@ class TestMessageStatusTracking:
         # Verify handler was called
         assert handler_called
     
-    @pytest.mark.asyncio
-    async def test_status_progression(self):
+    async def test_status_progression(self, client, mock_storage):
         """Test status progresses from sent → delivered → read."""
-        client = WhatsAppClient(server_url="http://test.com")
         
-        # Mock message storage
-        mock_storage = MagicMock(spec=MessageStorage)
-        mock_storage.update_message_status = MagicMock()
         client._message_storage = mock_storage
         
         status_updates = []
@@ -103,10 +112,8 @@ class TestMessageStatusTracking:
         # Verify progression
         assert status_updates == ["delivered", "read"]
     
-    @pytest.mark.asyncio
-    async def test_multiple_status_handlers(self):
+    async def test_multiple_status_handlers(self, client):
         """Test multiple status handlers."""
-        client = WhatsAppClient(server_url="http://test.com")
         
         handler1_calls = []
         handler2_calls = []
@@ -130,23 +137,15 @@ class TestMessageStatusTracking:
 class TestReadReceipts:
     """Test read receipt functionality."""
     
-    @pytest.mark.asyncio
-    async def test_mark_as_read_single_message(self):
+    async def test_mark_as_read_single_message(self, auth_client, mock_storage, mock_ws):
         """Test marking a single message as read."""
-        client = WhatsAppClient(server_url="http://test.com")
+        client = auth_client
         
         # Mock authenticated state
-        client._auth._user_id = "user_123"
-        client._auth._user = MagicMock(id="user_123", username="alice")
+        client._auth._user = SimpleNamespace(id="user_123", username="alice")
         
-        # Mock message storage
-        mock_storage = MagicMock(spec=MessageStorage)
-        mock_storage.update_message_status = MagicMock()
         client._message_storage = mock_storage
         
-        # Mock WebSocket
-        mock_ws = AsyncMock(spec=WebSocketClient)
-        mock_ws.send_status_update = AsyncMock()
         client._ws = mock_ws
         
         # Mark message as read
@@ -161,22 +160,14 @@ class TestReadReceipts:
         # Verify read receipt sent
         mock_ws.send_status_update.assert_called_once_with("msg_789", "read")
     
-    @pytest.mark.asyncio
-    async def test_mark_as_read_multiple_messages(self):
+    async def test_mark_as_read_multiple_messages(self, auth_client, mock_storage, mock_ws):
         """Test marking multiple messages as read (batch)."""
-        client = WhatsAppClient(server_url="http://test.com")
+        client = auth_client
         
         # Mock authenticated state
-        client._auth._user_id = "user_123"
         
-        # Mock message storage
-        mock_storage = MagicMock(spec=MessageStorage)
-        mock_storage.update_message_status = MagicMock()
         client._message_storage = mock_storage
         
-        # Mock WebSocket
-        mock_ws = AsyncMock(spec=WebSocketClient)
-        mock_ws.send_status_update = AsyncMock()
         client._ws = mock_ws
         
         # Mark multiple messages as read
@@ -192,33 +183,24 @@ class TestReadReceipts:
         # Verify all read receipts sent
         assert mock_ws.send_status_update.call_count == 3
     
-    @pytest.mark.asyncio
-    async def test_mark_as_read_empty_list_error(self):
+    async def test_mark_as_read_empty_list_error(self, client):
         """Test error when marking empty list as read."""
-        client = WhatsAppClient(server_url="http://test.com")
         
         with pytest.raises(ValueError, match="message_ids cannot be empty"):
             await client.mark_as_read(peer_id="user_456", message_ids=[])
     
-    @pytest.mark.asyncio
-    async def test_mark_as_read_too_many_error(self):
+    async def test_mark_as_read_too_many_error(self, client):
         """Test error when marking too many messages at once."""
-        client = WhatsAppClient(server_url="http://test.com")
         
-        # Create list of 101 message IDs
-        message_ids = [f"msg_{i}" for i in range(101)]
+        # Only the length is checked, so the IDs needn't be distinct
+        message_ids = ["msg"] * 101
         
         with pytest.raises(ValueError, match="Cannot mark more than 100"):
             await client.mark_as_read(peer_id="user_456", message_ids=message_ids)
     
-    @pytest.mark.asyncio
-    async def test_mark_as_read_without_websocket(self):
+    async def test_mark_as_read_without_websocket(self, client, mock_storage):
         """Test marking as read when WebSocket not connected."""
-        client = WhatsAppClient(server_url="http://test.com")
         
-        # Mock message storage only
-        mock_storage = MagicMock(spec=MessageStorage)
-        mock_storage.update_message_status = MagicMock()
         client._message_storage = mock_storage
         
         # No WebSocket
@@ -233,14 +215,9 @@ class TestReadReceipts:
         # Storage should be updated
         mock_storage.update_message_status.assert_called_once_with("msg_789", "read")
     
-    @pytest.mark.asyncio
-    async def test_mark_as_read_without_storage(self):
+    async def test_mark_as_read_without_storage(self, client, mock_ws):
         """Test marking as read when storage not initialized."""
-        client = WhatsAppClient(server_url="http://test.com")
         
-        # Mock WebSocket only
-        mock_ws = AsyncMock(spec=WebSocketClient)
-        mock_ws.send_status_update = AsyncMock()
         client._ws = mock_ws
         
         # No storage
@@ -259,10 +236,9 @@ class TestReadReceipts:
 class TestMessageStorage:
     """Test message storage status functionality."""
     
-    @pytest.mark.asyncio
-    async def test_get_message_by_id(self, tmp_path):
+    async def test_get_message_by_id(self):
         """Test retrieving a message by ID."""
-        storage = MessageStorage(user_id="user_123", storage_path=str(tmp_path))
+        storage = MessageStorage(user_id="user_123", storage_path=":memory:")
         
         # Save a message
         message = Message(
@@ -284,20 +260,18 @@ class TestMessageStorage:
         assert retrieved.content == "Test message"
         assert retrieved.status == "sent"
     
-    @pytest.mark.asyncio
-    async def test_get_message_by_id_not_found(self, tmp_path):
+    async def test_get_message_by_id_not_found(self):
         """Test retrieving non-existent message returns None."""
-        storage = MessageStorage(user_id="user_123", storage_path=str(tmp_path))
+        storage = MessageStorage(user_id="user_123", storage_path=":memory:")
         
         # Try to get non-existent message
         retrieved = storage.get_message_by_id("non_existent")
         
         assert retrieved is None
     
-    @pytest.mark.asyncio
-    async def test_update_message_status_persistence(self, tmp_path):
+    async def test_update_message_status_persistence(self):
         """Test that status updates persist in database."""
-        storage = MessageStorage(user_id="user_123", storage_path=str(tmp_path))
+        storage = MessageStorage(user_id="user_123", storage_path=":memory:")
         
         # Save a message
         message = Message(
@@ -329,18 +303,13 @@ class TestMessageStorage:
 class TestIntegration:
     """Integration tests for status tracking."""
     
-    @pytest.mark.asyncio
-    async def test_send_and_receive_status_updates(self):
+    async def test_send_and_receive_status_updates(self, auth_client, mock_storage):
         """Test full flow of sending message and receiving status updates."""
-        client = WhatsAppClient(server_url="http://test.com")
+        client = auth_client
         
         # Mock authenticated state
-        client._auth._user_id = "user_123"
-        client._auth._user = MagicMock(id="user_123", username="alice")
+        client._auth._user = SimpleNamespace(id="user_123", username="alice")
         
-        # Mock message storage
-        mock_storage = MagicMock(spec=MessageStorage)
-        mock_storage.update_message_status = MagicMock()
         client._message_storage = mock_storage
         
         status_updates = []
@@ -364,22 +333,14 @@ class TestIntegration:
         # Verify storage updated
         assert mock_storage.update_message_status.call_count == 2
     
-    @pytest.mark.asyncio
-    async def test_auto_mark_as_read_on_receive(self):
+    async def test_auto_mark_as_read_on_receive(self, auth_client, mock_storage, mock_ws):
         """Test automatically marking messages as read when received."""
-        client = WhatsAppClient(server_url="http://test.com")
+        client = auth_client
         
         # Mock authenticated state
-        client._auth._user_id = "user_123"
         
-        # Mock WebSocket
-        mock_ws = AsyncMock(spec=WebSocketClient)
-        mock_ws.send_status_update = AsyncMock()
         client._ws = mock_ws
         
-        # Mock message storage
-        mock_storage = MagicMock(spec=MessageStorage)
-        mock_storage.update_message_status = MagicMock()
         client._message_storage = mock_storage
         
         received_messages = []
@@ -412,14 +373,9 @@ class TestIntegration:
         # Verify read receipt sent
         mock_ws.send_status_update.assert_called_with("msg_789", "read")
     
-    @pytest.mark.asyncio
-    async def test_status_handler_error_doesnt_crash(self):
+    async def test_status_handler_error_doesnt_crash(self, client, mock_storage):
         """Test that status handler errors don't crash the system."""
-        client = WhatsAppClient(server_url="http://test.com")
         
-        # Mock message storage
-        mock_storage = MagicMock(spec=MessageStorage)
-        mock_storage.update_message_status = MagicMock()
         client._message_storage = mock_storage
         
         other_handler_called = False
@@ -2,35 +2,37 @@
 """Send test message to echo bot and wait for response."""
 
 import asyncio
-import sys
-import time
-sys.path.insert(0, 'D:\\Codebase\\python-client\\src')
 
-from whatsapp_client import WhatsAppClient
+from cli_helpers import make_client
 
 async def main():
     # Create test client
-    client = WhatsAppClient(server_url='https://whatsapp-clone-worker.hi-suneesh.workers.dev')
+    client = make_client()
     
     # Register/login
     username = f'testclient_v5'
     password = 'secret'
     
+    # The account usually exists from an earlier run, so try login first
     try:
-        user = await client.register(username, password)
-        print(f"✓ Registered as {user.username} (ID: {user.id})")
-    except Exception as e:
-        print(f"✗ Registration failed: {e}")
         user = await client.login(username, password)
         print(f"✓ Logged in as {user.username}")
+    except Exception as e:
+        print(f"✗ Login failed: {e}")
+        user = await client.register(username, password)
+        print(f"✓ Registered as {user.username} (ID: {user.id})")
     
     # Get bot's ID
     bot_id = '4db80125-0033-4421-b9a2-c026cdcf4e0f'  # echobot_test
     
     # Set up message handler  
+    reply = asyncio.Event()
+    
     @client.on_message
     async def handle_message(msg):
         print(f"✓ Received from {msg.from_user}: {msg.content}")
+        if msg.from_user == bot_id:
+            reply.set()
     
     # Send message
     print(f"Sending message to bot {bot_id}...")
@@ -43,8 +45,11 @@ async def main():
         traceback.print_exc()
     
     # Wait for response
-    print("Waiting 10 seconds for bot response...")
-    await asyncio.sleep(10)
+    print("Waiting up to 10 seconds for bot response...")
+    try:
+        await asyncio.wait_for(reply.wait(), timeout=10)
+    except asyncio.TimeoutError:
+        print("✗ No response from bot within 10 seconds")
     
     await client.close()
     print("Done")
@@ -2,19 +2,16 @@
 """Test script to send a message to the echo bot."""
 
 import asyncio
-import sys
 import uuid
-sys.path.insert(0, 'python-client/src')
 
+from cli_helpers import make_client
 from whatsapp_client import AsyncClient
 
 async def main():
     # Use a unique username each time to force fresh X3DH
     username = f"testuser{uuid.uuid4().hex[:8]}"
     
-    client = AsyncClient(
-        server_url="https://whatsapp-clone-worker.hi-suneesh.workers.dev"
-    )
+    client = make_client(client_class=AsyncClient)
     
     # Register new user
     try:
@@ -24,14 +21,26 @@ async def main():
         print(f"Register failed: {e}")
         return
     
+    bot_id = "562d86a6-dbdc-4606-8f1c-5b7b57631fdc"  # echobot
+    reply = asyncio.Event()
+    
+    @client.on_message
+    async def handle_message(msg):
+        print(f"Received from {msg.from_user}: {msg.content}")
+        if msg.from_user == bot_id:
+            reply.set()
+    
     # Send a message to echobot
     try:
-        response = await client.send_message("562d86a6-dbdc-4606-8f1c-5b7b57631fdc", "Hello Echo!")
+        response = await client.send_message(bot_id, "Hello Echo!")
         print(f"Sent: {response.id}")
     except Exception as e:
         print(f"Send failed: {e}")
-    
-    await asyncio.sleep(1)
+    else:
+        try:
+            await asyncio.wait_for(reply.wait(), timeout=10)
+        except asyncio.TimeoutError:
+            print("No echo within 10 seconds")
     await client.close()
 
 if __name__ == "__main__":
@@ -7,24 +7,112 @@ Supports user registration, login, sending messages, and receiving real-time mes
 """
 
 import asyncio
+import functools
 import sys
 import os
 import logging
-from typing import Optional
+import time
+from typing import Any, Dict, List, Optional
 import getpass
 
-# Add the python-client src to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'python-client', 'src'))
-
+from cli_helpers import DEFAULT_SERVER_URL, make_client
 from whatsapp_client import WhatsAppClient
 from whatsapp_client.exceptions import WhatsAppClientError
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+# Configure logging; client INFO logs interleave with the prompt, so they
+# are only shown with --verbose
+VERBOSE = '--verbose' in sys.argv
+if VERBOSE:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+else:
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
 logger = logging.getLogger(__name__)
+if VERBOSE:
+    # Include tracebacks for command errors, logged at DEBUG
+    logger.setLevel(logging.DEBUG)
+
+# How long a fetched user list is reused for 'users' and 'chat <name>'
+USERS_CACHE_TTL = 30.0
+
+# Marker on ciphertext the client could not decrypt, and how it is shown
+E2EE_PREFIX = 'E2EE:'
+E2EE_DISPLAY_PREFIX = "[E2E Encrypted] "
+
+BANNER = """🚀 WhatsApp Clone CLI Client
+
+Quick start:
+  Type 'register <username> <password>' to create account
+  Type 'login <username> <password>' to login
+  Type 'chat <user_id>' to start a chat
+  Type 'help' for more commands
+
+"""
+
+HELP_TEXT = """
+📚 WhatsApp Clone CLI Commands:
+
+Authentication:
+  register <username> <password>  - Register a new account
+  login <username> <password>     - Login to existing account
+  myid                            - Show your user ID and username
+
+Users:
+  users                           - List all registered users
+  chat <username>                 - Start chat with user by username
+  chat <user_id>                  - Start chat with user by ID
+
+Chat Mode:
+  Just type your message and press Enter to send
+  Type 'back' or 'quit' to exit chat and return to menu
+
+Messaging:
+  send <user_id> <message>        - Send a single message to user
+
+Information:
+  sessions                        - List active encrypted sessions
+  fingerprint                     - Show your encryption fingerprint
+
+Other:
+  help                            - Show this help
+  quit                            - Exit the application
+
+Getting Started:
+  1. Register: register alice mypassword123
+  2. List users: users
+  3. Chat: chat bob
+  4. Just type messages naturally!
+
+Examples:
+  register alice mypassword123
+  users
+  chat bob
+  chat a1b2c3d4-e5f6-7890-abcd-ef1234567890
+  sessions
+  fingerprint
+        
+"""
+
+
+def _looks_like_uuid(value: str) -> bool:
+    """Check for the 8-4-4-4-12 hyphenated layout of a user ID."""
+    return (
+        len(value) == 36
+        and value[8] == value[13] == value[18] == value[23] == '-'
+    )
+
+
+def _requires_auth(handler):
+    """Run a command handler only once the user has logged in."""
+    @functools.wraps(handler)
+    async def wrapper(self, parts):
+        if not (self.client and self.client.is_authenticated):
+            print("❌ Please login first")
+            return
+        return await handler(self, parts)
+    return wrapper
 
 
 class WhatsAppCLI:
@@ -37,32 +125,71 @@ class WhatsAppCLI:
         self.running = False
         self.chat_with: Optional[str] = None
         self.chat_username: Optional[str] = None
-
-    async def setup_client(self, server_url: str = 'https://whatsapp-clone-worker.hi-suneesh.workers.dev'):
+        self._stdin_lines: Optional[asyncio.Queue] = None
+        self._outbox: Optional[asyncio.Queue] = None
+        self._sender_task: Optional[asyncio.Task] = None
+        self._users_cache: Optional[List[Dict[str, Any]]] = None
+        self._users_cache_expires = 0.0
+        self._prompt = "❓ "
+        # On a POSIX terminal, overwrite the pending prompt in place rather
+        # than leaving it behind on its own line
+        self._line_start = "\r\x1b[K" if sys.stdout.isatty() and os.name != 'nt' else "\n"
+        # Command word -> handler taking the whitespace-split command line
+        self._handlers = {
+            'quit': self._cmd_quit,
+            'exit': self._cmd_quit,
+            'back': self._cmd_back,
+            'help': self._cmd_help,
+            'register': self._cmd_register,
+            'login': self._cmd_login,
+            'chat': self._cmd_chat,
+            'users': self._cmd_users,
+            'myid': self._cmd_myid,
+            'send': self._cmd_send,
+            'sessions': self._cmd_sessions,
+            'fingerprint': self._cmd_fingerprint,
+        }
+
+    async def setup_client(self, server_url: str = DEFAULT_SERVER_URL):
         """Initialize the WhatsApp client."""
-        self.client = WhatsAppClient(server_url=server_url)
+        self.client = make_client(server_url)
+        self._outbox = asyncio.Queue()
+        self._sender_task = asyncio.create_task(self._drain_outbox())
 
         # Set up message handler
         @self.client.on_message
         async def handle_message(msg):
             if self.chat_with and msg.from_user == self.chat_with:
                 content = msg.content
-                if content.startswith('E2EE:'):
-                    content = "[E2E Encrypted] " + content[:100] + "..."
-                print(f"\n📨 {content}")
-                print(f"💬 [{self.chat_username}] ", end='', flush=True)
+                if content.startswith(E2EE_PREFIX):
+                    content = E2EE_DISPLAY_PREFIX + content[:100] + "..."
+                self._write(f"{self._line_start}📨 {content}\n")
             else:
-                print(f"\n📨 [{msg.from_user}] {msg.content}")
-                if not self.chat_with:
-                    print("💬 ", end='', flush=True)
+                self._write(f"{self._line_start}📨 [{msg.from_user}] {msg.content}\n")
+
+    def _update_prompt(self):
+        """Rebuild the prompt after logging in or entering/leaving a chat."""
+        if self.chat_with:
+            self._prompt = f"💬 [{self.chat_username}] "
+        elif self.client and self.client.is_authenticated:
+            self._prompt = f"📱 [{self.username}] "
+        else:
+            self._prompt = "❓ "
+
+    def _write(self, text: str = ""):
+        """Write text and redraw the prompt with one write and one flush."""
+        sys.stdout.write(text + self._prompt)
+        sys.stdout.flush()
 
     async def register_user(self, username: str, password: str):
         """Register a new user."""
         try:
             print(f"🔐 Registering user: {username}")
             user = await self.client.register(username, password)
+            self._users_cache = None
             self.username = username
             self.user_id = user.id
+            self._update_prompt()
             print(f"✅ Registration successful! User ID: {user.id}")
             return True
         except WhatsAppClientError as e:
@@ -76,6 +203,7 @@ class WhatsAppCLI:
             user = await self.client.login(username, password)
             self.username = username
             self.user_id = user.id
+            self._update_prompt()
             print(f"✅ Login successful! User ID: {user.id}")
             return True
         except WhatsAppClientError as e:
@@ -87,8 +215,7 @@ class WhatsAppCLI:
         try:
             message = await self.client.send_message(to_user, content)
             if self.chat_with == to_user:
-                print(f"\n📤 You: {content}")
-                print(f"💬 [{self.chat_username}] ", end='', flush=True)
+                self._write(f"{self._line_start}📤 You: {content}\n")
             else:
                 print(f"📤 Message sent to {to_user}: {message.id}")
         except WhatsAppClientError as e:
@@ -100,6 +227,29 @@ class WhatsAppCLI:
             else:
                 print(f"❌ Failed to send message: {e}")
 
+    async def _list_users_cached(self) -> List[Dict[str, Any]]:
+        """Fetch the user list, reusing the last result for USERS_CACHE_TTL seconds."""
+        now = time.monotonic()
+        if self._users_cache and now < self._users_cache_expires:
+            return self._users_cache
+        users = await self.client.list_users()
+        # An empty list is also what a failed fetch returns; don't cache it
+        self._users_cache = users or None
+        self._users_cache_expires = now + USERS_CACHE_TTL
+        return users
+
+    async def _drain_outbox(self):
+        """Send queued chat lines one at a time so they arrive in typed order."""
+        while True:
+            to_user, content = await self._outbox.get()
+            try:
+                await self.send_message(to_user, content)
+            except Exception as e:
+                print(f"❌ Failed to send message: {e}")
+                logger.debug("Send error", exc_info=True)
+            finally:
+                self._outbox.task_done()
+
     async def list_sessions(self):
         """List active sessions."""
         try:
@@ -121,34 +271,57 @@ class WhatsAppCLI:
         except WhatsAppClientError as e:
             print(f"❌ Failed to get fingerprint: {e}")
 
+    def _watch_stdin(self) -> bool:
+        """Have the event loop read stdin lines into a queue.
+
+        Only interactive POSIX terminals are watched; a tty hands over whole
+        lines, whereas piped input may sit in Python's read buffer unseen by
+        the loop. Returns False when input() must run in an executor instead
+        (Windows, redirected stdin).
+        """
+        if not sys.stdin.isatty():
+            return False
+        lines: asyncio.Queue = asyncio.Queue()
+        try:
+            asyncio.get_running_loop().add_reader(
+                sys.stdin.fileno(), lambda: lines.put_nowait(sys.stdin.readline())
+            )
+        except NotImplementedError:
+            return False
+        self._stdin_lines = lines
+        return True
+
+    async def _read_line(self) -> str:
+        """Read one line from stdin, raising EOFError at end of input."""
+        if self._stdin_lines is None:
+            return await asyncio.get_running_loop().run_in_executor(None, input)
+        line = await self._stdin_lines.get()
+        if not line:
+            raise EOFError
+        return line
+
     async def run_interactive(self):
         """Run the interactive CLI loop."""
-        print("🚀 WhatsApp Clone CLI Client")
-        print("\nQuick start:")
-        print("  Type 'register <username> <password>' to create account")
-        print("  Type 'login <username> <password>' to login")
-        print("  Type 'chat <user_id>' to start a chat")
-        print("  Type 'help' for more commands\n")
+        sys.stdout.write(BANNER)
 
+        watching = self._watch_stdin()
         self.running = True
         while self.running:
             try:
-                if self.chat_with:
-                    print(f"💬 [{self.chat_username}] ", end='', flush=True)
-                elif self.client and self.client.is_authenticated:
-                    print(f"📱 [{self.username}] ", end='', flush=True)
-                else:
-                    print("❓ ", end='', flush=True)
-
-                line = await asyncio.get_event_loop().run_in_executor(None, input)
+                self._write()
+                line = await self._read_line()
                 await self.process_command(line.strip())
 
-            except KeyboardInterrupt:
+            except (KeyboardInterrupt, EOFError):
                 print("\n👋 Goodbye!")
                 break
             except Exception as e:
                 print(f"❌ Error: {e}")
-                logger.exception("CLI error")
+                logger.debug("CLI error", exc_info=True)
+
+        if watching:
+            asyncio.get_running_loop().remove_reader(sys.stdin.fileno())
+            self._stdin_lines = None
 
     async def process_command(self, command: str):
         """Process a user command."""
@@ -157,175 +330,146 @@ class WhatsAppCLI:
 
         # If in chat mode and not a special command, send message
         if self.chat_with and not command.startswith('/') and command.lower() not in ['quit', 'exit', 'help', 'back']:
-            await self.send_message(self.chat_with, command)
+            self._outbox.put_nowait((self.chat_with, command))
             return
 
-        parts = command.split()
+        # Keep everything after the first argument verbatim, so passwords and
+        # messages retain their own spacing
+        parts = command.split(maxsplit=2)
         cmd = parts[0].lower()
 
-        if cmd == 'quit' or cmd == 'exit':
-            if self.chat_with:
-                print(f"👋 Left chat with {self.chat_username}")
-                self.chat_with = None
-                self.chat_username = None
-            else:
-                print("👋 Goodbye!")
-                self.running = False
-
-        elif cmd == 'back':
-            if self.chat_with:
-                print(f"👋 Left chat with {self.chat_username}")
-                self.chat_with = None
-                self.chat_username = None
-            else:
-                print("❌ Not in a chat")
-
-        elif cmd == 'help':
-            self.show_help()
-
-        elif cmd == 'register':
-            if len(parts) < 3:
-                print("❌ Usage: register <username> <password>")
-            else:
-                username, password = parts[1], ' '.join(parts[2:])
-                await self.register_user(username, password)
-
-        elif cmd == 'login':
-            if len(parts) < 3:
-                print("❌ Usage: login <username> <password>")
-            else:
-                username, password = parts[1], ' '.join(parts[2:])
-                await self.login_user(username, password)
-
-        elif cmd == 'chat':
-            if not self.client or not self.client.is_authenticated:
-                print("❌ Please login first")
-            elif len(parts) < 2:
-                print("❌ Usage: chat <username_or_user_id>")
-                print(f"   Your user ID: {self.user_id}")
-            else:
-                target = parts[1]
-                display_name = ' '.join(parts[2:]) if len(parts) > 2 else None
-                
-                # Check if it looks like a UUID or username
-                if '-' in target and len(target) == 36:
-                    # Looks like a UUID
-                    user_id = target
-                    username = display_name or target
-                else:
-                    # Try to find user by username
-                    print(f"🔍 Looking up user: {target}")
-                    user = await self.client.find_user(target)
-                    if user:
-                        user_id = user['id']
-                        username = display_name or user['username']
-                        print(f"✅ Found: {username} ({user_id})")
-                    else:
-                        print(f"❌ User not found: {target}")
-                        print("   Try 'users' to see available users")
-                        return
-                
-                self.chat_with = user_id
-                self.chat_username = username
-                print(f"\n💬 Chat with {username}")
-                print("Type messages to send. Type 'back' or 'quit' to exit.\n")
-
-        elif cmd == 'users':
-            if not self.client or not self.client.is_authenticated:
-                print("❌ Please login first")
-            else:
-                print("🔍 Fetching user list...")
-                users = await self.client.list_users()
-                if users:
-                    print(f"\n👥 Registered Users ({len(users)}):")
-                    for u in users:
-                        if u['id'] != self.user_id:
-                            print(f"   {u['username']} - {u['id']}")
-                    print(f"\n   Use: chat <username> to start chatting")
-                else:
-                    print("❌ No users found or failed to fetch")
-
-        elif cmd == 'myid':
-            if not self.client or not self.client.is_authenticated:
-                print("❌ Please login first")
-            else:
-                print(f"📱 Your username: {self.username}")
-                print(f"🆔 Your user ID: {self.user_id}")
-                print("   Share this ID with others to chat with them")
-
-        elif cmd == 'send':
-            if not self.client or not self.client.is_authenticated:
-                print("❌ Please login first")
-            elif len(parts) < 3:
-                print("❌ Usage: send <user_id> <message>")
-            else:
-                to_user = parts[1]
-                content = ' '.join(parts[2:])
-                await self.send_message(to_user, content)
-
-        elif cmd == 'sessions':
-            if not self.client or not self.client.is_authenticated:
-                print("❌ Please login first")
-            else:
-                await self.list_sessions()
-
-        elif cmd == 'fingerprint':
-            if not self.client or not self.client.is_authenticated:
-                print("❌ Please login first")
-            else:
-                await self.get_fingerprint()
-
+        handler = self._handlers.get(cmd)
+        if handler:
+            await handler(parts)
+        elif not self.chat_with:
+            print(f"❓ Unknown command: {cmd}. Type 'help' for available commands.")
+
+    def _leave_chat(self):
+        """Return from chat mode to the command prompt."""
+        print(f"👋 Left chat with {self.chat_username}")
+        self.chat_with = None
+        self.chat_username = None
+        self._update_prompt()
+
+    async def _cmd_quit(self, parts):
+        if self.chat_with:
+            self._leave_chat()
         else:
-            if not self.chat_with:
-                print(f"❓ Unknown command: {cmd}. Type 'help' for available commands.")
+            print("👋 Goodbye!")
+            self.running = False
 
-    def show_help(self):
-        """Show help information."""
-        print("""
-📚 WhatsApp Clone CLI Commands:
+    async def _cmd_back(self, parts):
+        if self.chat_with:
+            self._leave_chat()
+        else:
+            print("❌ Not in a chat")
 
-Authentication:
-  register <username> <password>  - Register a new account
-  login <username> <password>     - Login to existing account
-  myid                            - Show your user ID and username
+    async def _cmd_help(self, parts):
+        self.show_help()
 
-Users:
-  users                           - List all registered users
-  chat <username>                 - Start chat with user by username
-  chat <user_id>                  - Start chat with user by ID
+    async def _cmd_register(self, parts):
+        if len(parts) < 3:
+            print("❌ Usage: register <username> <password>")
+        else:
+            username, password = parts[1], parts[2]
+            await self.register_user(username, password)
 
-Chat Mode:
-  Just type your message and press Enter to send
-  Type 'back' or 'quit' to exit chat and return to menu
+    async def _cmd_login(self, parts):
+        if len(parts) < 3:
+            print("❌ Usage: login <username> <password>")
+        else:
+            username, password = parts[1], parts[2]
+            await self.login_user(username, password)
+
+    @_requires_auth
+    async def _cmd_chat(self, parts):
+        if len(parts) < 2:
+            print("❌ Usage: chat <username_or_user_id>")
+            print(f"   Your user ID: {self.user_id}")
+            return
 
-Messaging:
-  send <user_id> <message>        - Send a single message to user
+        target = parts[1]
+        display_name = parts[2] if len(parts) > 2 else None
 
-Information:
-  sessions                        - List active encrypted sessions
-  fingerprint                     - Show your encryption fingerprint
+        if _looks_like_uuid(target):
+            user_id = target
+            username = display_name or target
+        else:
+            # Try to find user by username
+            print(f"🔍 Looking up user: {target}")
+            wanted = target.lower()
+            user = next(
+                (u for u in await self._list_users_cached()
+                 if u.get('username', '').lower() == wanted),
+                None,
+            )
+            if user is None:
+                # Possibly registered since the list was cached
+                user = await self.client.find_user(target)
+            if user:
+                user_id = user['id']
+                username = display_name or user['username']
+                print(f"✅ Found: {username} ({user_id})")
+            else:
+                print(f"❌ User not found: {target}")
+                print("   Try 'users' to see available users")
+                return
+
+        self.chat_with = user_id
+        self.chat_username = username
+        self._update_prompt()
+        print(f"\n💬 Chat with {username}")
+        print("Type messages to send. Type 'back' or 'quit' to exit.\n")
+
+    @_requires_auth
+    async def _cmd_users(self, parts):
+        print("🔍 Fetching user list...")
+        users = await self._list_users_cached()
+        if users:
+            print(f"\n👥 Registered Users ({len(users)}):")
+            for u in users:
+                if u['id'] != self.user_id:
+                    print(f"   {u['username']} - {u['id']}")
+            print(f"\n   Use: chat <username> to start chatting")
+        else:
+            print("❌ No users found or failed to fetch")
+
+    @_requires_auth
+    async def _cmd_myid(self, parts):
+        print(f"📱 Your username: {self.username}")
+        print(f"🆔 Your user ID: {self.user_id}")
+        print("   Share this ID with others to chat with them")
+
+    @_requires_auth
+    async def _cmd_send(self, parts):
+        if len(parts) < 3:
+            print("❌ Usage: send <user_id> <message>")
+        else:
+            to_user = parts[1]
+            content = parts[2]
+            await self.send_message(to_user, content)
 
-Other:
-  help                            - Show this help
-  quit                            - Exit the application
+    @_requires_auth
+    async def _cmd_sessions(self, parts):
+        await self.list_sessions()
 
-Getting Started:
-  1. Register: register alice mypassword123
-  2. List users: users
-  3. Chat: chat bob
-  4. Just type messages naturally!
+    @_requires_auth
+    async def _cmd_fingerprint(self, parts):
+        await self.get_fingerprint()
 
-Examples:
-  register alice mypassword123
-  users
-  chat bob
-  chat a1b2c3d4-e5f6-7890-abcd-ef1234567890
-  sessions
-  fingerprint
-        """)
+    def show_help(self):
+        """Show help information."""
+        sys.stdout.write(HELP_TEXT)
 
     async def cleanup(self):
         """Clean up resources."""
+        if self._sender_task:
+            # Give queued chat lines a chance to go out before closing
+            try:
+                await asyncio.wait_for(self._outbox.join(), timeout=10)
+            except asyncio.TimeoutError:
+                print("⚠️  Some messages were not sent")
+            self._sender_task.cancel()
         if self.client:
             await self.client.close()
 
@@ -353,8 +497,9 @@ if __name__ == "__main__":
     if len(sys.argv) > 1:
         if sys.argv[1] == '--help' or sys.argv[1] == '-h':
             print("WhatsApp Clone CLI Client")
-            print("Usage: python whatsapp_cli.py")
+            print("Usage: python whatsapp_cli.py [--verbose]")
             print("Run interactively to register, login, and chat.")
+            print("  --verbose  Show client log messages")
             sys.exit(0)
 
     # Run the CLI